@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""Serveur d'ingestion fleet asynchrone (asyncio, bibliothèque standard uniquement).
+
+Expose le même contrat que `/api/fleet/report` et `/api/fleet/report/batch` de l'app Flask (mêmes clés API, mêmes
+réponses JSON) et écrit dans le même stockage (`FLEET_STATE` + file d'écriture SQLite
+de `main.py`). Une boucle asyncio tient des milliers de connexions keep-alive d'agents
+sans un thread par connexion ; le dashboard et le reste de l'API restent servis par Flask.
+
+Usage:
+  python async_ingest.py [--host 127.0.0.1] [--port 8001] [--reuse-port]
+
+Derrière nginx, router seulement l'ingestion vers ce process (voir deploy/nginx_dashfleet.conf).
+Avec `--reuse-port`, plusieurs process peuvent écouter sur le même port (un par cœur).
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import time
+from typing import Dict
+
+import main
+
+ASYNC_INGEST_MAX_BODY_BYTES = int(os.environ.get("ASYNC_INGEST_MAX_BODY_BYTES", str(8 * 1024 * 1024)))
+ASYNC_INGEST_KEEPALIVE_SECONDS = float(os.environ.get("ASYNC_INGEST_KEEPALIVE_SECONDS", "75"))
+_MAX_HEADER_BYTES = 16 * 1024
+
+_REASONS = {
+    100: "Continue",
+    200: "OK",
+    400: "Bad Request",
+    403: "Forbidden",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    408: "Request Timeout",
+    409: "Conflict",
+    411: "Length Required",
+    413: "Payload Too Large",
+    500: "Internal Server Error",
+    503: "Service Unavailable",
+}
+
+_STATS: Dict[str, int] = {"connections": 0, "open_connections": 0, "requests": 0, "errors": 0}
+
+
+class _HttpError(Exception):
+    def __init__(self, status: int, message: str) -> None:
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def _response(status: int, payload: Dict[str, object], keep_alive: bool) -> bytes:
+    body = main._json_bytes(payload)
+    head = (
+        f"HTTP/1.1 {status} {_REASONS.get(status, 'OK')}\r\n"
+        "Content-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+    )
+    return head.encode("latin-1") + body
+
+
+async def _read_request(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    """Lit une requête HTTP/1.x. Renvoie None si le client a fermé proprement la connexion."""
+    try:
+        raw = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), ASYNC_INGEST_KEEPALIVE_SECONDS)
+    except asyncio.IncompleteReadError as exc:
+        if not exc.partial.strip():
+            return None
+        raise _HttpError(400, "requête incomplète")
+    except asyncio.LimitOverrunError:
+        raise _HttpError(400, "en-têtes trop longs")
+    except asyncio.TimeoutError:
+        return None
+
+    lines = raw.decode("latin-1").split("\r\n")
+    try:
+        method, target, version = lines[0].split(" ", 2)
+    except ValueError:
+        raise _HttpError(400, "ligne de requête invalide")
+    headers: Dict[str, str] = {}
+    for line in lines[1:]:
+        if not line:
+            continue
+        name, _, value = line.partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+    if "chunked" in headers.get("transfer-encoding", "").lower():
+        raise _HttpError(411, "Content-Length requis")
+    try:
+        length = int(headers.get("content-length", "0"))
+    except ValueError:
+        raise _HttpError(400, "Content-Length invalide")
+    if length > ASYNC_INGEST_MAX_BODY_BYTES:
+        raise _HttpError(413, "corps trop volumineux")
+    if length and headers.get("expect", "").lower() == "100-continue":
+        writer.write(b"HTTP/1.1 100 Continue\r\n\r\n")
+    try:
+        body = await asyncio.wait_for(reader.readexactly(length), ASYNC_INGEST_KEEPALIVE_SECONDS) if length else b""
+    except (asyncio.IncompleteReadError, asyncio.TimeoutError):
+        raise _HttpError(408, "corps incomplet")
+    return method.upper(), target.split("?", 1)[0], version.upper(), headers, body
+
+
+async def _org_for_token(token: str) -> str | None:
+    # cache hits stay on the event loop, misses query SQLite in a worker thread
+    found, org_id = main._API_KEY_CACHE.get(token)
+    if found:
+        return org_id
+    return await asyncio.get_running_loop().run_in_executor(None, main._get_org_for_key, token)
+
+
+async def _handle_report(headers: Dict[str, str], body: bytes, client: str | None) -> tuple[Dict[str, object], int]:
+    try:
+        payload = json.loads(body) if body else {}
+    except ValueError:
+        payload = {}
+    # same rules as main._check_org_key: Authorization header, else "token" in the JSON body
+    token = headers.get("authorization", "").replace("Bearer", "").strip()
+    if not token and isinstance(payload, dict):
+        token = str(payload.get("token", "")).strip()
+    org_id = await _org_for_token(token) if token else None
+    if not org_id:
+        return {"error": "Unauthorized"}, 403
+    # _FLEET_INDEX_LOCK is shared with the reaper / sync / alert threads, and a full write
+    # queue falls back to a synchronous SQLite write: either would stall every connection
+    return await asyncio.get_running_loop().run_in_executor(None, main._ingest_fleet_report, org_id, payload, client)
+
+
+async def _handle_batch(headers: Dict[str, str], body: bytes, client: str | None) -> tuple[Dict[str, object], int]:
+    # authenticate before parsing: an unknown client must not cost a full decode of the batch
+    token = headers.get("authorization", "").replace("Bearer", "").strip()
+    if not token and "ndjson" not in headers.get("content-type", "").lower():
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            payload = None
+        if isinstance(payload, dict):
+            token = str(payload.get("token", "")).strip()
+    org_id = await _org_for_token(token) if token else None
+    if not org_id:
+        return {"error": "Unauthorized"}, 403
+    items = main._parse_fleet_batch(body, headers.get("content-type"))
+    if items is None:
+        return {"error": 'corps attendu : NDJSON, tableau JSON ou {"items": [...]}'}, 400
+    # the whole batch is one SQLite transaction: keep it off the event loop
+    return await asyncio.get_running_loop().run_in_executor(None, main._ingest_fleet_batch, org_id, items, client)
+
+
+_ROUTES = {
+    "/api/fleet/report": _handle_report,
+    "/api/fleet/report/batch": _handle_batch,
+}
+
+
+async def _serve_connection(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    peer = writer.get_extra_info("peername")
+    client = peer[0] if isinstance(peer, tuple) else None
+    _STATS["connections"] += 1
+    _STATS["open_connections"] += 1
+    try:
+        while True:
+            keep_alive = False
+            try:
+                request = await _read_request(reader, writer)
+                if request is None:
+                    return
+                method, path, version, headers, body = request
+                connection = headers.get("connection", "").lower()
+                keep_alive = connection != "close" if version == "HTTP/1.1" else connection == "keep-alive"
+                handler = _ROUTES.get(path)
+                if handler is None:
+                    raise _HttpError(404, "not found")
+                if method != "POST":
+                    raise _HttpError(405, "POST attendu")
+                payload, status = await handler(headers, body, client)
+                _STATS["requests"] += 1
+            except _HttpError as exc:
+                _STATS["errors"] += 1
+                payload, status = {"error": exc.message}, exc.status
+                # the rest of the stream cannot be trusted after a framing error
+                keep_alive = keep_alive and exc.status in (404, 405)
+            except Exception as exc:  # pragma: no cover - last-resort guard
+                _STATS["errors"] += 1
+                payload, status, keep_alive = {"error": str(exc)}, 500, False
+            writer.write(_response(status, payload, keep_alive))
+            await writer.drain()
+            if not keep_alive:
+                return
+    except (ConnectionError, asyncio.CancelledError):
+        return
+    finally:
+        _STATS["open_connections"] -= 1
+        writer.close()
+
+
+async def _refresh_api_keys() -> None:
+    """Relit la génération des clés API (révocations faites par d'autres process)."""
+    loop = asyncio.get_running_loop()
+    while True:
+        await asyncio.sleep(main.API_KEY_GENERATION_CHECK_SECONDS)
+        try:
+            await loop.run_in_executor(None, main._API_KEY_CACHE.check_generation)
+        except Exception:
+            continue
+
+
+async def serve(host: str, port: int, reuse_port: bool = False) -> None:
+    main._start_fleet_services()
+    server = await asyncio.start_server(
+        _serve_connection, host, port,
+        limit=_MAX_HEADER_BYTES, backlog=4096, reuse_port=reuse_port or None,
+    )
+    refresher = asyncio.create_task(_refresh_api_keys())
+    print(f"[async-ingest] écoute sur http://{host}:{port}/api/fleet/report")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        refresher.cancel()
+        main._FLEET_WRITER.flush()
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Serveur d'ingestion fleet asyncio")
+    parser.add_argument("--host", default="127.0.0.1", help="Adresse d'écoute (défaut 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8001, help="Port d'écoute (défaut 8001)")
+    parser.add_argument("--reuse-port", action="store_true", help="SO_REUSEPORT : plusieurs process sur le même port")
+    return parser.parse_args()
+
+
+def run() -> None:
+    args = parse_args()
+    started = time.time()
+    try:
+        asyncio.run(serve(args.host, args.port, args.reuse_port))
+    except KeyboardInterrupt:
+        print(f"[async-ingest] arrêt après {time.time() - started:.0f}s, {_STATS['requests']} rapports")
+
+
+if __name__ == "__main__":
+    run()
@@ -2,14 +2,19 @@
 """Agent léger qui remonte des métriques vers /api/fleet/report.
 - Nécessite psutil.
 - Utilise FLEET_TOKEN pour l'authentification.
+- Connexion HTTP persistante (keep-alive) ; en cas d'échec, les rapports vont dans un spool
+  disque borné (NDJSON) rejoué par lots via /api/fleet/report/batch au retour du serveur.
+- Avec --heartbeat, un rapport complet n'est envoyé que si une métrique sort de sa bande
+  morte (ou après --max-staleness secondes) ; sinon un simple heartbeat.
 """
 import argparse
+import http.client
 import json
 import os
+import random
 import socket
 import time
-import urllib.error
-import urllib.request
+import urllib.parse
 from pathlib import Path
 
 import psutil
@@ -25,6 +30,7 @@ def _format_hms(seconds: float) -> str:
     return f"{hours:02d}:{minutes:02d}:{secs:02d}"
 
 
+# même calcul que main._health_score avec la configuration par défaut (le serveur recalcule si elle diffère)
 def _health_score(stats: dict) -> dict:
     def clamp(x: float) -> float:
         return max(0.0, min(1.0, x))
@@ -59,43 +65,239 @@ def _health_score(stats: dict) -> dict:
     }
 
 
-def collect_agent_stats() -> dict:
-    cpu_percent = psutil.cpu_percent(interval=0.3)
-    ram = psutil.virtual_memory()
-    disk = psutil.disk_usage(Path.home().anchor or "/")
-    uptime_seconds = time.time() - psutil.boot_time()
-
-    stats = {
-        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
-        "cpu_percent": cpu_percent,
-        "ram_percent": ram.percent,
-        "ram_used_gib": _format_bytes_to_gib(ram.used),
-        "ram_total_gib": _format_bytes_to_gib(ram.total),
-        "disk_percent": disk.percent,
-        "disk_used_gib": _format_bytes_to_gib(disk.used),
-        "disk_total_gib": _format_bytes_to_gib(disk.total),
-        "uptime_seconds": uptime_seconds,
-        "uptime_hms": _format_hms(uptime_seconds),
-    }
-    stats["health"] = _health_score(stats)
-    return stats
-
-
-def post_report(url: str, token: str, machine_id: str, report: dict) -> tuple[bool, str]:
-    payload = {"machine_id": machine_id, "report": report}
-    data = json.dumps(payload).encode("utf-8")
-    headers = {"Content-Type": "application/json", "Authorization": f"Bearer {token}"}
-    req = urllib.request.Request(url, data=data, headers=headers, method="POST")
-    try:
-        with urllib.request.urlopen(req, timeout=5) as resp:
-            ok = 200 <= resp.getcode() < 300
-            return ok, f"HTTP {resp.getcode()}"
-    except urllib.error.HTTPError as exc:  # pragma: no cover
-        return False, f"HTTPError {exc.code}"
-    except urllib.error.URLError as exc:  # pragma: no cover
-        return False, f"URLError {exc.reason}"
-    except Exception as exc:  # pragma: no cover
-        return False, str(exc)
+class Collector:
+    """Collecte des métriques à coût minimal.
+
+    Le CPU est mesuré sans bloquer : `psutil.cpu_percent(interval=None)` donne l'utilisation
+    depuis l'appel précédent, donc sur tout l'intervalle entre deux rapports. L'heure de
+    démarrage, le point de montage surveillé et les tailles totales (RAM, disque) sont lus
+    une seule fois. Chaque rapport indique son propre coût de collecte (`collect_ms`).
+    Seul le premier rapport attend que `FIRST_SAMPLE_SECONDS` se soient écoulées depuis la
+    création (sinon le CPU vaudrait 0.0 et fausserait score et bandes mortes).
+    """
+
+    FIRST_SAMPLE_SECONDS = 0.3
+
+    def __init__(self) -> None:
+        self.boot_time = psutil.boot_time()
+        self.disk_target = Path.home().anchor or "/"
+        self.ram_total_gib = _format_bytes_to_gib(psutil.virtual_memory().total)
+        self.disk_total_gib = _format_bytes_to_gib(psutil.disk_usage(self.disk_target).total)
+        # first call only sets the reference point for the next delta
+        psutil.cpu_percent(interval=None)
+        self._primed_at: float | None = time.monotonic()
+
+    def collect(self) -> dict:
+        if self._primed_at is not None:
+            # the first delta needs a window of its own: wait once, as the server's sampler does
+            remaining = self.FIRST_SAMPLE_SECONDS - (time.monotonic() - self._primed_at)
+            if remaining > 0:
+                time.sleep(remaining)
+            self._primed_at = None
+        start = time.perf_counter()
+        cpu_percent = psutil.cpu_percent(interval=None)
+        ram = psutil.virtual_memory()
+        disk = psutil.disk_usage(self.disk_target)
+        uptime_seconds = time.time() - self.boot_time
+
+        stats = {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "cpu_percent": cpu_percent,
+            "ram_percent": ram.percent,
+            "ram_used_gib": _format_bytes_to_gib(ram.used),
+            "ram_total_gib": self.ram_total_gib,
+            "disk_percent": disk.percent,
+            "disk_used_gib": _format_bytes_to_gib(disk.used),
+            "disk_total_gib": self.disk_total_gib,
+            "uptime_seconds": uptime_seconds,
+            "uptime_hms": _format_hms(uptime_seconds),
+        }
+        stats["health"] = _health_score(stats)
+        stats["collect_ms"] = round((time.perf_counter() - start) * 1000, 3)
+        return stats
+
+
+class ReportClient:
+    """Client HTTP(S) à connexion persistante : une seule poignée de main TLS tant que le
+    serveur garde la connexion ouverte. Une connexion keep-alive fermée côté serveur est
+    rouverte une fois avant de déclarer l'envoi en échec."""
+
+    def __init__(self, server: str, token: str, timeout: float = 5.0) -> None:
+        parsed = urllib.parse.urlsplit(server)
+        self.https = parsed.scheme == "https"
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port
+        self.base_path = parsed.path.rstrip("/")
+        self.token = token
+        self.timeout = timeout
+        self._conn: http.client.HTTPConnection | None = None
+
+    def _connection(self) -> http.client.HTTPConnection:
+        if self._conn is None:
+            cls = http.client.HTTPSConnection if self.https else http.client.HTTPConnection
+            self._conn = cls(self.host, self.port, timeout=self.timeout)
+        return self._conn
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def post(self, path: str, body: bytes, content_type: str = "application/json") -> tuple[int, bytes]:
+        headers = {
+            "Content-Type": content_type,
+            "Authorization": f"Bearer {self.token}",
+            "Connection": "keep-alive",
+        }
+        while True:
+            reused = self._conn is not None
+            conn = self._connection()
+            try:
+                conn.request("POST", self.base_path + path, body=body, headers=headers)
+                resp = conn.getresponse()
+                data = resp.read()
+                if resp.will_close:
+                    self.close()
+                return resp.status, data
+            except (http.client.HTTPException, OSError):
+                self.close()
+                # an idle keep-alive connection may have been closed by the server: one new try
+                if not reused:
+                    raise
+
+
+class Backoff:
+    """Délai exponentiel avec gigue entre deux tentatives après un échec."""
+
+    def __init__(self, base: float = 5.0, maximum: float = 300.0) -> None:
+        self.base = base
+        self.maximum = maximum
+        self.failures = 0
+        self.next_try = 0.0
+
+    def ready(self) -> bool:
+        return time.monotonic() >= self.next_try
+
+    def success(self) -> None:
+        self.failures = 0
+        self.next_try = 0.0
+
+    def failure(self) -> float:
+        self.failures += 1
+        delay = min(self.maximum, self.base * (2 ** (self.failures - 1)))
+        delay *= random.uniform(0.5, 1.0)
+        self.next_try = time.monotonic() + delay
+        return delay
+
+
+class Spool:
+    """File disque bornée (NDJSON, un rapport par ligne) des rapports non envoyés.
+
+    Au-delà de `max_bytes`, les rapports les plus anciens sont abandonnés : pendant une
+    longue coupure, on garde la période la plus récente.
+    """
+
+    def __init__(self, path: Path, max_bytes: int) -> None:
+        self.path = path
+        self.max_bytes = max_bytes
+        self.dropped = 0
+
+    def __len__(self) -> int:
+        try:
+            with self.path.open("rb") as fh:
+                return sum(1 for line in fh if line.strip())
+        except OSError:
+            return 0
+
+    def append(self, item: dict) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self.path.open("ab") as fh:
+            fh.write(json.dumps(item, separators=(",", ":")).encode("utf-8") + b"\n")
+        if self.path.stat().st_size > self.max_bytes:
+            self._trim()
+
+    def _trim(self) -> None:
+        lines = self.path.read_bytes().splitlines(keepends=True)
+        keep: list[bytes] = []
+        size = 0
+        # keep the newest lines, down to 80% of the limit so trimming is not done on every append
+        for line in reversed(lines):
+            if size + len(line) > self.max_bytes * 0.8:
+                break
+            keep.append(line)
+            size += len(line)
+        self.dropped += len(lines) - len(keep)
+        self._rewrite(list(reversed(keep)))
+
+    def _rewrite(self, lines: list[bytes]) -> None:
+        tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+        tmp.write_bytes(b"".join(lines))
+        os.replace(tmp, self.path)
+
+    def peek(self, count: int) -> list[bytes]:
+        try:
+            with self.path.open("rb") as fh:
+                lines = []
+                for line in fh:
+                    if line.strip():
+                        lines.append(line)
+                    if len(lines) >= count:
+                        break
+                return lines
+        except OSError:
+            return []
+
+    def pop(self, count: int) -> None:
+        try:
+            lines = [line for line in self.path.read_bytes().splitlines(keepends=True) if line.strip()]
+        except OSError:
+            return
+        self._rewrite(lines[count:])
+
+
+class ChangeDetector:
+    """Décide entre rapport complet et heartbeat, par rapport au dernier rapport complet accepté."""
+
+    def __init__(self, deadbands: dict[str, float], max_staleness: float) -> None:
+        self.deadbands = deadbands
+        self.max_staleness = max_staleness
+        self.last: dict | None = None
+        self.last_sent = 0.0
+
+    def needs_full(self, report: dict) -> bool:
+        if self.last is None or time.monotonic() - self.last_sent >= self.max_staleness:
+            return True
+        if report["health"]["status"] != self.last["health"]["status"]:
+            return True
+        return any(abs(float(report[key]) - float(self.last[key])) >= band for key, band in self.deadbands.items())
+
+    def sent(self, report: dict) -> None:
+        self.last = report
+        self.last_sent = time.monotonic()
+
+    def reset(self) -> None:
+        self.last = None
+
+
+def replay_spool(client: ReportClient, path: str, spool: Spool, batch_size: int, max_batches: int) -> int:
+    """Renvoie le spool par lots NDJSON. Retourne le nombre de rapports acceptés ;
+    lève OSError / http.client.HTTPException si le serveur est injoignable."""
+    sent = 0
+    for _ in range(max_batches):
+        lines = spool.peek(batch_size)
+        if not lines:
+            break
+        status, _ = client.post(path, b"".join(lines), "application/x-ndjson")
+        if status != 200:
+            # 503: nothing was committed, try again later; 4xx on the whole batch will not heal
+            if 400 <= status < 500 and status not in (403, 408, 413, 429):
+                spool.pop(len(lines))
+                continue
+            raise OSError(f"HTTP {status}")
+        # per-item 400s are invalid reports: dropping them with the rest of the batch is fine
+        spool.pop(len(lines))
+        sent += len(lines)
+    return sent
 
 
 def main() -> None:
@@ -105,6 +307,17 @@ def main() -> None:
     parser.add_argument("--interval", type=float, default=10.0, help="Intervalle en secondes")
     parser.add_argument("--token", default=os.environ.get("FLEET_TOKEN", ""), help="FLEET_TOKEN (sinon variable d'env)")
     parser.add_argument("--machine-id", default=socket.gethostname(), help="Identifiant machine")
+    parser.add_argument("--spool", default=str(Path.home() / ".dashfleet" / "spool.ndjson"),
+                        help="Fichier spool des rapports non envoyés (vide pour désactiver)")
+    parser.add_argument("--spool-max-mb", type=float, default=5.0, help="Taille max du spool en Mo (défaut 5)")
+    parser.add_argument("--batch-size", type=int, default=200, help="Rapports par lot lors du rejeu du spool")
+    parser.add_argument("--heartbeat", action="store_true",
+                        help="Heartbeat seul tant que les métriques restent dans les bandes mortes")
+    parser.add_argument("--deadband-cpu", type=float, default=5.0, help="Bande morte CPU en points de %% (défaut 5)")
+    parser.add_argument("--deadband-ram", type=float, default=2.0, help="Bande morte RAM en points de %% (défaut 2)")
+    parser.add_argument("--deadband-disk", type=float, default=1.0, help="Bande morte disque en points de %% (défaut 1)")
+    parser.add_argument("--max-staleness", type=float, default=300.0,
+                        help="Rapport complet au moins toutes les N secondes en mode heartbeat (défaut 300)")
     args = parser.parse_args()
 
     if not args.token:
@@ -114,9 +327,55 @@ def main() -> None:
     url = args.server.rstrip("/") + args.path
     print(f"Agent démarré -> {url} (id={args.machine_id}, intervalle={args.interval}s)")
 
+    client = ReportClient(args.server, args.token)
+    backoff = Backoff(base=max(1.0, args.interval))
+    spool = Spool(Path(args.spool), int(args.spool_max_mb * 1024 * 1024)) if args.spool else None
+    batch_path = args.path.rstrip("/") + "/batch"
+    detector = ChangeDetector(
+        {"cpu_percent": args.deadband_cpu, "ram_percent": args.deadband_ram, "disk_percent": args.deadband_disk},
+        args.max_staleness,
+    ) if args.heartbeat else None
+    heartbeat_body = json.dumps({"machine_id": args.machine_id, "heartbeat": True}).encode("utf-8")
+
+    collector = Collector()
     while True:
-        report = collect_agent_stats()
-        ok, msg = post_report(url, args.token, args.machine_id, report)
+        report = collector.collect()
+        item = {"machine_id": args.machine_id, "ts": time.time(), "report": report}
+        retryable = True
+        if backoff.ready():
+            full = detector is None or detector.needs_full(report)
+            try:
+                full_body = json.dumps({"machine_id": args.machine_id, "report": report}).encode("utf-8")
+                code, _ = client.post(args.path, full_body if full else heartbeat_body)
+                if not full and code == 409:
+                    # the server does not know this machine (restart, expiry): send everything
+                    detector.reset()
+                    full = True
+                    code, _ = client.post(args.path, full_body)
+                ok, msg = 200 <= code < 300, f"HTTP {code}" + ("" if full else " (heartbeat)")
+                if ok and full and detector is not None:
+                    detector.sent(report)
+                # 4xx (bad token, invalid report) will fail the same way on replay
+                retryable = code >= 500 or code == 429
+            except (http.client.HTTPException, OSError) as exc:
+                ok, msg = False, f"{type(exc).__name__} {exc}"
+            if ok:
+                backoff.success()
+                if spool is not None:
+                    try:
+                        replayed = replay_spool(client, batch_path, spool, args.batch_size, max_batches=5)
+                        if replayed:
+                            msg += f" | spool: {replayed} rapport(s) renvoyé(s)"
+                    except (http.client.HTTPException, OSError) as exc:
+                        msg += f" | spool: {exc}"
+            else:
+                delay = backoff.failure()
+                msg += f" | nouvel essai dans {delay:.0f}s"
+        else:
+            ok, msg = False, "serveur indisponible (attente)"
+        if not ok and retryable and spool is not None:
+            spool.append(item)
+            msg += f" | spool: {len(spool)}"
         status = "OK" if ok else "KO"
         print(f"[{time.strftime('%H:%M:%S')}] {status} {msg} | CPU {report['cpu_percent']:.1f}% RAM {report['ram_percent']:.1f}% Disk {report['disk_percent']:.1f}% Score {report['health']['score']}/100")
         time.sleep(max(1.0, args.interval))
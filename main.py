@@ -4,10 +4,19 @@ Fonctionne en mode CLI ou via une petite UI web Flask.
 from __future__ import annotations
 
 import argparse
+import atexit
+import bisect
+import contextlib
 import csv
 import datetime as dt
+import gzip
+import heapq
+import io
 import json
+import math
+import operator
 import os
+import queue
 import shutil
 import subprocess
 import sys
@@ -19,33 +28,138 @@ import urllib.request
 import webbrowser
 import zipfile
 import uuid
+import zlib
+from collections import OrderedDict
 from pathlib import Path
-from typing import Dict, Iterable
+from typing import Callable, Dict, Iterable, Sequence
 
 import psutil
-from flask import Flask, jsonify, render_template, request
+from flask import Flask, Response, jsonify, render_template, request, stream_with_context
 import sqlite3
 import secrets
 
+# optional accelerators for large fleet listings (plain json / gzip are used without them)
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import brotli
+except ImportError:
+    brotli = None
+# optional: vectorized health scoring / percentiles over the whole fleet (pure Python loop without it)
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 # Seuils d’alerte (pourcentage).
 CPU_ALERT = 80.0
 RAM_ALERT = 90.0
 
+
+def _health_env(name: str, default: Dict[str, float], valid: Callable[[float], bool],
+                bounds: str) -> Dict[str, float]:
+    """Lit `cpu=0.4,ram=0.3,disk=0.3` ; une clé absente garde sa valeur par défaut."""
+    values = dict(default)
+    for item in filter(None, (part.strip() for part in os.environ.get(name, "").split(","))):
+        key, _, value = item.partition("=")
+        if key.strip() not in values:
+            raise ValueError(f"{name} : clé inconnue {key.strip()!r} (cpu, ram, disk)")
+        number = float(value)
+        if not valid(number):
+            raise ValueError(f"{name} : {key.strip()}={value.strip()} hors bornes ({bounds})")
+        values[key.strip()] = number
+    return values
+
+
+# Score de santé : chaque composant est plein jusqu'à son seuil (%) et tombe à 0 à 100 %,
+# puis pondéré ; statut ok / warn / critical selon le score. Les agents (fleet_agent.py)
+# calculent avec les valeurs par défaut : si la configuration du serveur diffère, il
+# recalcule `health` des rapports reçus et de la flotte déjà en mémoire au démarrage.
+_HEALTH_DEFAULT_THRESHOLDS = {"cpu": 50.0, "ram": 60.0, "disk": 70.0}
+_HEALTH_DEFAULT_WEIGHTS = {"cpu": 0.35, "ram": 0.35, "disk": 0.30}
+# seuil < 100 : le composant est divisé par (100 - seuil)
+HEALTH_THRESHOLDS = _health_env("HEALTH_THRESHOLDS", _HEALTH_DEFAULT_THRESHOLDS,
+                                lambda value: 0 <= value < 100, "0 <= seuil < 100")
+HEALTH_WEIGHTS = _health_env("HEALTH_WEIGHTS", _HEALTH_DEFAULT_WEIGHTS,
+                             lambda value: 0 <= value <= 1, "0 <= poids <= 1")
+if abs(sum(HEALTH_WEIGHTS.values()) - 1) > 1e-6:
+    raise ValueError(f"HEALTH_WEIGHTS : la somme des poids vaut {sum(HEALTH_WEIGHTS.values()):g} au lieu de 1")
+HEALTH_OK_SCORE = int(os.environ.get("HEALTH_OK_SCORE", "80"))
+HEALTH_WARN_SCORE = int(os.environ.get("HEALTH_WARN_SCORE", "60"))
+if not 0 <= HEALTH_WARN_SCORE <= HEALTH_OK_SCORE <= 100:
+    raise ValueError(f"HEALTH_WARN_SCORE / HEALTH_OK_SCORE : {HEALTH_WARN_SCORE} / {HEALTH_OK_SCORE} "
+                     "hors bornes (0 <= warn <= ok <= 100)")
+HEALTH_RESCORE = (HEALTH_THRESHOLDS, HEALTH_WEIGHTS, HEALTH_OK_SCORE, HEALTH_WARN_SCORE) != (
+    _HEALTH_DEFAULT_THRESHOLDS, _HEALTH_DEFAULT_WEIGHTS, 80, 60)
+
 DEFAULT_HISTORY_CSV = Path("logs/metrics.csv")
+# index d'offsets de l'historique CSV : une entrée (timestamp, offset) tous les N octets
+HISTORY_INDEX_STRIDE = int(os.environ.get("HISTORY_INDEX_STRIDE", str(256 * 1024)))
+# base de séries temporelles : échantillons bruts + agrégats 1 min / 1 h / 1 jour (min/moy/max)
+HISTORY_DB_PATH = Path("data/history.db")
+HISTORY_RAW_RETENTION_DAYS = float(os.environ.get("HISTORY_RAW_RETENTION_DAYS", "7"))
+HISTORY_MAX_POINTS = 1000
+HISTORY_RESOLUTIONS = {"1m": 60, "1h": 3600, "1d": 86400}
 DEFAULT_EXPORT_CSV = Path.home() / "Desktop" / "metrics.csv"
 DEFAULT_EXPORT_JSONL = Path.home() / "Desktop" / "metrics.jsonl"
 ACTION_TOKEN = os.environ.get("ACTION_TOKEN")  # optionnel, protège les actions si défini
 WEBHOOK_URL = os.environ.get("WEBHOOK_URL")  # optionnel, webhook si santé critique
 WEBHOOK_MIN_SECONDS = int(os.environ.get("WEBHOOK_MIN_SECONDS", "300"))
+# file d'envoi des webhooks : taille max, fenêtre de regroupement des alertes, nombre d'essais
+WEBHOOK_QUEUE_MAX = int(os.environ.get("WEBHOOK_QUEUE_MAX", "100"))
+WEBHOOK_COALESCE_SECONDS = float(os.environ.get("WEBHOOK_COALESCE_SECONDS", "10"))
+WEBHOOK_MAX_ATTEMPTS = int(os.environ.get("WEBHOOK_MAX_ATTEMPTS", "5"))
+# période de rafraîchissement de l'instantané servi par /api/stats et /api/status
+STATS_SAMPLE_SECONDS = float(os.environ.get("STATS_SAMPLE_SECONDS", "1"))
 FLEET_TOKEN = os.environ.get("FLEET_TOKEN")  # token obligatoire pour les rapports agents
 FLEET_TTL_SECONDS = int(os.environ.get("FLEET_TTL_SECONDS", "600"))  # expiration des entrées fleet
+# machine "silencieuse" après N secondes sans rapport (événement offline / online), 0 pour désactiver
+FLEET_OFFLINE_SECONDS = int(os.environ.get("FLEET_OFFLINE_SECONDS", "120"))
 FLEET_STATE_PATH = Path("logs/fleet_state.json")
 FLEET_DB_PATH = Path("data/fleet.db")
+# intervalle d'écriture du backup JSON (découplé du rythme des rapports agents)
+FLEET_JSON_BACKUP_SECONDS = float(os.environ.get("FLEET_JSON_BACKUP_SECONDS", "5"))
+# écriture différée des rapports : une transaction par lot de N rapports ou toutes les M ms
+FLEET_WRITE_BATCH = int(os.environ.get("FLEET_WRITE_BATCH", "500"))
+FLEET_WRITE_FLUSH_MS = float(os.environ.get("FLEET_WRITE_FLUSH_MS", "200"))
+FLEET_WRITE_QUEUE_MAX = int(os.environ.get("FLEET_WRITE_QUEUE_MAX", "100000"))
+# délai max avant qu'un worker voie les rapports reçus par les autres workers (compteur fleet_meta.seq)
+FLEET_SYNC_SECONDS = float(os.environ.get("FLEET_SYNC_SECONDS", "1"))
+# période du thread qui supprime les machines expirées (hors du chemin des requêtes)
+FLEET_REAP_SECONDS = float(os.environ.get("FLEET_REAP_SECONDS", "10"))
+# taille minimale (octets) d'une réponse JSON de la flotte avant compression gzip/brotli
+FLEET_COMPRESS_MIN_BYTES = int(os.environ.get("FLEET_COMPRESS_MIN_BYTES", "1024"))
+# nombre maximal de rapports par appel à /api/fleet/report/batch
+FLEET_BATCH_MAX_ITEMS = int(os.environ.get("FLEET_BATCH_MAX_ITEMS", "5000"))
+# durée de conservation des "tombstones" (machines expirées) pour les requêtes /api/fleet?since=
+FLEET_TOMBSTONE_SECONDS = int(os.environ.get("FLEET_TOMBSTONE_SECONDS", "86400"))
+# historique par machine (tables fleet_metrics_YYYYMMDD, une par jour UTC, supprimées en bloc)
+FLEET_METRICS_RETENTION_DAYS = int(os.environ.get("FLEET_METRICS_RETENTION_DAYS", "30"))
+FLEET_DB_MMAP_BYTES = int(os.environ.get("FLEET_DB_MMAP_BYTES", str(256 * 1024 * 1024)))
+# cache clé API -> org_id (entrées positives et négatives, LRU borné)
+API_KEY_CACHE_SIZE = int(os.environ.get("API_KEY_CACHE_SIZE", "10000"))
+API_KEY_CACHE_TTL = float(os.environ.get("API_KEY_CACHE_TTL", "300"))
+# délai max de propagation d'une révocation vers les autres workers
+API_KEY_GENERATION_CHECK_SECONDS = float(os.environ.get("API_KEY_GENERATION_CHECK_SECONDS", "1"))
 
 # DB schema notes:
 # - organizations(id TEXT PRIMARY KEY, name TEXT)
 # - api_keys(key TEXT PRIMARY KEY, org_id TEXT, created_at REAL, revoked INTEGER)
-# - fleet(id TEXT PRIMARY KEY, report TEXT, ts REAL, client TEXT, org_id TEXT)
+# - fleet(id TEXT PRIMARY KEY, report TEXT, ts REAL, client TEXT, org_id TEXT, seq INTEGER)
+#   id = "<org_id>:<machine_id>", seq = numéro de changement (fleet_meta 'seq') du dernier upsert
+# - fleet_meta(key TEXT PRIMARY KEY, value INTEGER) : compteurs partagés entre workers
+#   ('seq' pour la flotte, 'api_keys_generation' pour les clés API, 'alert_rules_generation'
+#   pour les règles d'alerte, 'webhook:<clé>' pour l'anti-rebond des webhooks)
+# - fleet_metrics_YYYYMMDD(org_id TEXT, machine_id TEXT, ts REAL, cpu REAL, ram REAL, disk REAL,
+#   score INTEGER, status TEXT) : historique append-only, une table par jour UTC
+# - fleet_tombstones(id TEXT PRIMARY KEY, org_id TEXT, machine_id TEXT, seq INTEGER, ts REAL) :
+#   machines supprimées par le reaper, pour les requêtes delta (`since`)
+# - fleet_alert_rules(id TEXT PRIMARY KEY, org_id TEXT, rule TEXT, created_at REAL) : règles
+#   d'alerte par org (JSON, voir _parse_alert_rule)
+# - fleet_stream_tokens(token TEXT PRIMARY KEY, org_id TEXT, expires REAL) : jetons courts du flux
+#   SSE (EventSource ne peut pas envoyer d'en-tête ; la clé API ne passe jamais dans l'URL)
 
 app = Flask(__name__, template_folder="templates", static_folder="static")
 
@@ -78,14 +192,16 @@ def _health_score(stats: Dict[str, object]) -> Dict[str, object]:
     cpu = float(stats["cpu_percent"])
     ram = float(stats["ram_percent"])
     disk = float(stats["disk_percent"])
+    thresholds = HEALTH_THRESHOLDS
 
-    # Scores par composant (1 = parfait, 0 = mauvais)
-    cpu_score = clamp(1 - max(0.0, (cpu - 50) / 50))  # plein à 50%, tombe à 0 à 100%
-    ram_score = clamp(1 - max(0.0, (ram - 60) / 40))  # plein à 60%, tombe à 0 à 100%
-    disk_score = clamp(1 - max(0.0, (disk - 70) / 30))  # plein à 70%, 0 à 100%
+    # Scores par composant (1 = parfait, 0 = mauvais) ; par défaut plein à 50 % (CPU),
+    # 60 % (RAM), 70 % (disque), 0 à 100 %
+    cpu_score = clamp(1 - max(0.0, (cpu - thresholds["cpu"]) / (100 - thresholds["cpu"])))
+    ram_score = clamp(1 - max(0.0, (ram - thresholds["ram"]) / (100 - thresholds["ram"])))
+    disk_score = clamp(1 - max(0.0, (disk - thresholds["disk"]) / (100 - thresholds["disk"])))
 
     # Pondérations simples
-    weights = {"cpu": 0.35, "ram": 0.35, "disk": 0.30}
+    weights = HEALTH_WEIGHTS
     overall = (
         cpu_score * weights["cpu"]
         + ram_score * weights["ram"]
@@ -93,9 +209,9 @@ def _health_score(stats: Dict[str, object]) -> Dict[str, object]:
     )
 
     score = round(overall * 100)
-    if score >= 80:
+    if score >= HEALTH_OK_SCORE:
         status = "ok"
-    elif score >= 60:
+    elif score >= HEALTH_WARN_SCORE:
         status = "warn"
     else:
         status = "critical"
@@ -111,20 +227,733 @@ def _health_score(stats: Dict[str, object]) -> Dict[str, object]:
     }
 
 
-_LAST_WEBHOOK_TS = 0.0
+def _health_scores(cpu: Sequence[float], ram: Sequence[float], disk: Sequence[float]) -> Dict[str, object]:
+    """`_health_score` en colonnes : une passe sur les tableaux CPU/RAM/disque de toute une flotte.
+
+    Renvoie `score`, `status` et `components` (`cpu`, `ram`, `disk`), un élément par machine,
+    identiques au calcul scalaire : mêmes opérations flottantes dans le même ordre, `fmax`/`fmin`
+    ayant le comportement de `max`/`min` sur NaN et `rint` l'arrondi au pair de `round`.
+    Tableaux numpy si numpy est installé, sinon listes (boucle sur `_health_score`).
+    """
+    if np is None:
+        results = [_health_score({"cpu_percent": c, "ram_percent": r, "disk_percent": d})
+                   for c, r, d in zip(cpu, ram, disk)]
+        return {
+            "score": [result["score"] for result in results],
+            "status": [result["status"] for result in results],
+            "components": {name: [result["components"][name] for result in results] for name in ("cpu", "ram", "disk")},
+        }
+
+    def component(values: Sequence[float], threshold: float):
+        values = np.asarray(values, dtype=np.float64)
+        return np.fmax(0.0, np.fmin(1.0, 1 - np.fmax(0.0, (values - threshold) / (100 - threshold))))
+
+    thresholds = HEALTH_THRESHOLDS
+    weights = HEALTH_WEIGHTS
+    cpu_score = component(cpu, thresholds["cpu"])
+    ram_score = component(ram, thresholds["ram"])
+    disk_score = component(disk, thresholds["disk"])
+    overall = cpu_score * weights["cpu"] + ram_score * weights["ram"] + disk_score * weights["disk"]
+    score = np.rint(overall * 100).astype(np.int64)
+    status = np.where(score >= HEALTH_OK_SCORE, "ok", np.where(score >= HEALTH_WARN_SCORE, "warn", "critical"))
+    return {
+        "score": score,
+        "status": status,
+        "components": {
+            "cpu": np.rint(cpu_score * 100).astype(np.int64),
+            "ram": np.rint(ram_score * 100).astype(np.int64),
+            "disk": np.rint(disk_score * 100).astype(np.int64),
+        },
+    }
+
+
+def _percentiles(values: Sequence[float], quantiles: Sequence[float] = (50, 90, 99)) -> Dict[str, float | None]:
+    """Percentiles (interpolation linéaire, comme `numpy.percentile`), arrondis au dixième."""
+    keys = [f"p{q:g}" for q in quantiles]
+    if not len(values):
+        return dict.fromkeys(keys)
+    if np is not None:
+        found = np.percentile(np.asarray(values, dtype=np.float64), quantiles)
+        return {key: round(float(value), 1) for key, value in zip(keys, found)}
+    ordered = sorted(float(value) for value in values)
+    result: Dict[str, float | None] = {}
+    for key, q in zip(keys, quantiles):
+        position = (len(ordered) - 1) * q / 100
+        low = int(position)
+        high = min(low + 1, len(ordered) - 1)
+        result[key] = round(ordered[low] + (ordered[high] - ordered[low]) * (position - low), 1)
+    return result
+
+
+_DB_LOCAL = threading.local()
+
+
+def _db(db_path: Path | None = None) -> sqlite3.Connection:
+    """Connexion SQLite du thread courant, ouverte une seule fois puis réutilisée.
+
+    WAL + synchronous=NORMAL (un fsync par checkpoint et non par commit), mmap pour les
+    lectures, et cache de requêtes préparées du module sqlite3 (`cached_statements`).
+    Les connexions sont indexées par chemin (`FLEET_DB_PATH` par défaut).
+    """
+    db_path = FLEET_DB_PATH if db_path is None else db_path
+    path = str(db_path)
+    conns = getattr(_DB_LOCAL, "conns", None)
+    if conns is None:
+        conns = _DB_LOCAL.conns = {}
+    conn = conns.get(path)
+    if conn is None:
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(path, timeout=5.0, cached_statements=256)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute(f'PRAGMA mmap_size={int(FLEET_DB_MMAP_BYTES)}')
+        conn.execute('PRAGMA temp_store=MEMORY')
+        conns[path] = conn
+    return conn
+
+
 FLEET_STATE: Dict[str, Dict[str, object]] = {}
+# index secondaires de FLEET_STATE, maintenus par _fleet_put / _fleet_remove :
+# - FLEET_BY_ORG : org_id -> {store_key: entry} (listing en O(machines de l'org))
+# - _FLEET_BUCKETS : seconde entière du ts -> store_keys, ordonnées par le tas _FLEET_BUCKET_HEAP
+#   (expiration en O(expirés))
+FLEET_BY_ORG: Dict[str | None, Dict[str, Dict[str, object]]] = {}
+_FLEET_BUCKETS: Dict[int, set[str]] = {}
+_FLEET_BUCKET_HEAP: list[int] = []
+_FLEET_INDEX_LOCK = threading.RLock()
+
+
+class _TimingWheel:
+    """Roue temporelle hiérarchique : minuteries par clé, armées/annulées en O(1).
+
+    `levels` roues de `slots` cases ; une case du niveau L couvre `slots**L` ticks. Une
+    échéance lointaine est rangée dans un niveau haut puis redescendue (cascade) quand
+    son tour arrive. `advance` ne visite que les cases des ticks écoulés et les clés échues.
+    Pas de verrou propre : appelée sous `_FLEET_INDEX_LOCK`.
+    """
+
+    def __init__(self, tick: float = 1.0, slots: int = 64, levels: int = 4) -> None:
+        self.tick = tick
+        self.slots = slots
+        self.levels = levels
+        self._wheels: list[list[set[str]]] = [[set() for _ in range(slots)] for _ in range(levels)]
+        self._deadline: Dict[str, int] = {}
+        self._where: Dict[str, tuple[int, int]] = {}
+        self._now = int(time.time() / tick)
+
+    def __len__(self) -> int:
+        return len(self._deadline)
+
+    def schedule(self, key: str, when_ts: float) -> None:
+        self.cancel(key)
+        deadline = -int(-when_ts // self.tick)
+        self._deadline[key] = deadline
+        self._place(key, deadline)
+
+    def cancel(self, key: str) -> None:
+        where = self._where.pop(key, None)
+        if where is not None:
+            self._wheels[where[0]][where[1]].discard(key)
+            del self._deadline[key]
+
+    def clear(self) -> None:
+        for wheel in self._wheels:
+            for slot in wheel:
+                slot.clear()
+        self._deadline.clear()
+        self._where.clear()
+
+    def advance(self, now_ts: float) -> list[str]:
+        """Avance jusqu'à `now_ts` et renvoie les clés échues (retirées de la roue)."""
+        target = int(now_ts / self.tick)
+        due: list[str] = []
+        while self._now < target:
+            self._now += 1
+            for level in range(self.levels - 1, 0, -1):
+                span = self.slots ** level
+                if self._now % span == 0:
+                    slot = self._wheels[level][(self._now // span) % self.slots]
+                    keys = list(slot)
+                    slot.clear()
+                    for key in keys:
+                        # due this very tick: level 0 slot processed just below
+                        self._place(key, self._deadline[key], minimum=0)
+            slot = self._wheels[0][self._now % self.slots]
+            if slot:
+                for key in slot:
+                    del self._where[key]
+                    del self._deadline[key]
+                due.extend(slot)
+                slot.clear()
+        return due
+
+    def _place(self, key: str, deadline: int, minimum: int = 1) -> None:
+        delta = max(minimum, deadline - self._now)
+        level = 0
+        while level < self.levels - 1 and delta >= self.slots ** (level + 1):
+            level += 1
+        if delta >= self.slots ** self.levels:
+            # beyond the wheel range: park in the farthest slot, placed again on cascade
+            deadline = self._now + self.slots ** self.levels - 1
+        else:
+            deadline = self._now + delta
+        index = (deadline // self.slots ** level) % self.slots
+        self._wheels[level][index].add(key)
+        self._where[key] = (level, index)
+
+
+# détection des machines silencieuses : une minuterie par machine, réarmée à chaque rapport ;
+# _FLEET_OFFLINE : store_key -> heure où la machine est devenue silencieuse
+_FLEET_WHEEL = _TimingWheel()
+_FLEET_OFFLINE: Dict[str, float] = {}
+
+_SUMMARY_METRICS = ("cpu_percent", "ram_percent", "disk_percent")
+
+
+class _MetricAggregate:
+    """min/moy/max d'une métrique en % tenus par ajout/retrait : histogramme au dixième de point
+    (min et max arrondis à 0,1) et somme entière en millièmes (pas de dérive flottante)."""
+
+    __slots__ = ("count", "total", "hist", "lo", "hi")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.total = 0
+        self.hist = [0] * 1001
+        self.lo = 1001
+        self.hi = -1
+
+    def add(self, bucket: int, milli: int) -> None:
+        self.count += 1
+        self.total += milli
+        self.hist[bucket] += 1
+        if bucket < self.lo:
+            self.lo = bucket
+        if bucket > self.hi:
+            self.hi = bucket
+
+    def remove(self, bucket: int, milli: int) -> None:
+        self.count -= 1
+        self.total -= milli
+        self.hist[bucket] -= 1
+        if not self.count:
+            self.lo, self.hi = 1001, -1
+        elif not self.hist[bucket]:
+            # the extreme moved: walk to the next non-empty bucket (amortized by the adds)
+            while not self.hist[self.lo]:
+                self.lo += 1
+            while not self.hist[self.hi]:
+                self.hi -= 1
+
+    def snapshot(self) -> Dict[str, object]:
+        if not self.count:
+            return {"min": None, "avg": None, "max": None}
+        return {"min": self.lo / 10, "avg": round(self.total / self.count / 1000, 2), "max": self.hi / 10}
+
+
+class _FleetOrgSummary:
+    __slots__ = ("machines", "offline", "status", "metrics")
+
+    def __init__(self) -> None:
+        self.machines = 0
+        self.offline = 0
+        self.status: Dict[str, int] = {}
+        self.metrics = {name: _MetricAggregate() for name in _SUMMARY_METRICS}
+
+
+class _FleetSummary:
+    """Agrégats par org de `FLEET_STATE`, tenus à jour à chaque indexation / retrait de machine.
+
+    Chaque machine garde sa contribution (org, statut, silencieuse ou non, métriques) : la
+    remplacer retire l'ancienne et ajoute la nouvelle, la lecture d'une org est O(1).
+    Appelé sous `_FLEET_INDEX_LOCK`.
+    """
+
+    def __init__(self) -> None:
+        self._orgs: Dict[str | None, _FleetOrgSummary] = {}
+        # store_key -> [org_id, status, offline, ((metric, bucket, milli), ...)]
+        self._contrib: Dict[str, list] = {}
+
+    def add(self, store_key: str, entry: Dict[str, object]) -> None:
+        report = entry.get("report") or {}
+        health = report.get("health") if isinstance(report, dict) else None
+        status = str(health.get("status") or "unknown") if isinstance(health, dict) else "unknown"
+        values = []
+        for name in _SUMMARY_METRICS:
+            value = report.get(name) if isinstance(report, dict) else None
+            if isinstance(value, (int, float)) and not isinstance(value, bool) and value == value:
+                value = min(100.0, max(0.0, float(value)))
+                values.append((name, round(value * 10), round(value * 1000)))
+        org_id = entry.get("org_id")
+        summary = self._orgs.get(org_id)
+        if summary is None:
+            summary = self._orgs[org_id] = _FleetOrgSummary()
+        offline = store_key in _FLEET_OFFLINE
+        summary.machines += 1
+        summary.offline += offline
+        summary.status[status] = summary.status.get(status, 0) + 1
+        for name, bucket, milli in values:
+            summary.metrics[name].add(bucket, milli)
+        self._contrib[store_key] = [org_id, status, offline, tuple(values)]
+
+    def remove(self, store_key: str) -> None:
+        contrib = self._contrib.pop(store_key, None)
+        if contrib is None:
+            return
+        org_id, status, offline, values = contrib
+        summary = self._orgs[org_id]
+        summary.machines -= 1
+        summary.offline -= offline
+        summary.status[status] -= 1
+        if not summary.status[status]:
+            del summary.status[status]
+        for name, bucket, milli in values:
+            summary.metrics[name].remove(bucket, milli)
+        if not summary.machines:
+            del self._orgs[org_id]
+
+    def set_offline(self, store_key: str, offline: bool) -> None:
+        contrib = self._contrib.get(store_key)
+        if contrib is None or contrib[2] == offline:
+            return
+        contrib[2] = offline
+        summary = self._orgs[contrib[0]]
+        summary.offline += 1 if offline else -1
+
+    def clear(self) -> None:
+        self._orgs.clear()
+        self._contrib.clear()
+
+    def org_ids(self) -> list[str | None]:
+        return list(self._orgs)
+
+    def get(self, org_id: str | None) -> Dict[str, object]:
+        summary = self._orgs.get(org_id)
+        if summary is None:
+            summary = _FleetOrgSummary()
+        return {
+            "machines": summary.machines,
+            "online": summary.machines - summary.offline,
+            "offline": summary.offline,
+            # sorted: the same counts give the same bytes (and ETag) in every worker
+            "status": dict(sorted(summary.status.items())),
+            **{name: aggregate.snapshot() for name, aggregate in summary.metrics.items()},
+        }
+
+
+_FLEET_SUMMARY = _FleetSummary()
+
+
+FLEET_STREAM_QUEUE_MAX = int(os.environ.get("FLEET_STREAM_QUEUE_MAX", "1000"))
+FLEET_STREAM_HEARTBEAT_SECONDS = float(os.environ.get("FLEET_STREAM_HEARTBEAT_SECONDS", "15"))
+# durée de validité d'un jeton de flux (vérifié à l'ouverture de la connexion seulement)
+FLEET_STREAM_TOKEN_SECONDS = float(os.environ.get("FLEET_STREAM_TOKEN_SECONDS", "60"))
+
+
+class _FleetStreamSubscriber:
+    __slots__ = ("org_id", "queue", "resync")
+
+    def __init__(self, org_id: str) -> None:
+        self.org_id = org_id
+        self.queue: queue.Queue = queue.Queue(maxsize=FLEET_STREAM_QUEUE_MAX)
+        # set when events were dropped (slow client) or the whole state was reloaded
+        self.resync = threading.Event()
+
+
+class _FleetStreamHub:
+    """Fan-out en mémoire des changements de la flotte vers les flux SSE ouverts.
+
+    Chaque événement est sérialisé une seule fois puis déposé dans la file bornée de chaque
+    abonné de l'org : le coût suit le rythme des changements, pas le nombre de spectateurs.
+    Un abonné trop lent perd ses événements en attente et reçoit un nouveau snapshot.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._subscribers: Dict[str, set[_FleetStreamSubscriber]] = {}
+        self.published = 0
+        self.dropped = 0
+
+    def subscribe(self, org_id: str) -> _FleetStreamSubscriber:
+        sub = _FleetStreamSubscriber(org_id)
+        with self._lock:
+            self._subscribers.setdefault(org_id, set()).add(sub)
+        return sub
+
+    def unsubscribe(self, sub: _FleetStreamSubscriber) -> None:
+        with self._lock:
+            subs = self._subscribers.get(sub.org_id)
+            if subs is not None:
+                subs.discard(sub)
+                if not subs:
+                    self._subscribers.pop(sub.org_id, None)
+
+    def has_subscribers(self, org_id: object) -> bool:
+        return org_id in self._subscribers
+
+    def publish(self, org_id: object, event: str, payload: object, encoded: bytes | None = None) -> None:
+        with self._lock:
+            subs = list(self._subscribers.get(org_id, ()))  # type: ignore[arg-type]
+        if not subs:
+            return
+        data = encoded if encoded is not None else _json_bytes(payload)
+        message = f"event: {event}\ndata: {data.decode('utf-8')}\n\n"
+        self.published += 1
+        for sub in subs:
+            try:
+                sub.queue.put_nowait(message)
+            except queue.Full:
+                self.dropped += 1
+                sub.resync.set()
+
+    def resync_all(self) -> None:
+        with self._lock:
+            subs = [sub for group in self._subscribers.values() for sub in group]
+        for sub in subs:
+            sub.resync.set()
+
+    def metrics(self) -> Dict[str, int]:
+        with self._lock:
+            viewers = sum(len(group) for group in self._subscribers.values())
+        return {"subscribers": viewers, "published": self.published, "dropped": self.dropped}
+
+
+_FLEET_STREAM = _FleetStreamHub()
+
+
+def _publish_fleet_update(entry: Dict[str, object]) -> None:
+    if _FLEET_STREAM.has_subscribers(entry.get("org_id")):
+        _FLEET_STREAM.publish(entry.get("org_id"), "update", entry, _fleet_entry_json(entry))
+
+
+def _publish_fleet_expired(entries: Iterable[Dict[str, object]]) -> None:
+    for entry in entries:
+        if _FLEET_STREAM.has_subscribers(entry.get("org_id")):
+            _FLEET_STREAM.publish(entry.get("org_id"), "expired", {"id": entry.get("id")})
+
+
+_ALERT_OPS = {
+    ">": operator.gt,
+    ">=": operator.ge,
+    "<": operator.lt,
+    "<=": operator.le,
+    "==": operator.eq,
+    "!=": operator.ne,
+}
+
+
+def _parse_alert_rule(payload: object) -> Dict[str, object] | str:
+    """Valide une règle d'alerte fleet ; renvoie la règle normalisée, sinon le message d'erreur.
+
+    `{"name": ..., "metric": "cpu_percent" | "health.status" | ..., "op": ">", "value": 90,
+    "for_seconds": 300}` : alerte quand `report.<metric> <op> <value>` est vrai depuis
+    au moins `for_seconds` (0 : dès le premier rapport).
+    """
+    if not isinstance(payload, dict):
+        return "payload doit être un objet JSON"
+    metric = str(payload.get("metric") or "").strip()
+    if metric.startswith("report."):
+        metric = metric[len("report."):]
+    if not metric or len(metric.split(".")) > 3:
+        return "metric requis (ex: cpu_percent, health.status)"
+    op = payload.get("op", ">")
+    if op not in _ALERT_OPS:
+        return f"op invalide (parmi {', '.join(_ALERT_OPS)})"
+    value = payload.get("value")
+    if not isinstance(value, (int, float, str)) or isinstance(value, bool):
+        return "value doit être un nombre ou une chaîne"
+    if op not in ("==", "!=") and isinstance(value, str):
+        # "90" would never compare with a numeric metric: the rule could not fire
+        try:
+            value = float(value)
+        except ValueError:
+            return f"value doit être un nombre avec {op}"
+        if value != value:
+            return f"value doit être un nombre avec {op}"
+    try:
+        for_seconds = float(payload.get("for_seconds", 0) or 0)
+    except (TypeError, ValueError):
+        return "for_seconds doit être un nombre"
+    if for_seconds < 0:
+        return "for_seconds doit être positif"
+    name = str(payload.get("name") or f"{metric} {op} {value}").strip()[:200]
+    return {"name": name, "metric": metric, "op": op, "value": value, "for_seconds": for_seconds}
+
+
+class _FleetAlertEngine:
+    """Règles d'alerte par org, évaluées à chaque rapport (ingestion, heartbeat, synchro).
+
+    Seul le rapport qui arrive est évalué, contre les règles de son org : aucun parcours
+    de la flotte. L'état par machine et par règle (`[depuis, déclenchée]`) n'existe que
+    tant que la condition est vraie. Les transitions (déclenchement, résolution) partent
+    vers `_WEBHOOKS` ; chaque worker évalue aussi les rapports relus des autres workers
+    (`_sync_fleet_state`) et l'anti-rebond partagé n'envoie qu'une notification.
+    L'état par machine n'est lu et modifié que sous `_FLEET_INDEX_LOCK`, comme les index.
+    """
+
+    def __init__(self) -> None:
+        # org_id -> ((rule_id, rule, path, op, value), ...)
+        self._rules: Dict[str | None, tuple] = {}
+        # store_key -> {rule_id: [since_ts, firing]}
+        self._state: Dict[str, Dict[str, list]] = {}
+        self._generation: int | None = None
+        self.evaluated = 0
+        self.fired = 0
+        self.resolved = 0
+
+    def reload(self) -> None:
+        try:
+            cur = _db().cursor()
+            row = cur.execute("SELECT value FROM fleet_meta WHERE key = 'alert_rules_generation'").fetchone()
+            rows = cur.execute('SELECT id, org_id, rule FROM fleet_alert_rules ORDER BY created_at').fetchall()
+        except sqlite3.Error:
+            return
+        rules: Dict[str | None, list] = {}
+        for rule_id, org_id, raw in rows:
+            try:
+                # normalized again: rules stored before a validation change keep working
+                rule = _parse_alert_rule(json.loads(raw))
+            except ValueError:
+                continue
+            if isinstance(rule, str):
+                continue
+            compiled = (rule_id, rule, rule["metric"].split("."), _ALERT_OPS[rule["op"]], rule["value"])
+            rules.setdefault(org_id, []).append(compiled)
+        self._rules = {org_id: tuple(compiled) for org_id, compiled in rules.items()}
+        self._generation = row[0] if row else 0
+        live = {rule_id for compiled in self._rules.values() for rule_id, *_ in compiled}
+        with _FLEET_INDEX_LOCK:
+            for states in self._state.values():
+                for rule_id in [rule_id for rule_id in states if rule_id not in live]:
+                    states.pop(rule_id, None)
+
+    def check_generation(self) -> None:
+        """Recharge les règles si un autre worker les a modifiées (appelé par le reaper)."""
+        try:
+            row = _db().execute("SELECT value FROM fleet_meta WHERE key = 'alert_rules_generation'").fetchone()
+        except sqlite3.Error:
+            return
+        if (row[0] if row else 0) != self._generation:
+            self.reload()
+
+    def rules(self, org_id: str) -> list[Dict[str, object]]:
+        return [dict(rule, id=rule_id) for rule_id, rule, *_ in self._rules.get(org_id, ())]
+
+    def evaluate(self, store_key: str, entry: Dict[str, object]) -> None:
+        rules = self._rules.get(entry.get("org_id"))
+        if not rules:
+            return
+        self.evaluated += 1
+        report = entry.get("report") or {}
+        ts = entry.get("ts", 0) or 0
+        states = self._state.get(store_key)
+        for rule_id, rule, path, op, threshold in rules:
+            value = report
+            for part in path:
+                value = value.get(part) if isinstance(value, dict) else None
+            try:
+                matched = value is not None and op(value, threshold)
+            except TypeError:
+                matched = False
+            state = states.get(rule_id) if states else None
+            if matched:
+                if state is None:
+                    if states is None:
+                        states = self._state[store_key] = {}
+                    state = states[rule_id] = [ts, False]
+                if not state[1] and ts - state[0] >= rule["for_seconds"]:
+                    state[1] = True
+                    self.fired += 1
+                    self._notify("firing", entry, rule_id, rule, value)
+            elif state is not None:
+                del states[rule_id]
+                if not states:
+                    self._state.pop(store_key, None)
+                if state[1]:
+                    self.resolved += 1
+                    self._notify("resolved", entry, rule_id, rule, value)
+
+    def forget(self, store_key: str) -> None:
+        self._state.pop(store_key, None)
+
+    def firing(self, org_id: str) -> list[Dict[str, object]]:
+        alerts = []
+        names = {rule_id: rule for rule_id, rule, *_ in self._rules.get(org_id, ())}
+        with _FLEET_INDEX_LOCK:
+            for store_key, entry in FLEET_BY_ORG.get(org_id, {}).items():
+                for rule_id, (since, fired) in self._state.get(store_key, {}).items():
+                    if fired and rule_id in names:
+                        alerts.append({"id": entry.get("id"), "rule_id": rule_id, "name": names[rule_id]["name"],
+                                       "since": since})
+        return alerts
+
+    def metrics(self) -> Dict[str, object]:
+        return {
+            "rules": sum(len(rules) for rules in self._rules.values()),
+            "tracked": len(self._state),
+            "evaluated": self.evaluated,
+            "fired": self.fired,
+            "resolved": self.resolved,
+        }
+
+    def _notify(self, event: str, entry: Dict[str, object], rule_id: str, rule: Dict[str, object],
+                value: object) -> None:
+        if not WEBHOOK_URL:
+            return
+        label = "ALERTE" if event == "firing" else "Résolu"
+        condition = f"{rule['metric']} {rule['op']} {rule['value']}"
+        title = rule["name"] if rule["name"] == condition else f"{rule['name']} ({condition})"
+        message = f"{label} [{entry.get('org_id')}] {entry.get('id')} : {title}, valeur {value}"
+        _WEBHOOKS.enqueue(f"alert:{rule_id}:{entry.get('id')}:{event}", message)
+
+
+_FLEET_ALERTS = _FleetAlertEngine()
+
+
+# JSON déjà encodé des entrées de FLEET_STATE : store_key -> [entry, report_json, entry_json, projections].
+# Le rapport est encodé une fois (à la réception, ou tel que lu en base) puis réutilisé pour
+# l'écriture en base, le backup JSON, le flux SSE et les listings ; entry_json et les
+# projections (`fields=`) sont calculés à la première lecture. Une entrée remplacée
+# invalide sa ligne (vérification d'identité).
+_FLEET_JSON: Dict[str, list] = {}
+
+
+def _fleet_report_json(store_key: str, entry: Dict[str, object]) -> str:
+    cached = _FLEET_JSON.get(store_key)
+    if cached is not None and cached[0] is entry:
+        return cached[1]
+    return json.dumps(entry.get("report", {}), ensure_ascii=False)
+
+
+def _fleet_entry_json(entry: Dict[str, object]) -> bytes:
+    """Entrée encodée en JSON, en collant le rapport pré-encodé au reste de l'entrée."""
+    cached = _FLEET_JSON.get(f'{entry.get("org_id")}:{entry.get("id")}')
+    if cached is None or cached[0] is not entry:
+        return _json_bytes(entry)
+    if cached[2] is None:
+        head = _json_bytes({key: value for key, value in entry.items() if key != "report"})
+        cached[2] = head[:-1] + (b',' if len(head) > 2 else b'') + b'"report":' + cached[1].encode("utf-8") + b'}'
+    return cached[2]
+
+
+def _fleet_projected_json(entry: Dict[str, object], fields: list[list[str]], fields_key: str) -> bytes:
+    cached = _FLEET_JSON.get(f'{entry.get("org_id")}:{entry.get("id")}')
+    if cached is None or cached[0] is not entry:
+        return _json_bytes(_project_fleet_entry(entry, fields))
+    projections = cached[3]
+    if projections is None:
+        projections = cached[3] = {}
+    encoded = projections.get(fields_key)
+    if encoded is None:
+        # a handful of distinct projections per deployment (dashboard, scripts)
+        if len(projections) >= 4:
+            projections.clear()
+        encoded = projections[fields_key] = _json_bytes(_project_fleet_entry(entry, fields))
+    return encoded
+
+
+def _fleet_unindex(store_key: str, entry: Dict[str, object]) -> None:
+    _FLEET_JSON.pop(store_key, None)
+    org_entries = FLEET_BY_ORG.get(entry.get("org_id"))
+    if org_entries is not None:
+        org_entries.pop(store_key, None)
+        if not org_entries:
+            FLEET_BY_ORG.pop(entry.get("org_id"), None)
+    bucket = _FLEET_BUCKETS.get(int(entry.get("ts", 0) or 0))
+    if bucket is not None:
+        bucket.discard(store_key)
+    _FLEET_WHEEL.cancel(store_key)
+    _FLEET_SUMMARY.remove(store_key)
+
+
+def _fleet_index(store_key: str, entry: Dict[str, object], report_json: str | None = None) -> None:
+    previous = FLEET_STATE.get(store_key)
+    if previous is not None:
+        _fleet_unindex(store_key, previous)
+    FLEET_STATE[store_key] = entry
+    if report_json is not None:
+        _FLEET_JSON[store_key] = [entry, report_json, None, None]
+    FLEET_BY_ORG.setdefault(entry.get("org_id"), {})[store_key] = entry
+    second = int(entry.get("ts", 0) or 0)
+    bucket = _FLEET_BUCKETS.get(second)
+    if bucket is None:
+        bucket = _FLEET_BUCKETS[second] = set()
+        heapq.heappush(_FLEET_BUCKET_HEAP, second)
+    bucket.add(store_key)
+    if FLEET_OFFLINE_SECONDS > 0:
+        _FLEET_WHEEL.schedule(store_key, (entry.get("ts", 0) or 0) + FLEET_OFFLINE_SECONDS)
+    _FLEET_SUMMARY.add(store_key, entry)
+
+
+def _fleet_back_online(store_key: str, entry: Dict[str, object]) -> float | None:
+    """Sort la machine de `_FLEET_OFFLINE` si ce rapport est récent ; renvoie le début du silence."""
+    if store_key in _FLEET_OFFLINE and (entry.get("ts", 0) or 0) > time.time() - FLEET_OFFLINE_SECONDS:
+        _FLEET_SUMMARY.set_offline(store_key, False)
+        return _FLEET_OFFLINE.pop(store_key, None)
+    return None
+
+
+def _fleet_put(store_key: str, entry: Dict[str, object], report_json: str | None = None) -> None:
+    """Ajoute/remplace une entrée de `FLEET_STATE` en tenant les index à jour.
+
+    `report_json` est le rapport déjà encodé en JSON, gardé pour éviter de le ré-encoder.
+    """
+    with _FLEET_INDEX_LOCK:
+        _fleet_index(store_key, entry, report_json)
+        silent_since = _fleet_back_online(store_key, entry)
+        _FLEET_ALERTS.evaluate(store_key, entry)
+    _publish_fleet_update(entry)
+    if silent_since is not None:
+        _notify_fleet_online(entry, silent_since)
+
+
+def _fleet_remove(store_key: str) -> Dict[str, object] | None:
+    with _FLEET_INDEX_LOCK:
+        entry = FLEET_STATE.pop(store_key, None)
+        if entry is not None:
+            _fleet_unindex(store_key, entry)
+        _FLEET_OFFLINE.pop(store_key, None)
+        _FLEET_ALERTS.forget(store_key)
+    if entry is not None:
+        _publish_fleet_expired([entry])
+    return entry
+
+
+def _fleet_reset(entries: Dict[str, Dict[str, object]], report_json: Dict[str, str] | None = None) -> None:
+    """Remplace tout le contenu de `FLEET_STATE` (rechargement)."""
+    report_json = report_json or {}
+    with _FLEET_INDEX_LOCK:
+        FLEET_STATE.clear()
+        _FLEET_JSON.clear()
+        FLEET_BY_ORG.clear()
+        _FLEET_BUCKETS.clear()
+        _FLEET_BUCKET_HEAP.clear()
+        _FLEET_WHEEL.clear()
+        _FLEET_OFFLINE.clear()
+        _FLEET_SUMMARY.clear()
+        silent_cutoff = time.time() - FLEET_OFFLINE_SECONDS
+        for store_key, entry in entries.items():
+            _fleet_index(store_key, entry, report_json.get(store_key))
+            if FLEET_OFFLINE_SECONDS > 0 and (entry.get("ts", 0) or 0) <= silent_cutoff:
+                # already silent when loaded: no "offline" event for a restart
+                _FLEET_WHEEL.cancel(store_key)
+                _FLEET_OFFLINE[store_key] = (entry.get("ts", 0) or 0) + FLEET_OFFLINE_SECONDS
+                _FLEET_SUMMARY.set_offline(store_key, True)
+    # open streams get a fresh snapshot instead of one event per reloaded machine
+    _FLEET_STREAM.resync_all()
 
 
 def _load_fleet_state() -> None:
     """Recharge l'état fleet depuis la base SQLite si présente, sinon depuis le JSON (best effort)."""
-    global FLEET_STATE
+    # pending write-behind reports must reach the DB before it is re-read
+    _FLEET_WRITER.flush()
     # Automatic migration/merge: if JSON backup exists, import or merge into SQLite
     try:
         if FLEET_STATE_PATH.exists():
             try:
                 if not FLEET_DB_PATH.exists():
                     # create DB and import JSON entries
-                    conn = sqlite3.connect(str(FLEET_DB_PATH))
+                    conn = _db()
                     cur = conn.cursor()
                     cur.execute('CREATE TABLE IF NOT EXISTS fleet (id TEXT PRIMARY KEY, report TEXT, ts REAL, client TEXT)')
                     raw = FLEET_STATE_PATH.read_text(encoding='utf-8') or '{}'
@@ -137,63 +966,51 @@ def _load_fleet_state() -> None:
                             cur.execute('INSERT OR REPLACE INTO fleet (id, report, ts, client) VALUES (?, ?, ?, ?)',
                                         (str(mid), report_json, ts, client))
                     conn.commit()
-                    conn.close()
                 else:
-                    # merge newer entries from JSON into existing DB
+                    # restore entries missing from the DB (SQLite stays the source of truth)
                     try:
                         raw = FLEET_STATE_PATH.read_text(encoding='utf-8') or '{}'
                         data = json.loads(raw)
                         if isinstance(data, dict):
-                            conn = sqlite3.connect(str(FLEET_DB_PATH))
+                            conn = _db()
                             cur = conn.cursor()
                             for mid, entry in data.items():
                                 ts = entry.get('ts', 0)
-                                cur.execute('SELECT ts FROM fleet WHERE id = ?', (mid,))
+                                org_id = entry.get('org_id')
+                                # the backup is keyed by machine_id, DB rows by org:machine
+                                row_id = f"{org_id}:{mid}" if org_id else str(mid)
+                                cur.execute('SELECT ts FROM fleet WHERE id = ?', (row_id,))
                                 row = cur.fetchone()
-                                if not row or ts > (row[0] or 0):
+                                if not row:
                                     report_json = json.dumps(entry.get('report', {}), ensure_ascii=False)
                                     client = entry.get('client')
-                                    cur.execute('INSERT OR REPLACE INTO fleet (id, report, ts, client) VALUES (?, ?, ?, ?)',
-                                                (str(mid), report_json, ts, client))
+                                    cur.execute('INSERT OR REPLACE INTO fleet (id, report, ts, client, org_id) VALUES (?, ?, ?, ?, ?)',
+                                                (row_id, report_json, ts, client, org_id))
                             conn.commit()
-                            conn.close()
                     except Exception:
-                        pass
+                        _db().rollback()
             except Exception:
                 # migration attempt failed, continue with fallback logic
-                pass
+                _db().rollback()
     except Exception:
         pass
 
     # prefer DB if present
     try:
         if FLEET_DB_PATH.exists():
-            conn = sqlite3.connect(str(FLEET_DB_PATH))
-            cur = conn.cursor()
+            cur = _db().cursor()
+            cur.execute("SELECT value FROM fleet_meta WHERE key = 'seq'")
+            meta = cur.fetchone()
             cur.execute("SELECT id, report, ts, client, org_id FROM fleet")
             rows = cur.fetchall()
-            conn.close()
-            FLEET_STATE = {}
-            for rid, report_json, ts, client, org_id in rows:
-                try:
-                    report = json.loads(report_json) if report_json else {}
-                except Exception:
-                    report = {}
-                # keep org_id per entry for filtering
-                FLEET_STATE[str(rid)] = {
-                    "id": str(rid),
-                    "report": report,
-                    "ts": ts or 0,
-                    "client": client,
-                    "org_id": org_id,
-                }
+            _fleet_reset(
+                {str(row[0]): _fleet_entry_from_row(*row) for row in rows},
+                {str(row[0]): row[1] for row in rows if row[1]},
+            )
+            _FLEET_SYNC["seq"] = meta[0] if meta else 0
+            _FLEET_SYNC["checked"] = time.monotonic()
             # purge expirés
-            now_ts = time.time()
-            expired = [mid for mid, entry in FLEET_STATE.items() if now_ts - entry.get("ts", 0) > FLEET_TTL_SECONDS]
-            for mid in expired:
-                FLEET_STATE.pop(mid, None)
-            if expired:
-                _save_fleet_state()
+            _reap_expired_fleet(time.time())
             return
     except Exception:
         # fall back to JSON
@@ -205,57 +1022,617 @@ def _load_fleet_state() -> None:
     try:
         data = json.loads(FLEET_STATE_PATH.read_text(encoding="utf-8"))
         if isinstance(data, dict):
-            FLEET_STATE = {str(k): v for k, v in data.items()}
-            now_ts = time.time()
-            expired = [mid for mid, entry in FLEET_STATE.items() if now_ts - entry.get("ts", 0) > FLEET_TTL_SECONDS]
-            for mid in expired:
-                FLEET_STATE.pop(mid, None)
-            if expired:
+            _fleet_reset({str(k): v for k, v in data.items()})
+            if _expire_fleet_entries(time.time()):
                 _save_fleet_state()
     except (OSError, json.JSONDecodeError):
         return
 
 
+def _write_fleet_json_backup() -> None:
+    """Réécrit le backup JSON compacté (entrées non expirées uniquement), de façon atomique."""
+    FLEET_STATE_PATH.parent.mkdir(parents=True, exist_ok=True)
+    # write JSON backup (legacy flat mapping by machine_id for compatibility)
+    now_ts = time.time()
+    flat: dict = {}
+    for k, v in list(FLEET_STATE.items()):
+        if now_ts - v.get("ts", 0) > FLEET_TTL_SECONDS:
+            continue
+        mid = v.get('id') or k
+        flat[str(mid)] = v
+    # entries are spliced from their cached JSON instead of being re-encoded
+    body = b",".join(_json_bytes(str(mid)) + b":" + _fleet_entry_json(v) for mid, v in flat.items())
+    # unique temp file: every worker (and async_ingest.py) runs its own backup timer
+    fd, tmp_path = tempfile.mkstemp(dir=FLEET_STATE_PATH.parent, prefix=FLEET_STATE_PATH.name + ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as fh:
+            fh.write(b"{" + body + b"}")
+        os.replace(tmp_path, FLEET_STATE_PATH)
+    except OSError:
+        with contextlib.suppress(OSError):
+            os.unlink(tmp_path)
+        raise
+
+
 def _save_fleet_state() -> None:
     """Sauvegarde l'état fleet en base SQLite (préféré) et en JSON backup (best effort)."""
     try:
-        # ensure folder for json backup
-        FLEET_STATE_PATH.parent.mkdir(parents=True, exist_ok=True)
-        # write JSON backup (legacy flat mapping by machine_id for compatibility)
         try:
-            flat: dict = {}
-            for k, v in FLEET_STATE.items():
-                mid = v.get('id') or k
-                flat[str(mid)] = v
-            FLEET_STATE_PATH.write_text(json.dumps(flat), encoding="utf-8")
+            _write_fleet_json_backup()
         except OSError:
             pass
 
-        # ensure db dir and table
+        # upsert all entries; rows already newer in DB (other workers) are kept
+        _upsert_fleet_rows(list(FLEET_STATE.keys()), record_metrics=False)
+    except Exception:
+        return
+
+
+def _fleet_entry_from_row(rid: str, report_json: str | None, ts: float | None, client: str | None,
+                          org_id: str | None) -> Dict[str, object]:
+    """Construit une entrée `FLEET_STATE` à partir d'une ligne de la table fleet."""
+    try:
+        report = json.loads(report_json) if report_json else {}
+    except Exception:
+        report = {}
+    rid = str(rid)
+    prefix = f"{org_id}:" if org_id else ""
+    # keep org_id per entry for filtering
+    return {
+        "id": rid[len(prefix):] if prefix and rid.startswith(prefix) else rid,
+        "report": report,
+        "ts": ts or 0,
+        "client": client,
+        "org_id": org_id,
+    }
+
+
+_FLEET_SYNC: Dict[str, float] = {"seq": 0, "checked": 0.0}
+_FLEET_SYNC_LOCK = threading.Lock()
+
+
+def _sync_fleet_state(force: bool = False) -> None:
+    """Rapatrie dans `FLEET_STATE` les lignes modifiées par les autres workers.
+
+    SQLite est la source de vérité ; `FLEET_STATE` en est le cache local. Le compteur
+    `fleet_meta.seq` est relu au plus toutes les `FLEET_SYNC_SECONDS` et, s'il a bougé,
+    seules les lignes de seq supérieur sont relues (index idx_fleet_seq).
+    """
+    now = time.monotonic()
+    if not force and now - _FLEET_SYNC["checked"] < FLEET_SYNC_SECONDS:
+        return
+    with _FLEET_SYNC_LOCK:
+        if not force and now - _FLEET_SYNC["checked"] < FLEET_SYNC_SECONDS:
+            return
+        _FLEET_SYNC["checked"] = now
         try:
-            FLEET_DB_PATH.parent.mkdir(parents=True, exist_ok=True)
-            conn = sqlite3.connect(str(FLEET_DB_PATH))
-            cur = conn.cursor()
+            cur = _db().cursor()
+            cur.execute("SELECT value FROM fleet_meta WHERE key = 'seq'")
+            meta = cur.fetchone()
+            if not meta or meta[0] <= _FLEET_SYNC["seq"]:
+                return
             cur.execute(
-                'CREATE TABLE IF NOT EXISTS fleet (id TEXT PRIMARY KEY, report TEXT, ts REAL, client TEXT, org_id TEXT)'
+                'SELECT id, report, ts, client, org_id FROM fleet WHERE seq > ?',
+                (_FLEET_SYNC["seq"],),
             )
-            # upsert all entries (id stored must be unique, include org if needed)
-            for mid, entry in FLEET_STATE.items():
-                report_json = json.dumps(entry.get('report', {}), ensure_ascii=False)
-                ts = entry.get('ts', time.time())
-                client = entry.get('client')
-                org_id = entry.get('org_id')
-                cur.execute(
-                    'INSERT OR REPLACE INTO fleet (id, report, ts, client, org_id) VALUES (?, ?, ?, ?, ?)',
-                    (str(mid), report_json, ts, client, org_id),
-                )
-            conn.commit()
-            conn.close()
+            rows = cur.fetchall()
         except Exception:
-            # if DB fails, ignore — JSON backup already attempted
-            pass
+            return
+        for row in rows:
+            store_key = str(row[0])
+            current = FLEET_STATE.get(store_key)
+            row_ts, current_ts = row[2] or 0, current.get("ts", 0) if current is not None else 0
+            # same ts and report: our own write coming back (or a copy of what we already hold);
+            # same ts, other report: a heartbeat touched here over a report received by another worker
+            if current is not None and (row_ts < current_ts or (
+                    row_ts == current_ts and (row[1] or "{}") == _fleet_report_json(store_key, current))):
+                continue
+            _fleet_put(store_key, _fleet_entry_from_row(*row), row[1] or None)
+        _FLEET_SYNC["seq"] = meta[0]
+
+
+def _expire_fleet_entries(now_ts: float) -> list[Dict[str, object]]:
+    """Retire de `FLEET_STATE` les entrées plus vieilles que le TTL et les renvoie.
+
+    Seuls les buckets (une seconde de `ts`) entièrement antérieurs à la limite sont
+    parcourus : le coût est proportionnel au nombre d'expirés, pas à la taille de la flotte.
+    """
+    cutoff = now_ts - FLEET_TTL_SECONDS
+    expired: list[Dict[str, object]] = []
+    with _FLEET_INDEX_LOCK:
+        while _FLEET_BUCKET_HEAP and _FLEET_BUCKET_HEAP[0] + 1 <= cutoff:
+            second = heapq.heappop(_FLEET_BUCKET_HEAP)
+            for store_key in _FLEET_BUCKETS.pop(second, ()):
+                entry = FLEET_STATE.pop(store_key, None)
+                if entry is None:
+                    continue
+                _fleet_unindex(store_key, entry)
+                _FLEET_OFFLINE.pop(store_key, None)
+                _FLEET_ALERTS.forget(store_key)
+                expired.append(entry)
+    if expired:
+        _FLEET_JSON_DIRTY.set()
+        _publish_fleet_expired(expired)
+    return expired
+
+
+_FLEET_REAPER_STATS: Dict[str, float] = {
+    "runs": 0,
+    "last_run_ts": 0.0,
+    "last_run_ms": 0.0,
+    "last_removed": 0,
+    "last_evicted": 0,
+    "total_removed": 0,
+    "metrics_partitions_dropped": 0,
+    "webhook_slots_pruned": 0,
+}
+
+
+def _reap_expired_fleet(now_ts: float | None = None) -> int:
+    """Expire en bloc les machines silencieuses depuis plus de `FLEET_TTL_SECONDS`.
+
+    Un seul `DELETE ... WHERE ts < ?` (index idx_fleet_ts) côté base, puis éviction des
+    buckets expirés du cache local. Retourne le nombre de lignes supprimées en base ;
+    une machine qui vient de reporter auprès d'un autre worker a un `ts` récent et reste.
+    Les machines supprimées laissent un tombstone (nouveau seq) lu par `/api/fleet?since=`.
+    """
+    now_ts = time.time() if now_ts is None else now_ts
+    start = time.perf_counter()
+    removed = 0
+    conn = _db()
+    try:
+        cur = conn.cursor()
+        cur.execute('BEGIN IMMEDIATE')
+        cur.execute("UPDATE fleet_meta SET value = value + 1 WHERE key = 'seq'")
+        cur.execute("SELECT value FROM fleet_meta WHERE key = 'seq'")
+        seq = cur.fetchone()[0]
+        cutoff = now_ts - FLEET_TTL_SECONDS
+        cur.execute(
+            'INSERT OR REPLACE INTO fleet_tombstones (id, org_id, machine_id, seq, ts) '
+            "SELECT id, org_id, CASE WHEN org_id IS NOT NULL AND substr(id, 1, length(org_id) + 1) = org_id || ':' "
+            'THEN substr(id, length(org_id) + 2) ELSE id END, ?, ? FROM fleet WHERE ts < ?',
+            (seq, now_ts, cutoff),
+        )
+        removed = cur.execute('DELETE FROM fleet WHERE ts < ?', (cutoff,)).rowcount
+        # old tombstones go; deltas older than the newest dropped one need a full listing
+        cur.execute(
+            'SELECT MAX(seq) FROM fleet_tombstones WHERE ts < ?', (now_ts - FLEET_TOMBSTONE_SECONDS,)
+        )
+        floor = cur.fetchone()[0]
+        if floor is not None:
+            cur.execute('DELETE FROM fleet_tombstones WHERE seq <= ?', (floor,))
+            cur.execute(
+                "INSERT INTO fleet_meta (key, value) VALUES ('tombstone_floor', ?) "
+                'ON CONFLICT(key) DO UPDATE SET value = MAX(value, excluded.value)',
+                (floor,),
+            )
+        if removed or floor is not None:
+            conn.commit()
+        else:
+            # nothing expired: leave seq alone so delta clients keep getting 304
+            conn.rollback()
     except Exception:
+        conn.rollback()
+    evicted = _expire_fleet_entries(now_ts)
+    _FLEET_REAPER_STATS["runs"] += 1
+    _FLEET_REAPER_STATS["last_run_ts"] = now_ts
+    _FLEET_REAPER_STATS["last_run_ms"] = round((time.perf_counter() - start) * 1000, 3)
+    _FLEET_REAPER_STATS["last_removed"] = removed
+    _FLEET_REAPER_STATS["last_evicted"] = len(evicted)
+    _FLEET_REAPER_STATS["total_removed"] += removed
+    return removed
+
+
+_FLEET_OFFLINE_STATS: Dict[str, float] = {
+    "went_offline": 0,
+    "came_back": 0,
+    "last_tick_ms": 0.0,
+    "max_tick_ms": 0.0,
+}
+
+
+def _notify_fleet_offline(entry: Dict[str, object], now_ts: float) -> None:
+    _FLEET_OFFLINE_STATS["went_offline"] += 1
+    org_id = entry.get("org_id")
+    if _FLEET_STREAM.has_subscribers(org_id):
+        _FLEET_STREAM.publish(org_id, "offline", {"id": entry.get("id"), "ts": entry.get("ts")})
+    if WEBHOOK_URL:
+        silent = int(now_ts - (entry.get("ts", 0) or 0))
+        _WEBHOOKS.enqueue(
+            f"offline:{org_id}:{entry.get('id')}",
+            f"Machine silencieuse [{org_id}] {entry.get('id')} : aucun rapport depuis {silent}s",
+        )
+
+
+def _notify_fleet_online(entry: Dict[str, object], silent_since: float) -> None:
+    _FLEET_OFFLINE_STATS["came_back"] += 1
+    org_id = entry.get("org_id")
+    if _FLEET_STREAM.has_subscribers(org_id):
+        _FLEET_STREAM.publish(org_id, "online", {"id": entry.get("id")})
+    if WEBHOOK_URL:
+        silent = int(time.time() - silent_since + FLEET_OFFLINE_SECONDS)
+        _WEBHOOKS.enqueue(
+            f"online:{org_id}:{entry.get('id')}",
+            f"Machine de retour [{org_id}] {entry.get('id')} après environ {silent}s sans rapport",
+        )
+
+
+def _detect_offline_fleet(now_ts: float | None = None) -> list[Dict[str, object]]:
+    """Machines dont la minuterie (`ts + FLEET_OFFLINE_SECONDS`) vient d'échoir : événement "offline".
+
+    Seules les minuteries échues sont visitées (roue `_FLEET_WHEEL`), jamais toute la flotte.
+    Le retour d'une machine est détecté à son rapport suivant (`_fleet_back_online`).
+    """
+    now_ts = time.time() if now_ts is None else now_ts
+    start = time.perf_counter()
+    silent: list[Dict[str, object]] = []
+    with _FLEET_INDEX_LOCK:
+        for store_key in _FLEET_WHEEL.advance(now_ts):
+            entry = FLEET_STATE.get(store_key)
+            if entry is None or store_key in _FLEET_OFFLINE:
+                continue
+            _FLEET_OFFLINE[store_key] = now_ts
+            _FLEET_SUMMARY.set_offline(store_key, True)
+            silent.append(entry)
+    for entry in silent:
+        _notify_fleet_offline(entry, now_ts)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    _FLEET_OFFLINE_STATS["last_tick_ms"] = round(elapsed_ms, 3)
+    _FLEET_OFFLINE_STATS["max_tick_ms"] = max(_FLEET_OFFLINE_STATS["max_tick_ms"], round(elapsed_ms, 3))
+    return silent
+
+
+def start_fleet_offline_detector() -> None:
+    """Lance le thread qui fait tourner la roue des machines silencieuses (un tick par seconde)."""
+
+    def _loop() -> None:
+        while True:
+            time.sleep(_FLEET_WHEEL.tick)
+            try:
+                # reports received by other workers re-arm their timers before the tick
+                _sync_fleet_state()
+                _detect_offline_fleet()
+            except Exception:
+                continue
+
+    thread = threading.Thread(target=_loop, daemon=True)
+    thread.start()
+
+
+def start_fleet_reaper(interval: float) -> None:
+    """Lance le thread qui expire les machines toutes les `interval` secondes."""
+
+    def _loop() -> None:
+        while True:
+            time.sleep(interval)
+            try:
+                # removal counts go to _FLEET_REAPER_STATS (last_removed / total_removed, /api/metrics)
+                _reap_expired_fleet()
+                _FLEET_REAPER_STATS["metrics_partitions_dropped"] += _prune_fleet_metrics(time.time())
+                _FLEET_ALERTS.check_generation()
+                _FLEET_REAPER_STATS["webhook_slots_pruned"] += _prune_webhook_slots(time.time())
+            except Exception:
+                continue
+
+    thread = threading.Thread(target=_loop, daemon=True)
+    thread.start()
+
+
+_FLEET_JSON_DIRTY = threading.Event()
+
+
+_FLEET_METRICS_PARTITIONS: set[str] = set()
+
+
+def _fleet_metrics_partition(ts: float) -> str:
+    return "fleet_metrics_" + time.strftime("%Y%m%d", time.gmtime(ts))
+
+
+def _ensure_fleet_metrics_partition(cur: sqlite3.Cursor, name: str) -> None:
+    if name in _FLEET_METRICS_PARTITIONS:
         return
+    cur.execute(
+        f'CREATE TABLE IF NOT EXISTS {name} (org_id TEXT, machine_id TEXT, ts REAL, '
+        'cpu REAL, ram REAL, disk REAL, score INTEGER, status TEXT)'
+    )
+    cur.execute(f'CREATE INDEX IF NOT EXISTS idx_{name} ON {name} (org_id, machine_id, ts)')
+    _FLEET_METRICS_PARTITIONS.add(name)
+
+
+def _fleet_metrics_row(entry: Dict[str, object]) -> tuple:
+    report = entry.get("report")
+    report = report if isinstance(report, dict) else {}
+    health = report.get("health")
+    health = health if isinstance(health, dict) else {}
+
+    def _num(value: object) -> float | None:
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            return None
+
+    return (
+        entry.get("org_id"),
+        entry.get("id"),
+        entry.get("ts"),
+        _num(report.get("cpu_percent")),
+        _num(report.get("ram_percent")),
+        _num(report.get("disk_percent")),
+        _num(health.get("score")),
+        health.get("status"),
+    )
+
+
+def _fleet_metrics_tables(cur: sqlite3.Cursor) -> list[str]:
+    cur.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name GLOB 'fleet_metrics_[0-9]*' ORDER BY name")
+    return [row[0] for row in cur.fetchall()]
+
+
+def _prune_fleet_metrics(now_ts: float) -> int:
+    """Supprime les partitions plus vieilles que la rétention (DROP TABLE, sans DELETE ligne à ligne)."""
+    oldest_kept = _fleet_metrics_partition(now_ts - FLEET_METRICS_RETENTION_DAYS * 86400)
+    dropped = 0
+    try:
+        conn = _db()
+        for name in _fleet_metrics_tables(conn.cursor()):
+            if name < oldest_kept:
+                conn.execute(f'DROP TABLE IF EXISTS {name}')
+                _FLEET_METRICS_PARTITIONS.discard(name)
+                dropped += 1
+    except Exception:
+        return dropped
+    return dropped
+
+
+def _upsert_fleet_rows(store_keys: Iterable[str], record_metrics: bool = True,
+                       history: Iterable[Dict[str, object]] = (), touched: Iterable[str] = (),
+                       entries: Dict[str, tuple[Dict[str, object], str]] | None = None) -> int:
+    """Upsert des machines indiquées en une seule transaction. Retourne le nombre de lignes écrites
+    (0 si la transaction a échoué).
+
+    Les entrées sont relues dans `FLEET_STATE` au moment de l'écriture : plusieurs rapports
+    d'une même machine en attente ne produisent qu'une ligne. Avec `record_metrics`, la
+    même transaction ajoute un point par machine dans la partition `fleet_metrics_*` du jour.
+    `history` : rapports ajoutés à l'historique seulement (lots, où chaque élément compte,
+    y compris ceux rejoués par un agent après une coupure, plus anciens que l'état courant).
+    `touched` : machines qui n'ont envoyé qu'un heartbeat ; seuls `ts`, `client` et `seq`
+    sont mis à jour (ni rapport réécrit, ni point d'historique).
+    `entries` : store_key -> (entrée, rapport JSON) à écrire à la place de `FLEET_STATE`
+    (lots, appliqués en mémoire seulement une fois la transaction validée).
+    """
+    rows = []
+    touch_rows = []
+    metrics: Dict[str, list[tuple]] = {}
+    history_count = 0
+    for entry in history:
+        metrics.setdefault(_fleet_metrics_partition(entry.get("ts", 0) or 0), []).append(_fleet_metrics_row(entry))
+        history_count += 1
+    full_keys = dict.fromkeys(store_keys)
+    for store_key in dict.fromkeys(touched):
+        entry = FLEET_STATE.get(store_key)
+        if entry is None or store_key in full_keys:
+            continue
+        touch_rows.append((entry.get('ts', time.time()), entry.get('client'), str(store_key)))
+    for store_key in full_keys:
+        if entries is not None and store_key in entries:
+            entry, report_json = entries[store_key]
+        else:
+            entry = FLEET_STATE.get(store_key)
+            if entry is None:
+                continue
+            report_json = _fleet_report_json(store_key, entry)
+        if record_metrics:
+            metrics.setdefault(_fleet_metrics_partition(entry.get("ts", 0) or 0), []).append(_fleet_metrics_row(entry))
+        rows.append((
+            str(store_key),
+            report_json,
+            entry.get('ts', time.time()),
+            entry.get('client'),
+            entry.get('org_id'),
+        ))
+    if not rows and not touch_rows and not history_count:
+        return 0
+    conn = _db()
+    try:
+        cur = conn.cursor()
+        # IMMEDIATE: seq allocation is serialized across workers
+        cur.execute('BEGIN IMMEDIATE')
+        if rows or touch_rows:
+            count = len(rows) + len(touch_rows)
+            cur.execute("UPDATE fleet_meta SET value = value + ? WHERE key = 'seq'", (count,))
+            cur.execute("SELECT value FROM fleet_meta WHERE key = 'seq'")
+            first_seq = cur.fetchone()[0] - count + 1
+            cur.executemany(
+                'INSERT INTO fleet (id, report, ts, client, org_id, seq) VALUES (?, ?, ?, ?, ?, ?) '
+                'ON CONFLICT(id) DO UPDATE SET report = excluded.report, ts = excluded.ts, '
+                'client = excluded.client, org_id = excluded.org_id, seq = excluded.seq '
+                'WHERE excluded.ts >= fleet.ts',
+                [row + (first_seq + i,) for i, row in enumerate(rows)],
+            )
+            # the seq bump lets other workers and delta clients pick up the new ts
+            first_seq += len(rows)
+            cur.executemany(
+                'UPDATE fleet SET ts = ?, client = ?, seq = ? WHERE id = ? AND ts < ?',
+                [(ts, client, first_seq + i, key, ts) for i, (ts, client, key) in enumerate(touch_rows)],
+            )
+        for partition, metric_rows in metrics.items():
+            _ensure_fleet_metrics_partition(cur, partition)
+            cur.executemany(f'INSERT INTO {partition} VALUES (?, ?, ?, ?, ?, ?, ?, ?)', metric_rows)
+        conn.commit()
+    except Exception:
+        # DB indisponible : le backup JSON périodique garde une copie
+        conn.rollback()
+        _FLEET_METRICS_PARTITIONS.clear()
+        _FLEET_JSON_DIRTY.set()
+        return 0
+    _FLEET_JSON_DIRTY.set()
+    return len(rows) + len(touch_rows) + history_count
+
+
+class _FleetWriter:
+    """File d'écriture différée des rapports fleet.
+
+    Les requêtes ne font qu'enfiler la clé de la machine (et si ce n'était qu'un heartbeat) ;
+    un thread dédié vide la file par lots (`batch_size` rapports ou `flush_ms` millisecondes)
+    avec une transaction par lot.
+    """
+
+    def __init__(self, batch_size: int, flush_ms: float, maxsize: int) -> None:
+        self.batch_size = max(1, batch_size)
+        self.flush_seconds = max(0.0, flush_ms) / 1000.0
+        self.queue: queue.Queue[tuple[str, bool]] = queue.Queue(maxsize=maxsize)
+        self._write_lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+        self.written = 0
+        self.touched = 0
+        self.batches = 0
+        self.last_batch_size = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self.total_flush_ms = 0.0
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, store_key: str, touch: bool = False) -> None:
+        item = (store_key, touch)
+        if self._thread is None:
+            self._write([item], queued=False)
+            return
+        try:
+            self.queue.put_nowait(item)
+        except queue.Full:
+            # file pleine : on écrit directement (contre-pression plutôt que perte)
+            self._write([item], queued=False)
+
+    def flush(self) -> None:
+        """Vide la file de façon synchrone (arrêt, rechargement), lot en cours du thread compris."""
+        while True:
+            batch = self._drain(self.batch_size)
+            if not batch:
+                break
+            self._write(batch)
+        self.queue.join()
+
+    def metrics(self) -> Dict[str, object]:
+        return {
+            "queue_depth": self.queue.qsize(),
+            "written": self.written,
+            "touched": self.touched,
+            "batches": self.batches,
+            "last_batch_size": self.last_batch_size,
+            "last_flush_ms": round(self.last_flush_ms, 3),
+            "max_flush_ms": round(self.max_flush_ms, 3),
+            "avg_flush_ms": round(self.total_flush_ms / self.batches, 3) if self.batches else 0.0,
+        }
+
+    def _drain(self, limit: int) -> list[tuple[str, bool]]:
+        batch: list[tuple[str, bool]] = []
+        while len(batch) < limit:
+            try:
+                batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch: list[tuple[str, bool]], queued: bool = True) -> None:
+        try:
+            with self._write_lock:
+                start = time.perf_counter()
+                touched = [key for key, touch in batch if touch]
+                count = _upsert_fleet_rows([key for key, touch in batch if not touch], touched=touched)
+                elapsed_ms = (time.perf_counter() - start) * 1000
+                self.written += count
+                self.touched += len(touched)
+                self.batches += 1
+                self.last_batch_size = len(batch)
+                self.last_flush_ms = elapsed_ms
+                self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+                self.total_flush_ms += elapsed_ms
+        finally:
+            if queued:
+                for _ in batch:
+                    self.queue.task_done()
+
+    def _run(self) -> None:
+        while True:
+            batch = [self.queue.get()]
+            deadline = time.monotonic() + self.flush_seconds
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            try:
+                self._write(batch)
+            except Exception:
+                continue
+
+
+_FLEET_WRITER = _FleetWriter(FLEET_WRITE_BATCH, FLEET_WRITE_FLUSH_MS, FLEET_WRITE_QUEUE_MAX)
+atexit.register(_FLEET_WRITER.flush)
+
+
+def _persist_fleet_entry(store_key: str, touch: bool = False) -> None:
+    """Persiste la seule machine qui vient de reporter (coût constant, quelle que soit la taille de la flotte).
+
+    L'écriture SQLite est différée via `_FLEET_WRITER` ; le backup JSON est marqué "sale"
+    et rafraîchi par `start_fleet_json_backup` à intervalle fixe. `touch` : heartbeat, seul
+    le `ts` de la ligne est mis à jour.
+    """
+    _FLEET_WRITER.submit(store_key, touch)
+
+
+def start_fleet_json_backup(interval: float) -> None:
+    """Écrit le backup JSON en tâche de fond, au plus une fois par `interval` et seulement s'il a changé."""
+
+    def _loop() -> None:
+        while True:
+            time.sleep(interval)
+            if not _FLEET_JSON_DIRTY.is_set():
+                continue
+            _FLEET_JSON_DIRTY.clear()
+            try:
+                _write_fleet_json_backup()
+            except OSError:
+                _FLEET_JSON_DIRTY.set()
+
+    thread = threading.Thread(target=_loop, daemon=True)
+    thread.start()
+
+
+_FLEET_SERVICES_STARTED = False
+_FLEET_SERVICES_LOCK = threading.Lock()
+
+
+def _start_fleet_services() -> None:
+    """Initialise la base et les tâches de fond fleet, une seule fois par process.
+
+    Appelé depuis `main()` et à la première requête (cas gunicorn, où `main()` n'est pas exécuté).
+    """
+    global _FLEET_SERVICES_STARTED
+    with _FLEET_SERVICES_LOCK:
+        if _FLEET_SERVICES_STARTED:
+            return
+        _FLEET_SERVICES_STARTED = True
+        # Ensure DB schema and migrate JSON backup -> SQLite if needed before running
+        _ensure_db_schema()
+        _create_default_org_from_env()
+        _FLEET_ALERTS.reload()
+        _load_fleet_state()
+        if HEALTH_RESCORE:
+            _rescore_fleet()
+        _FLEET_WRITER.start()
+        start_fleet_json_backup(FLEET_JSON_BACKUP_SECONDS)
+        start_fleet_reaper(FLEET_REAP_SECONDS)
+        if FLEET_OFFLINE_SECONDS > 0:
+            start_fleet_offline_detector()
 
 
 # DB/backup loading will be initialized when the application starts (see main())
@@ -285,13 +1662,198 @@ def _post_webhook(message: str) -> bool:
     try:
         with urllib.request.urlopen(req, timeout=5) as resp:  # pragma: no cover
             return 200 <= resp.getcode() < 300
-    except urllib.error.URLError:
+    except OSError:
+        # URLError, HTTPError and socket timeouts
+        return False
+
+
+def _claim_webhook_slot(key: str, now_ts: float) -> int | None:
+    """Réserve l'envoi de l'alerte `key` pour tous les workers (anti-rebond partagé via fleet_meta).
+
+    Retourne la date du précédent envoi (pour rendre la place si l'envoi échoue), ou None si
+    un envoi a déjà eu lieu il y a moins de `WEBHOOK_MIN_SECONDS`.
+    """
+    meta_key = f"webhook:{key}"
+    conn = _db()
+    try:
+        cur = conn.cursor()
+        cur.execute('BEGIN IMMEDIATE')
+        cur.execute('SELECT value FROM fleet_meta WHERE key = ?', (meta_key,))
+        row = cur.fetchone()
+        previous = int(row[0]) if row else 0
+        if now_ts - previous < WEBHOOK_MIN_SECONDS:
+            conn.rollback()
+            return None
+        cur.execute(
+            'INSERT INTO fleet_meta (key, value) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value = excluded.value',
+            (meta_key, int(now_ts)),
+        )
+        conn.commit()
+        return previous
+    except sqlite3.Error:
+        conn.rollback()
+        # no shared state available: behave like a single process
+        return 0
+
+
+def _prune_webhook_slots(now_ts: float) -> int:
+    """Supprime les anti-rebonds échus (plus vieux que `WEBHOOK_MIN_SECONDS`) : une ligne
+    absente vaut une ligne échue, et les clés par machine (règles, silences) s'accumuleraient."""
+    conn = _db()
+    try:
+        # key range instead of LIKE: served by the fleet_meta primary key
+        removed = conn.execute(
+            "DELETE FROM fleet_meta WHERE key >= 'webhook:' AND key < 'webhook;' AND value < ?",
+            (int(now_ts - WEBHOOK_MIN_SECONDS),),
+        ).rowcount
+        conn.commit()
+        return removed
+    except sqlite3.Error:
+        conn.rollback()
+        return 0
+
+
+def _release_webhook_slot(key: str, claimed_ts: float, previous: int) -> None:
+    conn = _db()
+    try:
+        conn.execute(
+            'UPDATE fleet_meta SET value = ? WHERE key = ? AND value = ?',
+            (previous, f"webhook:{key}", int(claimed_ts)),
+        )
+        conn.commit()
+    except sqlite3.Error:
+        conn.rollback()
+
+
+class _WebhookDispatcher:
+    """Envoi des webhooks hors des requêtes HTTP.
+
+    Les requêtes ne font qu'enfiler `(clé, message)` (file bornée, jamais bloquante). Un thread
+    regroupe tout ce qui arrive pendant `coalesce_seconds` en un seul message, applique
+    l'anti-rebond partagé entre workers (`_claim_webhook_slot`) puis envoie, avec des
+    nouveaux essais espacés exponentiellement si le service distant ne répond pas.
+    """
+
+    def __init__(self, maxsize: int, coalesce_seconds: float, max_attempts: int) -> None:
+        self.queue: queue.Queue[tuple[str, str]] = queue.Queue(maxsize=max(1, maxsize))
+        self.coalesce_seconds = max(0.0, coalesce_seconds)
+        self.max_attempts = max(1, max_attempts)
+        self._thread: threading.Thread | None = None
+        self._start_lock = threading.Lock()
+        self._enqueue_lock = threading.Lock()
+        self._last_enqueued: Dict[str, float] = {}
+        self._prune_at = 1024
+        self.enqueued = 0
+        self.dropped = 0
+        self.debounced = 0
+        self.sent = 0
+        self.failed = 0
+        self.retries = 0
+        self.last_error_ts = 0.0
+
+    def start(self) -> None:
+        with self._start_lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def enqueue(self, key: str, message: str) -> bool:
+        now = time.monotonic()
+        with self._enqueue_lock:
+            # one alert per key and window is enough: the rest would be coalesced anyway
+            if now - self._last_enqueued.get(key, -self.coalesce_seconds - 1) < self.coalesce_seconds:
+                return False
+            self._last_enqueued[key] = now
+            if len(self._last_enqueued) >= self._prune_at:
+                # per-machine keys: forget the windows that are over (amortized O(1) per call)
+                self._last_enqueued = {k: ts for k, ts in self._last_enqueued.items()
+                                       if now - ts < self.coalesce_seconds}
+                self._prune_at = max(1024, 2 * len(self._last_enqueued))
+        self.start()
+        try:
+            self.queue.put_nowait((key, message))
+        except queue.Full:
+            self.dropped += 1
+            return False
+        self.enqueued += 1
+        return True
+
+    def metrics(self) -> Dict[str, object]:
+        return {
+            "queue_depth": self.queue.qsize(),
+            "enqueued": self.enqueued,
+            "dropped": self.dropped,
+            "debounced": self.debounced,
+            "sent": self.sent,
+            "failed": self.failed,
+            "retries": self.retries,
+            "last_error_ts": self.last_error_ts,
+        }
+
+    def _collect(self) -> Dict[str, tuple[str, int]]:
+        alerts: Dict[str, tuple[str, int]] = {}
+        key, message = self.queue.get()
+        alerts[key] = (message, 1)
+        deadline = time.monotonic() + self.coalesce_seconds
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                key, message = self.queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            # latest message per key, with the number of occurrences
+            alerts[key] = (message, alerts.get(key, ("", 0))[1] + 1)
+        return alerts
+
+    def _deliver(self, message: str) -> bool:
+        delay = 2.0
+        for attempt in range(self.max_attempts):
+            if attempt:
+                self.retries += 1
+                time.sleep(delay)
+                delay = min(delay * 2, 60.0)
+            if _post_webhook(message):
+                return True
         return False
 
+    def _run(self) -> None:
+        while True:
+            alerts = self._collect()
+            now_ts = time.time()
+            claimed: Dict[str, int] = {}
+            lines = []
+            for key, (message, count) in alerts.items():
+                previous = _claim_webhook_slot(key, now_ts)
+                if previous is None:
+                    self.debounced += 1
+                    continue
+                claimed[key] = previous
+                lines.append(message if count == 1 else f"{message} (x{count})")
+            if not lines:
+                continue
+            text = lines[0] if len(lines) == 1 else f"{len(lines)} alertes :\n" + "\n".join(f"- {line}" for line in lines)
+            if self._deliver(text):
+                self.sent += 1
+                continue
+            self.failed += 1
+            self.last_error_ts = now_ts
+            # let the next alert try again instead of waiting WEBHOOK_MIN_SECONDS
+            for key, previous in claimed.items():
+                _release_webhook_slot(key, now_ts, previous)
+
+
+_WEBHOOKS = _WebhookDispatcher(WEBHOOK_QUEUE_MAX, WEBHOOK_COALESCE_SECONDS, WEBHOOK_MAX_ATTEMPTS)
 
-def collect_stats() -> Dict[str, object]:
-    """Récupère les métriques système courantes."""
-    cpu_percent = psutil.cpu_percent(interval=0.3)
+
+def collect_stats(cpu_interval: float | None = 0.3) -> Dict[str, object]:
+    """Récupère les métriques système courantes.
+
+    `cpu_interval=None` ne bloque pas : le CPU est mesuré depuis l'appel précédent.
+    """
+    cpu_percent = psutil.cpu_percent(interval=cpu_interval)
     ram = psutil.virtual_memory()
     disk = psutil.disk_usage(_disk_usage_target())
     uptime_seconds = time.time() - psutil.boot_time()
@@ -314,6 +1876,55 @@ def collect_stats() -> Dict[str, object]:
     }
 
 
+class _StatsSampler:
+    """Échantillonne `collect_stats()` en tâche de fond et sert le dernier instantané.
+
+    Les requêtes ne bloquent plus sur la mesure CPU : N onglets ouverts coûtent une
+    seule mesure toutes les `interval` secondes.
+    """
+
+    def __init__(self, interval: float) -> None:
+        self.interval = max(0.1, interval)
+        self._snapshot: Dict[str, object] | None = None
+        self._sampled_at = 0.0
+        self._ready = threading.Event()
+        self._lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def latest(self) -> Dict[str, object]:
+        """Copie du dernier instantané, avec son âge (`sample_age_seconds`)."""
+        self.start()
+        if not self._ready.wait(timeout=2.0):
+            return collect_stats()
+        stats = dict(self._snapshot or {})
+        stats["sample_age_seconds"] = round(time.monotonic() - self._sampled_at, 3)
+        return stats
+
+    def _run(self) -> None:
+        # first sample blocks briefly so the first CPU value is meaningful, then deltas between samples
+        cpu_interval: float | None = 0.3
+        while True:
+            try:
+                snapshot = collect_stats(cpu_interval=cpu_interval)
+                cpu_interval = None
+                self._snapshot = snapshot
+                self._sampled_at = time.monotonic()
+                self._ready.set()
+            except Exception:
+                pass
+            time.sleep(self.interval)
+
+
+_STATS_SAMPLER = _StatsSampler(STATS_SAMPLE_SECONDS)
+
+
 def export_to_csv(csv_path: Path, rows: Iterable[Dict[str, object]]) -> None:
     """Ajoute des lignes dans un CSV, crée l’en-tête si le fichier est nouveau."""
     fieldnames = [
@@ -362,27 +1973,363 @@ def export_to_jsonl(jsonl_path: Path, rows: Iterable[Dict[str, object]]) -> None
             file.write(json.dumps(row) + "\n")
 
 
+def _history_record(row: Dict[str, str]) -> Dict[str, object] | None:
+    try:
+        return {
+            "timestamp": row["timestamp"],
+            "cpu_percent": float(row["cpu_percent"]),
+            "ram_percent": float(row["ram_percent"]),
+            "disk_percent": float(row["disk_percent"]),
+            "uptime_hms": row.get("uptime_hms", ""),
+        }
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def _parse_history_lines(header: list[str], lines: list[bytes]) -> list[Dict[str, object]]:
+    text = b"\n".join(lines).decode("utf-8", errors="replace")
+    records = []
+    for row in csv.DictReader(io.StringIO(text), fieldnames=header):
+        record = _history_record(row)
+        if record is not None:
+            records.append(record)
+    return records
+
+
+def _read_csv_header(fh) -> list[str]:
+    fh.seek(0)
+    first = fh.readline().decode("utf-8", errors="replace")
+    return next(csv.reader([first]), [])
+
+
+def _read_tail_lines(fh, count: int, block_size: int = 64 * 1024) -> tuple[list[bytes], bool]:
+    """Lit les `count` dernières lignes en remontant depuis la fin du fichier par blocs.
+
+    Renvoie (lignes, début_atteint) ; si le début du fichier est atteint, toutes les
+    lignes qui suivent l'en-tête sont renvoyées.
+    """
+    fh.seek(0, os.SEEK_END)
+    pos = fh.tell()
+    data = b""
+    while pos > 0 and data.count(b"\n") <= count:
+        step = min(block_size, pos)
+        pos -= step
+        fh.seek(pos)
+        data = fh.read(step) + data
+    # first line is either the header or a partial line at the block boundary
+    lines = data.splitlines()[1:]
+    return (lines, True) if pos == 0 else (lines[-count:], False)
+
+
 def load_history(csv_path: Path, limit: int = 200) -> list[Dict[str, object]]:
-    """Lit les dernières lignes du CSV d’historique (limite 200 par défaut)."""
-    if not csv_path.exists():
+    """Lit les dernières lignes du CSV d’historique (limite 200 par défaut).
+
+    Le fichier est lu depuis la fin : le coût dépend de `limit`, pas de la taille du CSV.
+    """
+    if not csv_path.exists() or limit <= 0:
+        return []
+
+    with csv_path.open("rb") as fh:
+        header = _read_csv_header(fh)
+        if not header:
+            return []
+        wanted = limit
+        while True:
+            lines, at_start = _read_tail_lines(fh, wanted)
+            records = _parse_history_lines(header, lines)
+            # invalid rows were skipped: read further back until `limit` valid rows are found
+            if len(records) >= limit or at_start:
+                return records[-limit:]
+            wanted *= 2
+
+
+def _history_index_path(csv_path: Path) -> Path:
+    return csv_path.with_suffix(csv_path.suffix + ".idx")
+
+
+def _update_history_index(csv_path: Path, fh) -> list[tuple[str, int]]:
+    """Complète l'index d'offsets (`<csv>.idx`) puis le renvoie trié par timestamp.
+
+    Une entrée est ajoutée tous les `HISTORY_INDEX_STRIDE` octets : on saute directement
+    à l'offset suivant et on lit une seule ligne, sans parcourir le reste du fichier.
+    L'index est reconstruit si le CSV a été tronqué ou remplacé.
+    """
+    index_path = _history_index_path(csv_path)
+    entries: list[tuple[str, int]] = []
+    if index_path.exists():
+        for line in index_path.read_text(encoding="utf-8").splitlines():
+            ts, _, offset = line.partition("\t")
+            if offset.isdigit():
+                entries.append((ts, int(offset)))
+
+    fh.seek(0, os.SEEK_END)
+    size = fh.tell()
+    if entries and entries[-1][1] >= size:
+        entries = []
+    if not entries:
+        fh.seek(0)
+        fh.readline()  # header
+        entries_start = fh.tell()
+    else:
+        entries_start = entries[-1][1] + HISTORY_INDEX_STRIDE
+
+    new_entries: list[tuple[str, int]] = []
+    pos = entries_start
+    first = not entries
+    while pos < size:
+        fh.seek(pos)
+        if not first:
+            fh.readline()  # skip to the next full line
+        offset = fh.tell()
+        line = fh.readline()
+        if not line.endswith(b"\n"):
+            break
+        ts = line.split(b",", 1)[0].decode("utf-8", errors="replace")
+        new_entries.append((ts, offset))
+        first = False
+        pos = offset + HISTORY_INDEX_STRIDE
+
+    if new_entries:
+        mode = "a" if entries else "w"
+        try:
+            with index_path.open(mode, encoding="utf-8") as idx:
+                idx.writelines(f"{ts}\t{offset}\n" for ts, offset in new_entries)
+        except OSError:
+            pass
+        entries.extend(new_entries)
+    return entries
+
+
+def load_history_range(csv_path: Path, start: str | None = None, end: str | None = None,
+                       limit: int = 500) -> list[Dict[str, object]]:
+    """Lit au plus `limit` lignes dont le timestamp ISO est dans [start, end].
+
+    L'index d'offsets permet de se positionner directement près de `start`.
+    """
+    if not csv_path.exists() or limit <= 0:
         return []
 
     records: list[Dict[str, object]] = []
-    with csv_path.open("r", encoding="utf-8") as csvfile:
-        reader = csv.DictReader(csvfile)
-        for row in reader:
-            try:
-                records.append({
-                    "timestamp": row["timestamp"],
-                    "cpu_percent": float(row["cpu_percent"]),
-                    "ram_percent": float(row["ram_percent"]),
-                    "disk_percent": float(row["disk_percent"]),
-                    "uptime_hms": row.get("uptime_hms", ""),
-                })
-            except (KeyError, ValueError):
+    with csv_path.open("rb") as fh:
+        header = _read_csv_header(fh)
+        if not header:
+            return []
+        index = _update_history_index(csv_path, fh)
+        offset = None
+        if start and index:
+            keys = [ts for ts, _ in index]
+            pos = bisect.bisect_left(keys, start)
+            if pos == len(keys) or keys[pos] != start:
+                pos -= 1
+            offset = index[max(0, pos)][1]
+        if offset is None:
+            fh.seek(0)
+            fh.readline()
+        else:
+            fh.seek(offset)
+
+        start_bytes = start.encode("utf-8") if start else b""
+        batch: list[bytes] = []
+        for line in fh:
+            # cheap prefix check before the CSV parsing of the lines before `start`
+            if start_bytes and line.split(b",", 1)[0] < start_bytes:
+                continue
+            batch.append(line.rstrip(b"\r\n"))
+            if len(batch) < 1000:
                 continue
+            if _collect_range(header, batch, start, end, limit, records):
+                return records
+            batch = []
+        if batch:
+            _collect_range(header, batch, start, end, limit, records)
+    return records
+
+
+def _collect_range(header: list[str], lines: list[bytes], start: str | None, end: str | None,
+                   limit: int, records: list[Dict[str, object]]) -> bool:
+    """Ajoute les lignes de la plage à `records` ; True quand la lecture peut s'arrêter."""
+    for record in _parse_history_lines(header, lines):
+        ts = str(record["timestamp"])
+        if start and ts < start:
+            continue
+        if end and ts > end:
+            return True
+        records.append(record)
+        if len(records) >= limit:
+            return True
+    return False
+
 
-    return records[-limit:]
+def _ensure_history_schema() -> None:
+    try:
+        conn = _db(HISTORY_DB_PATH)
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS history_raw (ts REAL PRIMARY KEY, cpu REAL, ram REAL, disk REAL, uptime_hms TEXT)'
+        )
+        # one row per (resolution in seconds, bucket start), updated incrementally on each sample
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS history_rollup ('
+            'resolution INTEGER, bucket INTEGER, samples INTEGER, '
+            'cpu_min REAL, cpu_sum REAL, cpu_max REAL, '
+            'ram_min REAL, ram_sum REAL, ram_max REAL, '
+            'disk_min REAL, disk_sum REAL, disk_max REAL, '
+            'PRIMARY KEY (resolution, bucket)) WITHOUT ROWID'
+        )
+    except Exception:
+        return
+
+
+_HISTORY_STATE = {"schema": False, "pruned_at": 0.0}
+
+
+def record_history_sample(stats: Dict[str, object], ts: float | None = None) -> None:
+    """Enregistre un échantillon brut et met à jour les agrégats 1m/1h/1d, en une transaction."""
+    if not _HISTORY_STATE["schema"]:
+        _ensure_history_schema()
+        _HISTORY_STATE["schema"] = True
+    ts = time.time() if ts is None else ts
+    cpu = float(stats["cpu_percent"])
+    ram = float(stats["ram_percent"])
+    disk = float(stats["disk_percent"])
+    conn = _db(HISTORY_DB_PATH)
+    try:
+        with conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO history_raw (ts, cpu, ram, disk, uptime_hms) VALUES (?, ?, ?, ?, ?)',
+                (ts, cpu, ram, disk, stats.get("uptime_hms", "")),
+            )
+            conn.executemany(
+                'INSERT INTO history_rollup VALUES (?, ?, 1, ?, ?, ?, ?, ?, ?, ?, ?, ?) '
+                'ON CONFLICT(resolution, bucket) DO UPDATE SET samples = samples + 1, '
+                'cpu_min = min(cpu_min, excluded.cpu_min), cpu_sum = cpu_sum + excluded.cpu_sum, '
+                'cpu_max = max(cpu_max, excluded.cpu_max), '
+                'ram_min = min(ram_min, excluded.ram_min), ram_sum = ram_sum + excluded.ram_sum, '
+                'ram_max = max(ram_max, excluded.ram_max), '
+                'disk_min = min(disk_min, excluded.disk_min), disk_sum = disk_sum + excluded.disk_sum, '
+                'disk_max = max(disk_max, excluded.disk_max)',
+                [
+                    (res, int(ts // res) * res, cpu, cpu, cpu, ram, ram, ram, disk, disk, disk)
+                    for res in HISTORY_RESOLUTIONS.values()
+                ],
+            )
+            # raw samples are only kept HISTORY_RAW_RETENTION_DAYS, pruned once per hour
+            if ts - _HISTORY_STATE["pruned_at"] > 3600:
+                conn.execute('DELETE FROM history_raw WHERE ts < ?', (ts - HISTORY_RAW_RETENTION_DAYS * 86400,))
+                _HISTORY_STATE["pruned_at"] = ts
+    except Exception:
+        return
+
+
+def _parse_history_time(value: str | None) -> float | None:
+    """Accepte un timestamp epoch ou une date ISO (heure locale)."""
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        return dt.datetime.fromisoformat(value).timestamp()
+    except ValueError:
+        return None
+
+
+def _pick_history_resolution(cur: sqlite3.Cursor, start_ts: float, end_ts: float,
+                             max_points: int) -> tuple[str, int]:
+    """Pas le plus fin dont le nombre de points attendu tient dans `max_points`.
+
+    Renvoie (niveau stocké à lire, pas en secondes) ; le pas est un multiple du niveau
+    (ex. 30 jours en 500 points : agrégats 1 h regroupés par 2 h), 0 pour les échantillons bruts.
+    """
+    span = max(0.0, end_ts - start_ts)
+    if span <= HISTORY_RAW_RETENTION_DAYS * 86400:
+        # count on the ts primary key, stopped early by the LIMIT
+        cur.execute(
+            'SELECT COUNT(*) FROM (SELECT 1 FROM history_raw WHERE ts >= ? AND ts <= ? LIMIT ?)',
+            (start_ts, end_ts, max_points + 1),
+        )
+        if cur.fetchone()[0] <= max_points:
+            return "raw", 0
+    needed = span / max(1, max_points)
+    # coarsest stored level not coarser than the needed step: fewest rows to regroup
+    name, seconds = next(iter(HISTORY_RESOLUTIONS.items()))
+    for level, level_seconds in HISTORY_RESOLUTIONS.items():
+        if level_seconds <= needed:
+            name, seconds = level, level_seconds
+    return name, seconds * max(1, math.ceil(needed / seconds))
+
+
+def _history_step_name(step: int) -> str:
+    for unit, seconds in (("d", 86400), ("h", 3600), ("m", 60)):
+        if step % seconds == 0:
+            return f"{step // seconds}{unit}"
+    return f"{step}s"
+
+
+def load_history_series(start_ts: float, end_ts: float, resolution: str = "auto",
+                        max_points: int = 500) -> tuple[str, list[Dict[str, object]]]:
+    """Lit l'historique de la base de séries temporelles sur [start_ts, end_ts].
+
+    `resolution` : raw, 1m, 1h, 1d ou auto (pas le plus fin qui tient dans `max_points`, en
+    regroupant au besoin les agrégats d'un niveau stocké, ex. 2 h pour 30 jours en 500 points).
+    Renvoie (résolution utilisée, points) ; pour les agrégats, `cpu_percent` & co sont
+    des moyennes, accompagnées de `*_min` / `*_max` et du nombre d'échantillons.
+    """
+    cur = _db(HISTORY_DB_PATH).cursor()
+    step = None
+    if resolution not in HISTORY_RESOLUTIONS and resolution != "raw":
+        resolution, step = _pick_history_resolution(cur, start_ts, end_ts, max_points)
+    if resolution == "raw":
+        cur.execute(
+            'SELECT ts, cpu, ram, disk, uptime_hms FROM history_raw WHERE ts >= ? AND ts <= ? ORDER BY ts DESC LIMIT ?',
+            (start_ts, end_ts, max_points),
+        )
+        rows = cur.fetchall()[::-1]
+        return resolution, [
+            {
+                "timestamp": dt.datetime.fromtimestamp(ts).isoformat(),
+                "cpu_percent": cpu,
+                "ram_percent": ram,
+                "disk_percent": disk,
+                "uptime_hms": uptime_hms or "",
+            }
+            for ts, cpu, ram, disk, uptime_hms in rows
+        ]
+
+    seconds = HISTORY_RESOLUTIONS[resolution]
+    if step and step != seconds:
+        # sums and sample counts make the regrouped min/avg/max exact
+        cur.execute(
+            'SELECT bucket - bucket % ? AS start, SUM(samples), MIN(cpu_min), SUM(cpu_sum), MAX(cpu_max), '
+            'MIN(ram_min), SUM(ram_sum), MAX(ram_max), MIN(disk_min), SUM(disk_sum), MAX(disk_max) '
+            'FROM history_rollup WHERE resolution = ? AND bucket >= ? AND bucket <= ? '
+            'GROUP BY start ORDER BY start DESC LIMIT ?',
+            (step, seconds, int(start_ts // step) * step, end_ts, max_points),
+        )
+        resolution = _history_step_name(step)
+    else:
+        cur.execute(
+            'SELECT bucket, samples, cpu_min, cpu_sum, cpu_max, ram_min, ram_sum, ram_max, disk_min, disk_sum, disk_max '
+            'FROM history_rollup WHERE resolution = ? AND bucket >= ? AND bucket <= ? ORDER BY bucket DESC LIMIT ?',
+            (seconds, int(start_ts // seconds) * seconds, end_ts, max_points),
+        )
+    points = []
+    for bucket, n, cmin, csum, cmax, rmin, rsum, rmax, dmin, dsum, dmax in reversed(cur.fetchall()):
+        points.append({
+            "timestamp": dt.datetime.fromtimestamp(bucket).isoformat(),
+            "cpu_percent": round(csum / n, 2),
+            "cpu_min": cmin,
+            "cpu_max": cmax,
+            "ram_percent": round(rsum / n, 2),
+            "ram_min": rmin,
+            "ram_max": rmax,
+            "disk_percent": round(dsum / n, 2),
+            "disk_min": dmin,
+            "disk_max": dmax,
+            "samples": n,
+            "uptime_hms": "",
+        })
+    return resolution, points
 
 
 def _run_subprocess(cmd: list[str]) -> Dict[str, object]:
@@ -487,7 +2434,7 @@ def _action_collect_logs() -> Dict[str, object]:
 
 
 def _maybe_send_webhook(stats: Dict[str, object]) -> None:
-    global _LAST_WEBHOOK_TS
+    """Enfile une alerte si la santé est critique ; l'envoi (et l'anti-rebond) est fait par `_WEBHOOKS`."""
     if not WEBHOOK_URL:
         return
     health = stats.get("health") or {}
@@ -496,25 +2443,18 @@ def _maybe_send_webhook(stats: Dict[str, object]) -> None:
     if status != "critical":
         return
 
-    now = time.time()
-    if now - _LAST_WEBHOOK_TS < WEBHOOK_MIN_SECONDS:
-        return
-
     msg = (
         f"Alerte santé critique: score={score}/100, "
         f"CPU={stats.get('cpu_percent', '?')}%, "
         f"RAM={stats.get('ram_percent', '?')}%, "
         f"Disk={stats.get('disk_percent', '?')}%"
     )
-    sent = _post_webhook(msg)
-    if sent:
-        _LAST_WEBHOOK_TS = now
+    _WEBHOOKS.enqueue("health_critical", msg)
 
 
 def _ensure_db_schema() -> None:
     try:
-        FLEET_DB_PATH.parent.mkdir(parents=True, exist_ok=True)
-        conn = sqlite3.connect(str(FLEET_DB_PATH))
+        conn = _db()
         cur = conn.cursor()
         # organizations table
         cur.execute(
@@ -533,46 +2473,165 @@ def _ensure_db_schema() -> None:
             cur.execute('ALTER TABLE fleet ADD COLUMN org_id TEXT')
         except Exception:
             pass
+        try:
+            cur.execute('ALTER TABLE fleet ADD COLUMN seq INTEGER')
+        except Exception:
+            pass
+        cur.execute('CREATE INDEX IF NOT EXISTS idx_fleet_org ON fleet (org_id)')
+        cur.execute('CREATE INDEX IF NOT EXISTS idx_fleet_seq ON fleet (seq)')
+        cur.execute('CREATE INDEX IF NOT EXISTS idx_fleet_ts ON fleet (ts)')
+        # shared change counter, bumped by every fleet write (see _sync_fleet_state)
+        cur.execute('CREATE TABLE IF NOT EXISTS fleet_meta (key TEXT PRIMARY KEY, value INTEGER)')
+        cur.execute("INSERT OR IGNORE INTO fleet_meta (key, value) VALUES ('seq', 0)")
+        cur.execute('CREATE INDEX IF NOT EXISTS idx_fleet_org_seq ON fleet (org_id, seq)')
+        cur.execute(
+            'CREATE TABLE IF NOT EXISTS fleet_tombstones '
+            '(id TEXT PRIMARY KEY, org_id TEXT, machine_id TEXT, seq INTEGER, ts REAL)'
+        )
+        cur.execute('CREATE INDEX IF NOT EXISTS idx_fleet_tombstones_org_seq ON fleet_tombstones (org_id, seq)')
+        cur.execute('CREATE INDEX IF NOT EXISTS idx_fleet_tombstones_ts ON fleet_tombstones (ts)')
+        # per-org alert rules (see _FleetAlertEngine), rule = JSON from _parse_alert_rule
+        cur.execute('CREATE TABLE IF NOT EXISTS fleet_alert_rules (id TEXT PRIMARY KEY, org_id TEXT, rule TEXT, created_at REAL)')
+        cur.execute('CREATE INDEX IF NOT EXISTS idx_fleet_alert_rules_org ON fleet_alert_rules (org_id)')
+        cur.execute('CREATE TABLE IF NOT EXISTS fleet_stream_tokens (token TEXT PRIMARY KEY, org_id TEXT, expires REAL)')
+        cur.execute('CREATE INDEX IF NOT EXISTS idx_fleet_stream_tokens_expires ON fleet_stream_tokens (expires)')
         conn.commit()
-        conn.close()
     except Exception:
+        _db().rollback()
+
+
+def _create_default_org_from_env() -> None:
+    """If FLEET_TOKEN env is present, ensure a default organization exists mapped to that key."""
+    if not FLEET_TOKEN:
         return
+    try:
+        conn = _db()
+        cur = conn.cursor()
+        # create a deterministic org id for legacy token
+        org_id = f"org_default"
+        cur.execute('INSERT OR IGNORE INTO organizations (id, name) VALUES (?, ?)', (org_id, 'default'))
+        # insert api_key mapping
+        cur.execute('INSERT OR IGNORE INTO api_keys (key, org_id, created_at, revoked) VALUES (?, ?, ?, 0)',
+                    (FLEET_TOKEN, org_id, time.time()))
+        if cur.rowcount:
+            _bump_api_keys_generation(conn)
+        conn.commit()
+    except Exception:
+        _db().rollback()
+
+
+class _ApiKeyCache:
+    """Cache LRU clé API -> org_id avec TTL.
+
+    Les clés inconnues ou révoquées sont aussi mises en cache (cache négatif, LRU séparé
+    pour qu'une attaque par force brute n'évince pas les clés valides). Le cache entier
+    est vidé quand `fleet_meta.api_keys_generation` change, c'est-à-dire après une
+    création d'organisation ou une révocation, y compris depuis un autre worker.
+    """
+
+    def __init__(self, maxsize: int, ttl: float) -> None:
+        self.maxsize = max(1, maxsize)
+        self.ttl = ttl
+        self._positive: OrderedDict[str, tuple[str, float]] = OrderedDict()
+        self._negative: OrderedDict[str, float] = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation: int | None = None
+        self._generation_checked = 0.0
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, key: str) -> tuple[bool, str | None]:
+        """Renvoie (trouvé, org_id) ; org_id None pour une entrée négative."""
+        now = time.monotonic()
+        with self._lock:
+            hit = self._positive.get(key)
+            if hit is not None and now - hit[1] < self.ttl:
+                self._positive.move_to_end(key)
+                self.hits += 1
+                return True, hit[0]
+            neg = self._negative.get(key)
+            if neg is not None and now - neg < self.ttl:
+                self._negative.move_to_end(key)
+                self.negative_hits += 1
+                return True, None
+            self.misses += 1
+            return False, None
+
+    def put(self, key: str, org_id: str | None) -> None:
+        now = time.monotonic()
+        with self._lock:
+            self._positive.pop(key, None)
+            self._negative.pop(key, None)
+            if org_id:
+                self._positive[key] = (org_id, now)
+                if len(self._positive) > self.maxsize:
+                    self._positive.popitem(last=False)
+            else:
+                self._negative[key] = now
+                if len(self._negative) > self.maxsize:
+                    self._negative.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._positive.clear()
+            self._negative.clear()
+            self.invalidations += 1
+
+    def check_generation(self, force: bool = False) -> None:
+        """Vide le cache si la génération partagée a changé (relue au plus toutes les N secondes)."""
+        now = time.monotonic()
+        if not force and now - self._generation_checked < API_KEY_GENERATION_CHECK_SECONDS:
+            return
+        self._generation_checked = now
+        try:
+            row = _db().execute("SELECT value FROM fleet_meta WHERE key = 'api_keys_generation'").fetchone()
+        except Exception:
+            return
+        generation = row[0] if row else 0
+        if self._generation is not None and generation != self._generation:
+            self.clear()
+        self._generation = generation
+
+    def metrics(self) -> Dict[str, object]:
+        lookups = self.hits + self.negative_hits + self.misses
+        return {
+            "size": len(self._positive),
+            "negative_size": len(self._negative),
+            "hits": self.hits,
+            "negative_hits": self.negative_hits,
+            "misses": self.misses,
+            "hit_ratio": round((self.hits + self.negative_hits) / lookups, 4) if lookups else 0.0,
+            "invalidations": self.invalidations,
+        }
+
 
+_API_KEY_CACHE = _ApiKeyCache(API_KEY_CACHE_SIZE, API_KEY_CACHE_TTL)
 
-def _create_default_org_from_env() -> None:
-    """If FLEET_TOKEN env is present, ensure a default organization exists mapped to that key."""
-    if not FLEET_TOKEN:
-        return
-    try:
-        conn = sqlite3.connect(str(FLEET_DB_PATH))
-        cur = conn.cursor()
-        # create a deterministic org id for legacy token
-        org_id = f"org_default"
-        cur.execute('INSERT OR IGNORE INTO organizations (id, name) VALUES (?, ?)', (org_id, 'default'))
-        # insert api_key mapping
-        cur.execute('INSERT OR IGNORE INTO api_keys (key, org_id, created_at, revoked) VALUES (?, ?, ?, 0)',
-                    (FLEET_TOKEN, org_id, time.time()))
-        conn.commit()
-        conn.close()
-    except Exception:
-        return
+
+def _bump_api_keys_generation(conn: sqlite3.Connection) -> None:
+    """Invalide les caches de clés de tous les workers (à appeler dans la transaction d'écriture)."""
+    conn.execute(
+        "INSERT INTO fleet_meta (key, value) VALUES ('api_keys_generation', 1) "
+        "ON CONFLICT(key) DO UPDATE SET value = value + 1"
+    )
 
 
 def _get_org_for_key(key: str) -> str | None:
+    _API_KEY_CACHE.check_generation()
+    found, org_id = _API_KEY_CACHE.get(key)
+    if found:
+        return org_id
     try:
-        conn = sqlite3.connect(str(FLEET_DB_PATH))
-        cur = conn.cursor()
+        cur = _db().cursor()
         cur.execute('SELECT org_id, revoked FROM api_keys WHERE key = ?', (key,))
         row = cur.fetchone()
-        conn.close()
-        if not row:
-            return None
-        org_id, revoked = row
-        if revoked:
-            return None
-        return org_id
     except Exception:
         return None
+    org_id = row[0] if row and not row[1] else None
+    _API_KEY_CACHE.put(key, org_id)
+    return org_id
 
 
 def _check_org_key() -> tuple[bool, str | None]:
@@ -633,6 +2692,11 @@ def print_stats(stats: Dict[str, object]) -> None:
     )
 
 
+@app.before_request
+def _ensure_fleet_services() -> None:
+    _start_fleet_services()
+
+
 @app.route("/")
 def dashboard() -> str:
     return render_template("index.html")
@@ -646,17 +2710,18 @@ def history_page() -> str:
 @app.route("/fleet")
 def fleet_page() -> str:
     # expose le TTL côté client pour cohérence (secondes)
-    return render_template("fleet.html", fleet_ttl_seconds=FLEET_TTL_SECONDS)
+    return render_template("fleet.html", fleet_ttl_seconds=FLEET_TTL_SECONDS,
+                           fleet_offline_seconds=FLEET_OFFLINE_SECONDS)
 
 
 @app.route("/api/stats")
 def api_stats():
-    return jsonify(collect_stats())
+    return jsonify(_STATS_SAMPLER.latest())
 
 
 @app.route("/api/status")
 def api_status():
-    stats = collect_stats()
+    stats = _STATS_SAMPLER.latest()
     stats["health"] = _health_score(stats)
     _maybe_send_webhook(stats)
     return jsonify(stats)
@@ -693,15 +2758,14 @@ def api_create_org():
     key = secrets.token_hex(16)
 
     try:
-        conn = sqlite3.connect(str(FLEET_DB_PATH))
-        cur = conn.cursor()
-        cur.execute('INSERT INTO organizations (id, name) VALUES (?, ?)', (org_id, name))
-        cur.execute('INSERT INTO api_keys (key, org_id, created_at, revoked) VALUES (?, ?, ?, 0)', (key, org_id, time.time()))
-        conn.commit()
-        conn.close()
+        with _db() as conn:
+            conn.execute('INSERT INTO organizations (id, name) VALUES (?, ?)', (org_id, name))
+            conn.execute('INSERT INTO api_keys (key, org_id, created_at, revoked) VALUES (?, ?, ?, 0)', (key, org_id, time.time()))
+            _bump_api_keys_generation(conn)
     except Exception as exc:
         return jsonify({"error": "db error"}), 500
 
+    _API_KEY_CACHE.clear()
     return jsonify({"org_id": org_id, "api_key": key, "name": name})
 
 
@@ -713,8 +2777,7 @@ def api_list_orgs():
         return jsonify(auth_err), 403
 
     try:
-        conn = sqlite3.connect(str(FLEET_DB_PATH))
-        cur = conn.cursor()
+        cur = _db().cursor()
         cur.execute('SELECT id, name FROM organizations')
         orgs = cur.fetchall()
         result = []
@@ -726,7 +2789,6 @@ def api_list_orgs():
                 masked = (k[:6] + '...' + k[-4:]) if k else None
                 key_list.append({"key_masked": masked, "created_at": created_at, "revoked": bool(revoked)})
             result.append({"org_id": oid, "name": name, "keys": key_list})
-        conn.close()
         return jsonify({"count": len(result), "orgs": result})
     except Exception:
         return jsonify({"error": "db error"}), 500
@@ -746,19 +2808,37 @@ def api_revoke_key():
         return jsonify({"error": "key requis"}), 400
 
     try:
-        conn = sqlite3.connect(str(FLEET_DB_PATH))
-        cur = conn.cursor()
-        cur.execute('UPDATE api_keys SET revoked = ? WHERE key = ?', (1 if revoke else 0, key))
-        conn.commit()
-        changed = cur.rowcount
-        conn.close()
+        with _db() as conn:
+            cur = conn.execute('UPDATE api_keys SET revoked = ? WHERE key = ?', (1 if revoke else 0, key))
+            changed = cur.rowcount
+            if changed:
+                _bump_api_keys_generation(conn)
         if changed:
+            # local worker: effective immediately; others follow through the generation counter
+            _API_KEY_CACHE.clear()
             return jsonify({"ok": True, "revoked": revoke})
         return jsonify({"ok": False, "message": "clé inconnue"}), 404
     except Exception:
         return jsonify({"error": "db error"}), 500
 
 
+@app.route("/api/metrics")
+def api_metrics():
+    """Compteurs internes du serveur (file d'ingestion, cache de clés, ...). Protégé par ACTION_TOKEN."""
+    auth_err = _check_action_token()
+    if auth_err:
+        return jsonify(auth_err), 403
+    return jsonify({
+        "fleet_ingest": _FLEET_WRITER.metrics(),
+        "api_key_cache": _API_KEY_CACHE.metrics(),
+        "fleet_reaper": dict(_FLEET_REAPER_STATS),
+        "fleet_stream": _FLEET_STREAM.metrics(),
+        "webhooks": _WEBHOOKS.metrics(),
+        "fleet_alerts": _FLEET_ALERTS.metrics(),
+        "fleet_offline": dict(_FLEET_OFFLINE_STATS, timers=len(_FLEET_WHEEL), silent=len(_FLEET_OFFLINE)),
+    })
+
+
 @app.route("/admin/orgs")
 def admin_orgs():
     """Simple admin UI for organizations and API keys."""
@@ -803,51 +2883,670 @@ def api_fleet_report():
         return jsonify({"error": "Unauthorized"}), 403
 
     payload = request.get_json(silent=True) or {}
-    machine_id = str(payload.get("machine_id") or payload.get("id") or uuid.uuid4())
-    if not machine_id:
-        return jsonify({"error": "machine_id manquant"}), 400
+    body, status = _ingest_fleet_report(org_id, payload, request.remote_addr)
+    return jsonify(body), status
+
 
+def _validate_fleet_report(payload: object, require_id: bool = False) -> tuple[str, Dict[str, object]] | str:
+    """Renvoie (machine_id, report) pour un rapport valide, sinon le message d'erreur."""
+    if not isinstance(payload, dict):
+        return "payload doit être un objet JSON"
+    machine_id = payload.get("machine_id") or payload.get("id")
+    if not machine_id:
+        if require_id:
+            return "machine_id manquant"
+        machine_id = uuid.uuid4()
     report = payload.get("report") or {}
-    now_ts = time.time()
+    if not isinstance(report, dict):
+        return "report doit être un objet JSON"
+    return str(machine_id), report
 
+
+def _fleet_report_item(org_id: str, machine_id: str, report: Dict[str, object], client: str | None,
+                       ts: float) -> tuple[str, Dict[str, object], str]:
+    """(store_key, entrée, rapport JSON) d'un rapport reçu, pas encore appliqué à `FLEET_STATE`."""
     # key entries by org:machine to avoid collisions
     store_key = f"{org_id}:{machine_id}"
+    if HEALTH_RESCORE:
+        report = _rescored_report(report)
+    # encoded once here, then reused by the DB write, the backup and the listings
+    return store_key, _fleet_report_entry(org_id, machine_id, report, client, ts), _json_bytes(report).decode("utf-8")
 
-    FLEET_STATE[store_key] = {
-        "id": machine_id,
-        "report": report,
-        "ts": now_ts,
-        "client": request.remote_addr,
-        "org_id": org_id,
-    }
 
-    _save_fleet_state()
+def _put_fleet_report(org_id: str, machine_id: str, report: Dict[str, object], client: str | None,
+                      now_ts: float) -> str:
+    store_key, entry, report_json = _fleet_report_item(org_id, machine_id, report, client, now_ts)
+    _fleet_put(store_key, entry, report_json)
+    return store_key
 
-    return jsonify({"ok": True})
+
+def _health_inputs(report: object) -> tuple[float, float, float] | None:
+    """(cpu, ram, disque) d'un rapport, None s'il lui manque une de ces métriques."""
+    if not isinstance(report, dict):
+        return None
+    try:
+        return float(report["cpu_percent"]), float(report["ram_percent"]), float(report["disk_percent"])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def _rescored_report(report: Dict[str, object]) -> Dict[str, object]:
+    """Rapport dont `health` est recalculé avec la configuration du serveur (copie si elle change)."""
+    if _health_inputs(report) is None:
+        return report
+    health = _health_score(report)
+    return report if report.get("health") == health else dict(report, health=health)
+
+
+def _rescore_fleet(org_id: str | None = None) -> Dict[str, int]:
+    """Recalcule `health` de toute la flotte (ou d'une org) avec la configuration courante.
+
+    Une passe `_health_scores` sur les colonnes CPU/RAM/disque ; seules les machines dont le
+    résultat change sont remplacées dans `FLEET_STATE` (SSE, alertes, résumé) puis réécrites
+    en base en une transaction, sans point d'historique.
+    """
+    with _FLEET_INDEX_LOCK:
+        items = list((FLEET_BY_ORG.get(org_id, {}) if org_id else FLEET_STATE).items())
+    scored: list[tuple[str, Dict[str, object]]] = []
+    columns: list[tuple[float, float, float]] = []
+    for store_key, entry in items:
+        values = _health_inputs(entry.get("report"))
+        if values is not None:
+            scored.append((store_key, entry))
+            columns.append(values)
+    if not scored:
+        return {"machines": 0, "rescored": 0}
+    cpu, ram, disk = zip(*columns)
+    results = _health_scores(cpu, ram, disk)
+    scores, statuses, components = results["score"], results["status"], results["components"]
+    changed: list[str] = []
+    for index, (store_key, entry) in enumerate(scored):
+        health = {
+            "score": int(scores[index]),
+            "status": str(statuses[index]),
+            "components": {name: int(values[index]) for name, values in components.items()},
+        }
+        report = entry["report"]
+        if report.get("health") == health:
+            continue
+        report = dict(report, health=health)
+        with _FLEET_INDEX_LOCK:
+            # a newer report arrived meanwhile: it was already scored at ingestion
+            if FLEET_STATE.get(store_key) is not entry:
+                continue
+            _fleet_put(store_key, dict(entry, report=report), _json_bytes(report).decode("utf-8"))
+        changed.append(store_key)
+    if changed:
+        _upsert_fleet_rows(changed, record_metrics=False)
+    return {"machines": len(scored), "rescored": len(changed)}
+
+
+def _touch_fleet_entry(org_id: str, machine_id: str, client: str | None, now_ts: float) -> str | None:
+    """Heartbeat : nouvelle entrée avec le même rapport (et son JSON déjà encodé) et un `ts` à jour."""
+    store_key = f"{org_id}:{machine_id}"
+    with _FLEET_INDEX_LOCK:
+        current = FLEET_STATE.get(store_key)
+        if current is None:
+            return None
+        entry = dict(current, ts=max(now_ts, current.get("ts", 0) or 0), client=client)
+        _fleet_index(store_key, entry, _fleet_report_json(store_key, current))
+        silent_since = _fleet_back_online(store_key, entry)
+        # "held for N minutes" rules keep progressing while the agent only sends heartbeats
+        _FLEET_ALERTS.evaluate(store_key, entry)
+    _publish_fleet_update(entry)
+    if silent_since is not None:
+        _notify_fleet_online(entry, silent_since)
+    return store_key
+
+
+def _fleet_report_entry(org_id: str, machine_id: str, report: Dict[str, object], client: str | None,
+                        ts: float) -> Dict[str, object]:
+    return {"id": machine_id, "report": report, "ts": ts, "client": client, "org_id": org_id}
+
+
+def _batch_item_ts(value: object, now_ts: float) -> float:
+    """`ts` d'un élément de lot (rapport mis en spool par l'agent) : epoch borné à
+    [now - rétention de l'historique, now] ; absent ou invalide -> heure de réception."""
+    try:
+        ts = float(value)  # type: ignore[arg-type]
+    except (TypeError, ValueError):
+        return now_ts
+    if ts != ts or ts < now_ts - FLEET_METRICS_RETENTION_DAYS * 86400:
+        return now_ts
+    return min(ts, now_ts)
+
+
+def _ingest_fleet_report(org_id: str, payload: object, client: str | None) -> tuple[Dict[str, object], int]:
+    """Enregistre un rapport d'agent déjà authentifié. Retourne (corps JSON, statut HTTP).
+
+    Partagé par `/api/fleet/report` (Flask) et le serveur d'ingestion asyncio (`async_ingest.py`).
+    Un heartbeat (`{"machine_id": ..., "heartbeat": true}`, envoyé par l'agent quand ses
+    métriques n'ont pas bougé) rafraîchit seulement `ts` ; 409 si la machine est inconnue
+    ici, l'agent renvoie alors un rapport complet.
+    """
+    if isinstance(payload, dict) and payload.get("heartbeat"):
+        machine_id = payload.get("machine_id") or payload.get("id")
+        if not machine_id:
+            return {"error": "machine_id manquant"}, 400
+        # the heartbeat keeps our copy of the report: pick up first a newer report received
+        # by another worker, or it would be republished (and kept) under the new ts
+        _sync_fleet_state(force=True)
+        store_key = _touch_fleet_entry(org_id, str(machine_id), client, time.time())
+        if store_key is None:
+            return {"error": "machine inconnue, rapport complet attendu"}, 409
+        _persist_fleet_entry(store_key, touch=True)
+        return {"ok": True}, 200
+
+    checked = _validate_fleet_report(payload)
+    if isinstance(checked, str):
+        return {"error": checked}, 400
+    machine_id, report = checked
+    store_key = _put_fleet_report(org_id, machine_id, report, client, time.time())
+
+    _persist_fleet_entry(store_key)
+
+    return {"ok": True}, 200
+
+
+def _parse_fleet_batch(raw: bytes, content_type: str | None) -> list[object] | None:
+    """Éléments d'un lot : NDJSON (une ligne par rapport), tableau JSON ou `{"items": [...]}`.
+
+    Une ligne NDJSON illisible donne un `ValueError` à sa position (statut 400 pour cet élément) ;
+    None si le corps entier est invalide.
+    """
+    if "ndjson" in (content_type or "").lower():
+        items: list[object] = []
+        for line in raw.splitlines():
+            if not line.strip():
+                continue
+            try:
+                items.append(json.loads(line))
+            except ValueError as exc:
+                items.append(exc)
+        return items
+    try:
+        payload = json.loads(raw) if raw else None
+    except ValueError:
+        return None
+    if isinstance(payload, dict):
+        payload = payload.get("items")
+    return payload if isinstance(payload, list) else None
+
+
+def _ingest_fleet_batch(org_id: str, items: list[object], client: str | None) -> tuple[Dict[str, object], int]:
+    """Enregistre un lot de rapports déjà authentifié, en une seule transaction SQLite.
+
+    Chaque élément reçoit son statut (`results`, dans l'ordre du lot) ; les éléments invalides
+    sont refusés sans bloquer les autres. Un élément peut porter son `ts` (epoch de collecte,
+    rapports rejoués depuis le spool de l'agent). La transaction passe avant la mise à jour de
+    `FLEET_STATE` (SSE, alertes, backup JSON) : si elle échoue, rien n'est écrit nulle part et les
+    éléments valides passent en 503, le relais peut renvoyer le lot entier.
+    """
+    if len(items) > FLEET_BATCH_MAX_ITEMS:
+        return {"error": f"au plus {FLEET_BATCH_MAX_ITEMS} rapports par lot"}, 413
+    now_ts = time.time()
+    results: list[Dict[str, object]] = []
+    live: Dict[str, tuple[Dict[str, object], str]] = {}
+    history: list[Dict[str, object]] = []
+    for index, item in enumerate(items):
+        checked = "JSON invalide" if isinstance(item, ValueError) else _validate_fleet_report(item, require_id=True)
+        if isinstance(checked, str):
+            results.append({"index": index, "status": 400, "error": checked})
+            continue
+        machine_id, report = checked
+        ts = _batch_item_ts(item.get("ts"), now_ts)  # type: ignore[union-attr]
+        store_key, entry, report_json = _fleet_report_item(org_id, machine_id, report, client, ts)
+        # every item gets its history point (a replayed spool holds several per machine);
+        # only the newest one per machine becomes the live state
+        history.append(entry)
+        current = live[store_key][0] if store_key in live else FLEET_STATE.get(store_key)
+        if current is None or current.get("ts", 0) <= ts:
+            live[store_key] = (entry, report_json)
+        results.append({"index": index, "machine_id": machine_id, "status": 200})
+
+    accepted = len(history)
+    if accepted and not _upsert_fleet_rows(live, record_metrics=False, history=history, entries=live):
+        for result in results:
+            if result["status"] == 200:
+                result["status"] = 503
+                result["error"] = "stockage indisponible"
+        return {"ok": False, "accepted": 0, "rejected": len(results), "results": results}, 503
+    for store_key, (entry, report_json) in live.items():
+        with _FLEET_INDEX_LOCK:
+            # a newer report may have been applied while the transaction ran
+            current = FLEET_STATE.get(store_key)
+            if current is not None and current.get("ts", 0) > entry["ts"]:
+                continue
+            _fleet_put(store_key, entry, report_json)
+    return {"ok": True, "accepted": accepted, "rejected": len(results) - accepted, "results": results}, 200
+
+
+@app.route("/api/fleet/report/batch", methods=["POST"])
+def api_fleet_report_batch():
+    """Plusieurs rapports en un appel (relais de site) : authentification et commit uniques."""
+    ok, org_id = _check_org_key()
+    if not ok or not org_id:
+        return jsonify({"error": "Unauthorized"}), 403
+
+    items = _parse_fleet_batch(request.get_data(), request.content_type)
+    if items is None:
+        return jsonify({"error": "corps attendu : NDJSON, tableau JSON ou {\"items\": [...]}"}), 400
+    body, status = _ingest_fleet_batch(org_id, items, request.remote_addr)
+    return _json_response(body), status
 
 
 @app.route("/api/fleet")
 def api_fleet():
+    """Machines de l'org. Avec `since=<seq>`, seulement les machines modifiées ou expirées depuis.
+
+    Chaque réponse porte `seq`, le curseur à renvoyer au prochain appel, et un ETag fort :
+    `If-None-Match` donne un 304 sans corps tant que rien n'a changé. `limit`/`cursor`
+    paginent `data` (ordre des ids), `fields=id,ts,health.score` ne garde que ces champs.
+    """
     # require org-key to list fleet (multi-tenant)
     ok, org_id = _check_org_key()
     if not ok or not org_id:
         return jsonify({"error": "Unauthorized"}), 403
 
-    # purge entries expired for this org
-    now_ts = time.time()
-    expired = []
-    for mid, entry in list(FLEET_STATE.items()):
-        if entry.get("org_id") != org_id:
+    try:
+        limit = int(request.args["limit"]) if request.args.get("limit") else None
+    except ValueError:
+        return jsonify({"error": "limit must be an integer"}), 400
+    since_arg = request.args.get("since")
+    if since_arg is not None:
+        try:
+            since = int(since_arg)
+        except ValueError:
+            return jsonify({"error": "since must be an integer"}), 400
+        payload = _fleet_delta(org_id, since)
+        if payload is not None:
+            return _fleet_listing_response(payload, _fleet_etag(f'd{since}-{payload["seq"]}'), limit)
+
+    # pick up reports received by the other workers; expiry itself is done by the reaper
+    # thread, entries past the TTL that it has not removed yet are only reported here
+    _sync_fleet_state()
+    seq = int(_FLEET_SYNC["seq"])
+    cutoff = time.time() - FLEET_TTL_SECONDS
+    with _FLEET_INDEX_LOCK:
+        stale = sum(1 for entry in FLEET_BY_ORG.get(org_id, {}).values() if entry.get("ts", 0) < cutoff)
+    # shared state only (DB seq, not a per-process counter): every worker gives the same ETag
+    # for the same data; a report still in this worker's write queue shows up with the next seq
+    etag = _fleet_etag(f'{org_id}-{seq}-{stale}')
+    if etag in request.if_none_match:
+        return _fleet_not_modified(etag)
+    payload = _fleet_snapshot(org_id)
+    payload["seq"] = seq
+    return _fleet_listing_response(payload, etag, limit)
+
+
+@app.route("/api/fleet/summary")
+def api_fleet_summary():
+    """Résumé de l'org : machines par statut de santé, en ligne / silencieuses, min/moy/max CPU, RAM, disque.
+
+    Lu dans les agrégats tenus à jour à l'ingestion (`_FLEET_SUMMARY`), sans parcourir les
+    machines. Avec `ACTION_TOKEN` au lieu d'une clé d'org : toutes les orgs (mur d'écrans).
+    ETag : empreinte du contenu (quelques centaines d'octets par org), la même dans tous
+    les workers qui voient la même flotte ; 304 tant que rien n'a changé.
+    """
+    ok, org_id = _check_org_key()
+    if not (ok and org_id) and _check_action_token():
+        return jsonify({"error": "Unauthorized"}), 403
+
+    _sync_fleet_state()
+    with _FLEET_INDEX_LOCK:
+        org_ids = [org_id] if org_id else sorted(_FLEET_SUMMARY.org_ids(), key=str)
+        summaries = {oid: _FLEET_SUMMARY.get(oid) for oid in org_ids}
+    if org_id:
+        body = _json_bytes({"org_id": org_id, **summaries[org_id]})
+    else:
+        body = _json_bytes({"count": len(summaries), "orgs": summaries})
+    etag = _fleet_etag(f'sum-{zlib.crc32(body):08x}-{len(body)}')
+    if etag in request.if_none_match:
+        return _fleet_not_modified(etag)
+    return _json_response(None, etag, body)
+
+
+@app.route("/api/fleet/health")
+def api_fleet_health():
+    """Distribution de santé de l'org : statuts et percentiles (`q=50,90,99` par défaut) du
+    score et des métriques CPU/RAM/disque.
+
+    Scores recalculés avec la configuration du serveur (`HEALTH_*`) en une passe colonne
+    (`_health_scores`, numpy si installé). ETag : 304 tant que la flotte de l'org n'a pas changé.
+    """
+    ok, org_id = _check_org_key()
+    if not ok or not org_id:
+        return jsonify({"error": "Unauthorized"}), 403
+    try:
+        quantiles = [float(q) for q in request.args.get("q", "50,90,99").split(",")]
+    except ValueError:
+        return jsonify({"error": "q : percentiles séparés par des virgules"}), 400
+    if not quantiles or any(not 0 <= q <= 100 for q in quantiles):
+        return jsonify({"error": "q : percentiles entre 0 et 100"}), 400
+
+    _sync_fleet_state()
+    etag = _fleet_etag(f'health-{org_id}-{int(_FLEET_SYNC["seq"])}')
+    if etag in request.if_none_match:
+        return _fleet_not_modified(etag)
+    with _FLEET_INDEX_LOCK:
+        columns = [values for values in (_health_inputs(entry.get("report"))
+                                         for entry in FLEET_BY_ORG.get(org_id, {}).values()) if values is not None]
+    cpu, ram, disk = zip(*columns) if columns else ((), (), ())
+    results = _health_scores(cpu, ram, disk)
+    statuses = {"ok": 0, "warn": 0, "critical": 0}
+    if np is not None and len(columns):
+        labels, counts = np.unique(results["status"], return_counts=True)
+        statuses.update({str(label): int(count) for label, count in zip(labels, counts)})
+    else:
+        for status in results["status"]:
+            statuses[status] += 1
+    return _json_response({
+        "org_id": org_id,
+        "machines": len(columns),
+        "status": statuses,
+        "score": _percentiles(results["score"], quantiles),
+        "cpu_percent": _percentiles(cpu, quantiles),
+        "ram_percent": _percentiles(ram, quantiles),
+        "disk_percent": _percentiles(disk, quantiles),
+    }, etag)
+
+
+@app.route("/api/fleet/rescore", methods=["POST"])
+def api_fleet_rescore():
+    """Recalcule la santé de toutes les machines avec la configuration `HEALTH_*` de ce process.
+
+    Fait automatiquement au démarrage quand la configuration diffère de celle des agents ;
+    utile après un `/api/fleet/reload`. Protégé par `ACTION_TOKEN`.
+    """
+    auth_err = _check_action_token()
+    if auth_err:
+        return jsonify(auth_err), 403
+    started = time.perf_counter()
+    result = _rescore_fleet()
+    return jsonify({"ok": True, **result, "ms": round((time.perf_counter() - started) * 1000, 1)})
+
+
+def _response_encoding() -> str | None:
+    """Encodage négocié via Accept-Encoding : brotli si disponible, sinon gzip."""
+    accepted = request.accept_encodings
+    if brotli is not None and accepted["br"]:
+        return "br"
+    if accepted["gzip"]:
+        return "gzip"
+    return None
+
+
+def _fleet_etag(base: str) -> str:
+    """ETag d'une réponse de la flotte : état + paramètres de la requête + encodage négocié."""
+    query = request.query_string
+    if query:
+        base = f"{base}-{zlib.crc32(query):08x}"
+    encoding = _response_encoding()
+    return f"{base}-{encoding}" if encoding else base
+
+
+def _json_bytes(payload: object) -> bytes:
+    if orjson is not None:
+        try:
+            return orjson.dumps(payload)
+        except TypeError:
+            pass
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _json_response(payload: object, etag: str | None = None, body: bytes | None = None):
+    """Réponse JSON compacte (ou `body` déjà encodé), compressée au-delà de `FLEET_COMPRESS_MIN_BYTES`."""
+    body = _json_bytes(payload) if body is None else body
+    response = Response(body, mimetype="application/json")
+    encoding = _response_encoding()
+    if encoding and len(body) >= FLEET_COMPRESS_MIN_BYTES:
+        response.set_data(brotli.compress(body, quality=4) if encoding == "br" else gzip.compress(body, 3))
+        response.headers["Content-Encoding"] = encoding
+    response.vary.add("Accept-Encoding")
+    if etag is not None:
+        response.set_etag(etag)
+        # browsers revalidate on every fetch and get the 304 themselves
+        response.headers["Cache-Control"] = "private, no-cache"
+    return response
+
+
+def _fleet_not_modified(etag: str):
+    response = Response(status=304)
+    response.set_etag(etag)
+    return response
+
+
+def _parse_fleet_fields(value: str | None) -> list[list[str]] | None:
+    if not value:
+        return None
+    fields = []
+    for name in value.split(","):
+        parts = [part for part in name.strip().split(".") if part]
+        if parts and parts[0] == "report" and len(parts) > 1:
+            parts = parts[1:]
+        if parts:
+            fields.append(parts)
+    return fields or None
+
+
+def _project_fleet_entry(entry: Dict[str, object], fields: list[list[str]]) -> Dict[str, object]:
+    """Ne garde que les champs demandés : `id`, `ts`, `client`, `org_id`, ou un chemin dans `report`.
+
+    La forme de l'entrée est conservée (`report.health.score` reste imbriqué).
+    """
+    out: Dict[str, object] = {}
+    report = entry.get("report")
+    if not isinstance(report, dict):
+        report = {}
+    projected: Dict[str, object] = {}
+    for parts in fields:
+        head = parts[0]
+        if len(parts) == 1:
+            if head in _FLEET_ENTRY_FIELDS:
+                out[head] = entry.get(head)
+            elif head in report:
+                projected[head] = report[head]
+            continue
+        value: object = report
+        for part in parts:
+            value = value.get(part) if isinstance(value, dict) else None
+        if value is None:
             continue
-        if now_ts - entry.get("ts", 0) > FLEET_TTL_SECONDS:
-            expired.append(entry.get("id") or mid)
-            FLEET_STATE.pop(mid, None)
+        target = projected
+        for part in parts[:-1]:
+            target = target.setdefault(part, {})
+        target[parts[-1]] = value
+    if projected:
+        out["report"] = projected
+    return out
+
+
+_FLEET_ENTRY_FIELDS = frozenset(("id", "ts", "client", "org_id"))
+
+
+def _fleet_listing_response(payload: Dict[str, object], etag: str, limit: int | None):
+    """Applique pagination (`limit`/`cursor`) et projection (`fields`) puis répond en JSON compressé."""
+    if etag in request.if_none_match:
+        return _fleet_not_modified(etag)
+    data = payload["data"]
+    if limit is not None:
+        data = sorted(data, key=lambda entry: str(entry.get("id")))
+        payload["total"] = len(data)
+        cursor = request.args.get("cursor")
+        if cursor:
+            data = data[bisect.bisect_right([str(entry.get("id")) for entry in data], cursor):]
+        page = data[:max(1, limit)]
+        payload["next_cursor"] = str(page[-1].get("id")) if len(data) > len(page) else None
+        data = page
+    payload["count"] = len(data)
+    payload["data"] = data
+    return _json_response(None, etag, body=_fleet_payload_json(payload, request.args.get("fields", "")))
+
+
+def _fleet_payload_json(payload: Dict[str, object], fields_key: str) -> bytes:
+    """Encode une réponse de listing en collant le JSON en cache de chaque entrée de `data`
+    (ou de sa projection `fields`) au lieu de ré-encoder les rapports."""
+    fields = _parse_fleet_fields(fields_key)
+    data = payload.pop("data")
+    if fields:
+        items = (_fleet_projected_json(entry, fields, fields_key) for entry in data)
+    else:
+        items = (_fleet_entry_json(entry) for entry in data)
+    head = _json_bytes(payload)
+    return head[:-1] + b',"data":[' + b",".join(items) + b"]}"
+
+
+def _fleet_snapshot(org_id: str) -> Dict[str, object]:
+    cutoff = time.time() - FLEET_TTL_SECONDS
+    data = []
+    expired = []
+    for entry in list(FLEET_BY_ORG.get(org_id, {}).values()):
+        if entry.get("ts", 0) < cutoff:
+            expired.append(entry.get("id"))
+        else:
+            data.append(entry)
+    return {"count": len(data), "expired": expired, "data": data}
+
+
+def _fleet_delta(org_id: str, since: int) -> Dict[str, object] | None:
+    """Changements de l'org de seq > `since`, lus en base (index idx_fleet_org_seq).
+
+    Renvoie None si le curseur n'est plus exploitable (tombstones purgés, base recréée) :
+    l'appelant répond alors par la liste complète, avec un nouveau `seq`.
+    """
+    conn = _db()
+    try:
+        cur = conn.cursor()
+        # one read transaction: rows, tombstones and cursor come from the same snapshot
+        cur.execute('BEGIN')
+        cur.execute("SELECT key, value FROM fleet_meta WHERE key IN ('seq', 'tombstone_floor')")
+        meta = dict(cur.fetchall())
+        seq = int(meta.get("seq", 0))
+        if since < int(meta.get("tombstone_floor", 0)) or since > seq:
+            return None
+        if since == seq:
+            return {"seq": seq, "count": 0, "expired": [], "data": []}
+        cur.execute(
+            'SELECT id, report, ts, client, org_id FROM fleet WHERE org_id = ? AND seq > ?',
+            (org_id, since),
+        )
+        rows = cur.fetchall()
+        cur.execute(
+            'SELECT machine_id FROM fleet_tombstones t WHERE org_id = ? AND seq > ? '
+            'AND NOT EXISTS (SELECT 1 FROM fleet f WHERE f.id = t.id)',
+            (org_id, since),
+        )
+        expired = [row[0] for row in cur.fetchall()]
+    except Exception:
+        return None
+    finally:
+        conn.commit()
+    cutoff = time.time() - FLEET_TTL_SECONDS
+    data = []
+    for row in rows:
+        entry = _fleet_entry_from_row(*row)
+        if entry["ts"] < cutoff:
+            expired.append(entry["id"])
+        else:
+            data.append(entry)
+    return {"seq": seq, "count": len(data), "expired": expired, "data": data}
+
+
+def _issue_stream_token(org_id: str) -> str | None:
+    """Jeton de flux SSE valable `FLEET_STREAM_TOKEN_SECONDS`, en base pour tous les workers."""
+    token = secrets.token_urlsafe(24)
+    now_ts = time.time()
+    try:
+        with _db() as conn:
+            conn.execute('DELETE FROM fleet_stream_tokens WHERE expires < ?', (now_ts,))
+            conn.execute('INSERT INTO fleet_stream_tokens (token, org_id, expires) VALUES (?, ?, ?)',
+                         (token, org_id, now_ts + FLEET_STREAM_TOKEN_SECONDS))
+    except sqlite3.Error:
+        return None
+    return token
 
-    if expired:
-        _save_fleet_state()
 
-    data = [v for v in FLEET_STATE.values() if v.get("org_id") == org_id]
-    return jsonify({"count": len(data), "expired": expired, "data": data})
+def _org_for_stream_token(token: str) -> str | None:
+    try:
+        row = _db().execute('SELECT org_id FROM fleet_stream_tokens WHERE token = ? AND expires >= ?',
+                            (token, time.time())).fetchone()
+    except sqlite3.Error:
+        return None
+    return row[0] if row else None
+
+
+@app.route("/api/fleet/stream/token", methods=["POST"])
+def api_fleet_stream_token():
+    """Jeton court pour `/api/fleet/stream?token=` (clé API en en-tête `Authorization`).
+
+    `EventSource` ne peut pas envoyer d'en-tête : ce jeton, limité au flux de l'org et à
+    `FLEET_STREAM_TOKEN_SECONDS`, passe dans l'URL à la place de la clé API (journaux d'accès).
+    """
+    ok, org_id = _check_org_key()
+    if not ok or not org_id:
+        return jsonify({"error": "Unauthorized"}), 403
+    token = _issue_stream_token(org_id)
+    if token is None:
+        return jsonify({"error": "db error"}), 500
+    return jsonify({"token": token, "expires_in": FLEET_STREAM_TOKEN_SECONDS})
+
+
+@app.route("/api/fleet/stream")
+def api_fleet_stream():
+    """Flux SSE de la flotte de l'org : un événement `snapshot`, puis `update` / `expired`.
+
+    `fields=` (voir `/api/fleet`) s'applique au snapshot ; les `update` restent complets.
+
+    Authentification : clé API en en-tête `Authorization`, ou `?token=` obtenu par
+    `POST /api/fleet/stream/token` (navigateurs). La clé API n'est plus acceptée dans l'URL.
+    """
+    token = request.args.get("token", "").strip()
+    org_id = _org_for_stream_token(token) if token else None
+    if not org_id:
+        ok, org_id = _check_org_key()
+        if not ok or not org_id:
+            return jsonify({"error": "Unauthorized"}), 403
+
+    fields_key = request.args.get("fields", "")
+
+    def _snapshot_event() -> str:
+        encoded = _fleet_payload_json(_fleet_snapshot(org_id), fields_key)
+        return f"event: snapshot\ndata: {encoded.decode('utf-8')}\n\n"
+
+    def _events():
+        # subscribe before the snapshot so no change falls between the two
+        sub = _FLEET_STREAM.subscribe(org_id)
+        try:
+            _sync_fleet_state()
+            yield "retry: 5000\n"
+            yield _snapshot_event()
+            last_sent = time.monotonic()
+            while True:
+                if sub.resync.is_set():
+                    sub.resync.clear()
+                    while not sub.queue.empty():
+                        sub.queue.get_nowait()
+                    yield _snapshot_event()
+                    last_sent = time.monotonic()
+                try:
+                    message = sub.queue.get(timeout=FLEET_SYNC_SECONDS)
+                except queue.Empty:
+                    # reports received by other workers only reach this one through the DB
+                    _sync_fleet_state()
+                    if time.monotonic() - last_sent >= FLEET_STREAM_HEARTBEAT_SECONDS:
+                        last_sent = time.monotonic()
+                        yield ": ping\n\n"
+                    continue
+                last_sent = time.monotonic()
+                yield message
+        finally:
+            _FLEET_STREAM.unsubscribe(sub)
+
+    return Response(
+        stream_with_context(_events()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 @app.route("/api/fleet/reload", methods=["POST"])
@@ -862,10 +3561,192 @@ def api_fleet_reload():
 
     # reload global state from DB/JSON, but report back filtered count
     _load_fleet_state()
-    count = sum(1 for v in FLEET_STATE.values() if v.get("org_id") == org_id)
+    if HEALTH_RESCORE:
+        _rescore_fleet()
+    count = len(FLEET_BY_ORG.get(org_id, {}))
     return jsonify({"ok": True, "count": count})
 
 
+def _fleet_series_window() -> tuple[float, float]:
+    """Fenêtre [from, to] des requêtes de séries fleet (défaut : dernière heure)."""
+    end_ts = _parse_history_time(request.args.get("to")) or time.time()
+    start_ts = _parse_history_time(request.args.get("from"))
+    if start_ts is None:
+        start_ts = end_ts - 3600
+    return max(start_ts, end_ts - FLEET_METRICS_RETENTION_DAYS * 86400), end_ts
+
+
+def _fleet_metrics_sources(cur: sqlite3.Cursor, start_ts: float, end_ts: float) -> list[str]:
+    first = _fleet_metrics_partition(start_ts)
+    last = _fleet_metrics_partition(end_ts)
+    return [name for name in _fleet_metrics_tables(cur) if first <= name <= last]
+
+
+@app.route("/api/fleet/machine/<machine_id>/series")
+def api_fleet_machine_series(machine_id: str):
+    """Série temporelle d'une machine de l'org (`from`/`to` epoch ou ISO, `limit` ≤ 5000)."""
+    ok, org_id = _check_org_key()
+    if not ok or not org_id:
+        return jsonify({"error": "Unauthorized"}), 403
+
+    start_ts, end_ts = _fleet_series_window()
+    try:
+        limit = max(1, min(int(request.args.get("limit", "1000")), 5000))
+    except ValueError:
+        limit = 1000
+    try:
+        cur = _db().cursor()
+        sources = _fleet_metrics_sources(cur, start_ts, end_ts)
+        if not sources:
+            return jsonify({"id": machine_id, "count": 0, "data": []})
+        union = " UNION ALL ".join(
+            f"SELECT ts, cpu, ram, disk, score, status FROM {name} WHERE org_id = ? AND machine_id = ? AND ts >= ? AND ts <= ?"
+            for name in sources
+        )
+        params: list[object] = []
+        for _ in sources:
+            params.extend([org_id, machine_id, start_ts, end_ts])
+        cur.execute(f"SELECT * FROM ({union}) ORDER BY ts DESC LIMIT ?", params + [limit])
+        rows = cur.fetchall()[::-1]
+    except Exception:
+        return jsonify({"error": "db error"}), 500
+
+    data = [
+        {"ts": ts, "cpu_percent": cpu, "ram_percent": ram, "disk_percent": disk, "score": score, "status": status}
+        for ts, cpu, ram, disk, score, status in rows
+    ]
+    return jsonify({"id": machine_id, "count": len(data), "data": data})
+
+
+@app.route("/api/fleet/series")
+def api_fleet_series():
+    """Agrégat de l'org par tranche de temps (`step` secondes, ≥ 60) : moyenne/max et nombre de machines."""
+    ok, org_id = _check_org_key()
+    if not ok or not org_id:
+        return jsonify({"error": "Unauthorized"}), 403
+
+    start_ts, end_ts = _fleet_series_window()
+    try:
+        step = int(request.args.get("step", "0"))
+    except ValueError:
+        step = 0
+    if step <= 0:
+        step = int((end_ts - start_ts) // 500) or 60
+    step = max(60, step)
+    try:
+        cur = _db().cursor()
+        sources = _fleet_metrics_sources(cur, start_ts, end_ts)
+        if not sources:
+            return jsonify({"step": step, "count": 0, "data": []})
+        union = " UNION ALL ".join(
+            f"SELECT machine_id, ts, cpu, ram, disk, score FROM {name} WHERE org_id = ? AND ts >= ? AND ts <= ?"
+            for name in sources
+        )
+        params: list[object] = [step]
+        for _ in sources:
+            params.extend([org_id, start_ts, end_ts])
+        cur.execute(
+            "SELECT CAST(ts / ? AS INTEGER) AS b, COUNT(DISTINCT machine_id), "
+            "AVG(cpu), MAX(cpu), AVG(ram), MAX(ram), AVG(disk), MAX(disk), AVG(score), MIN(score) "
+            f"FROM ({union}) GROUP BY b ORDER BY b",
+            params,
+        )
+        rows = cur.fetchall()
+    except Exception:
+        return jsonify({"error": "db error"}), 500
+
+    def _r(value: float | None) -> float | None:
+        return round(value, 2) if value is not None else None
+
+    data = [
+        {
+            "ts": bucket * step,
+            "machines": machines,
+            "cpu_avg": _r(cpu_avg), "cpu_max": cpu_max,
+            "ram_avg": _r(ram_avg), "ram_max": ram_max,
+            "disk_avg": _r(disk_avg), "disk_max": disk_max,
+            "score_avg": _r(score_avg), "score_min": score_min,
+        }
+        for bucket, machines, cpu_avg, cpu_max, ram_avg, ram_max, disk_avg, disk_max, score_avg, score_min in rows
+    ]
+    return jsonify({"step": step, "count": len(data), "data": data})
+
+
+def _bump_alert_rules_generation(conn: sqlite3.Connection) -> None:
+    """Fait recharger les règles d'alerte par les autres workers (dans la transaction d'écriture)."""
+    conn.execute(
+        "INSERT INTO fleet_meta (key, value) VALUES ('alert_rules_generation', 1) "
+        "ON CONFLICT(key) DO UPDATE SET value = value + 1"
+    )
+
+
+@app.route("/api/fleet/alerts/rules", methods=["GET"])
+def api_fleet_alert_rules():
+    """Règles d'alerte de l'org."""
+    ok, org_id = _check_org_key()
+    if not ok or not org_id:
+        return jsonify({"error": "Unauthorized"}), 403
+    rules = _FLEET_ALERTS.rules(org_id)
+    return jsonify({"count": len(rules), "data": rules})
+
+
+@app.route("/api/fleet/alerts/rules", methods=["POST"])
+def api_fleet_alert_rule_create():
+    """Ajoute une règle d'alerte à l'org (voir `_parse_alert_rule`)."""
+    ok, org_id = _check_org_key()
+    if not ok or not org_id:
+        return jsonify({"error": "Unauthorized"}), 403
+
+    rule = _parse_alert_rule(request.get_json(silent=True))
+    if isinstance(rule, str):
+        return jsonify({"error": rule}), 400
+    rule_id = f"rule_{secrets.token_hex(6)}"
+    try:
+        with _db() as conn:
+            conn.execute(
+                'INSERT INTO fleet_alert_rules (id, org_id, rule, created_at) VALUES (?, ?, ?, ?)',
+                (rule_id, org_id, json.dumps(rule, ensure_ascii=False), time.time()),
+            )
+            _bump_alert_rules_generation(conn)
+    except Exception:
+        return jsonify({"error": "db error"}), 500
+
+    _FLEET_ALERTS.reload()
+    return jsonify({"ok": True, **rule, "id": rule_id})
+
+
+@app.route("/api/fleet/alerts/rules/<rule_id>", methods=["DELETE"])
+def api_fleet_alert_rule_delete(rule_id: str):
+    ok, org_id = _check_org_key()
+    if not ok or not org_id:
+        return jsonify({"error": "Unauthorized"}), 403
+    try:
+        with _db() as conn:
+            deleted = conn.execute(
+                'DELETE FROM fleet_alert_rules WHERE id = ? AND org_id = ?', (rule_id, org_id)
+            ).rowcount
+            if deleted:
+                _bump_alert_rules_generation(conn)
+    except Exception:
+        return jsonify({"error": "db error"}), 500
+    if not deleted:
+        return jsonify({"ok": False, "message": "règle inconnue"}), 404
+
+    _FLEET_ALERTS.reload()
+    return jsonify({"ok": True})
+
+
+@app.route("/api/fleet/alerts")
+def api_fleet_alerts():
+    """Alertes actuellement déclenchées dans l'org (état tenu en mémoire par ce worker)."""
+    ok, org_id = _check_org_key()
+    if not ok or not org_id:
+        return jsonify({"error": "Unauthorized"}), 403
+    _sync_fleet_state()
+    alerts = _FLEET_ALERTS.firing(org_id)
+    return jsonify({"count": len(alerts), "data": alerts})
+
+
 @app.route("/api/history")
 def api_history():
     limit = request.args.get("limit", default="200")
@@ -874,8 +3755,36 @@ def api_history():
     except ValueError:
         limit_int = 200
 
+    start = request.args.get("from")
+    end = request.args.get("to")
+    resolution = request.args.get("resolution")
+    if (start or end or resolution) and HISTORY_DB_PATH.exists():
+        # time-series store: from/to (epoch or ISO), resolution raw|1m|1h|1d|auto
+        limit_int = max(1, min(limit_int, HISTORY_MAX_POINTS))
+        end_ts = _parse_history_time(end) or time.time()
+        start_ts = _parse_history_time(start)
+        if start_ts is None:
+            start_ts = end_ts - 3600
+        try:
+            used, history = load_history_series(start_ts, end_ts, resolution or "auto", max_points=limit_int)
+        except Exception:
+            return jsonify({"error": "db error"}), 500
+        return jsonify({"count": len(history), "resolution": used, "data": history})
+
     limit_int = max(1, min(limit_int, 500))
-    history = load_history(DEFAULT_HISTORY_CSV, limit=limit_int)
+    if start or end:
+        # the CSV compares ISO strings: epoch values (history page) are converted first
+        start_ts, end_ts = _parse_history_time(start), _parse_history_time(end)
+        if (start and start_ts is None) or (end and end_ts is None):
+            return jsonify({"count": 0, "data": []})
+        history = load_history_range(
+            DEFAULT_HISTORY_CSV,
+            dt.datetime.fromtimestamp(start_ts).isoformat() if start_ts is not None else None,
+            dt.datetime.fromtimestamp(end_ts).isoformat() if end_ts is not None else None,
+            limit=limit_int,
+        )
+    else:
+        history = load_history(DEFAULT_HISTORY_CSV, limit=limit_int)
     return jsonify({"count": len(history), "data": history})
 
 
@@ -896,8 +3805,12 @@ def run_cli(interval: float, export_csv_path: Path | None, export_json_path: Pat
         print("\nArrêté.")
 
 
-def start_background_export(interval: float, export_csv_path: Path | None, export_json_path: Path | None) -> None:
-    """Démarre un export en tâche de fond pendant que Flask tourne."""
+def start_background_export(interval: float, export_csv_path: Path | None, export_json_path: Path | None,
+                            record_history: bool = True) -> None:
+    """Démarre un export en tâche de fond pendant que Flask tourne.
+
+    Chaque échantillon alimente aussi la base de séries temporelles (`HISTORY_DB_PATH`).
+    """
 
     def _loop() -> None:
         while True:
@@ -906,9 +3819,11 @@ def start_background_export(interval: float, export_csv_path: Path | None, expor
                 export_to_csv(export_csv_path, [stats])
             if export_json_path:
                 export_to_jsonl(export_json_path, [stats])
+            if record_history:
+                record_history_sample(stats)
             time.sleep(interval)
 
-    if not export_csv_path and not export_json_path:
+    if not export_csv_path and not export_json_path and not record_history:
         return
 
     thread = threading.Thread(target=_loop, daemon=True)
@@ -928,15 +3843,14 @@ def parse_args() -> argparse.Namespace:
 
 def main() -> None:
     args = parse_args()
-    # Ensure DB schema and migrate JSON backup -> SQLite if needed before running
-    _ensure_db_schema()
-    _create_default_org_from_env()
-    _load_fleet_state()
     # Si lancé par double-clic sans arguments, on bascule en mode web par défaut.
     if len(sys.argv) == 1:
         args.web = True
 
     if args.web:
+        # fleet (base, reaper, écriture différée, backup, alertes) : mode web uniquement ;
+        # sous gunicorn, le hook before_request s'en charge
+        _start_fleet_services()
         # Si on fournit un export, on lance l’export en tâche de fond en même temps que Flask.
         if args.export_csv or args.export_jsonl:
             start_background_export(args.interval, args.export_csv, args.export_jsonl)
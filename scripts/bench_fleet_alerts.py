@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""Benchmark du moteur d'alertes fleet : coût ajouté par rapport reçu.
+
+Usage:
+  python scripts/bench_fleet_alerts.py [--machines 10000] [--rules 5] [--reports 200000]
+
+Une org de `--machines` machines et `--rules` règles (seuils CPU/RAM/disque, statut de
+santé, avec et sans durée) ; on mesure `_FLEET_ALERTS.evaluate` seul sur des rapports
+tirés au hasard (environ 10 % au-dessus des seuils), puis une org sans règle. Tout se
+passe dans un dossier temporaire ; aucun webhook n'est envoyé.
+"""
+import argparse
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+import main  # noqa: E402
+
+ORG_ID = "org_bench"
+RULES = [
+    {"metric": "cpu_percent", "op": ">", "value": 90, "for_seconds": 300},
+    {"metric": "ram_percent", "op": ">=", "value": 95},
+    {"metric": "disk_percent", "op": ">", "value": 90, "for_seconds": 600},
+    {"metric": "health.status", "op": "==", "value": "critical"},
+    {"metric": "health.score", "op": "<", "value": 40, "for_seconds": 120},
+]
+
+
+def _report(rng: random.Random) -> dict:
+    cpu = rng.uniform(0, 100)
+    score = rng.randint(20, 100)
+    return {
+        "cpu_percent": cpu,
+        "ram_percent": rng.uniform(20, 100),
+        "disk_percent": rng.uniform(40, 100),
+        "health": {"score": score, "status": "critical" if score < 60 else "ok"},
+    }
+
+
+def _prepare(workdir: Path, rules: int) -> None:
+    main.FLEET_DB_PATH = workdir / "fleet.db"
+    main.WEBHOOK_URL = None
+    main._ensure_db_schema()
+    conn = main._db()
+    for i in range(rules):
+        rule = main._parse_alert_rule(RULES[i % len(RULES)])
+        conn.execute('INSERT INTO fleet_alert_rules (id, org_id, rule, created_at) VALUES (?, ?, ?, ?)',
+                     (f"rule_{i}", ORG_ID, main.json.dumps(rule), time.time()))
+    conn.commit()
+    main._FLEET_ALERTS.reload()
+
+
+def _run(org_id: str, machines: int, reports: int) -> float:
+    rng = random.Random(42)
+    entries = [
+        (f"{org_id}:bench-{i % machines}",
+         {"id": f"bench-{i % machines}", "org_id": org_id, "ts": 1_700_000_000 + i, "report": _report(rng)})
+        for i in range(reports)
+    ]
+    evaluate = main._FLEET_ALERTS.evaluate
+    start = time.perf_counter()
+    for store_key, entry in entries:
+        evaluate(store_key, entry)
+    return (time.perf_counter() - start) / reports * 1e6
+
+
+def main_bench() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--machines", type=int, default=10000)
+    parser.add_argument("--rules", type=int, default=5)
+    parser.add_argument("--reports", type=int, default=200000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        _prepare(Path(tmp), args.rules)
+        with_rules = _run(ORG_ID, args.machines, args.reports)
+        without_rules = _run("org_sans_regle", args.machines, args.reports)
+        metrics = main._FLEET_ALERTS.metrics()
+    print(f"{args.machines} machines, {args.rules} règles, {args.reports} rapports")
+    print(f"  avec règles  {with_rules:7.2f} µs/rapport  (déclenchées {metrics['fired']}, résolues {metrics['resolved']},"
+          f" machines suivies {metrics['tracked']})")
+    print(f"  sans règle   {without_rules:7.2f} µs/rapport")
+
+
+if __name__ == "__main__":
+    main_bench()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""Benchmark de `/api/fleet` : octets envoyés et temps de sérialisation pour une grosse org.
+
+Usage:
+  python scripts/bench_fleet_listing.py [--machines 5000] [--repeat 20] [--no-orjson]
+
+Compare l'ancienne réponse (`jsonify` de toute la flotte, non compressée) avec la
+réponse actuelle complète puis projetée (`fields=`), avec et sans gzip. Tout se passe
+en mémoire dans un dossier temporaire ; `orjson` / `brotli` sont utilisés s'ils sont installés.
+"""
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+import main  # noqa: E402
+from flask import jsonify  # noqa: E402
+
+API_KEY = "bench-key"
+ORG_ID = "org_bench"
+DASHBOARD_FIELDS = "id,ts,client,health,uptime_hms,cpu_percent,ram_percent,disk_percent"
+
+
+def _report(i: int) -> dict:
+    return {
+        "timestamp": "2024-01-01T12:00:00",
+        "cpu_percent": float(i % 100),
+        "ram_percent": 42.5,
+        "ram_used_gib": 6.8,
+        "ram_total_gib": 16.0,
+        "disk_percent": 61.2,
+        "disk_used_gib": 290.4,
+        "disk_total_gib": 476.9,
+        "uptime_seconds": 86400 + i,
+        "uptime_hms": "24:00:00",
+        "health": {"score": 80, "status": "ok", "components": {"cpu": 90, "ram": 75, "disk": 70}},
+    }
+
+
+def _prepare(workdir: Path, machines: int) -> None:
+    main.FLEET_DB_PATH = workdir / "fleet.db"
+    main.FLEET_STATE_PATH = workdir / "fleet_state.json"
+    main._FLEET_SERVICES_STARTED = True
+    main._ensure_db_schema()
+    conn = main._db()
+    conn.execute('INSERT OR IGNORE INTO organizations (id, name) VALUES (?, ?)', (ORG_ID, 'bench'))
+    conn.execute('INSERT OR IGNORE INTO api_keys (key, org_id, created_at, revoked) VALUES (?, ?, ?, 0)',
+                 (API_KEY, ORG_ID, time.time()))
+    conn.commit()
+    now_ts = time.time()
+    entries = {
+        f"{ORG_ID}:bench-{i}": {
+            "id": f"bench-{i}", "report": _report(i), "ts": now_ts, "client": "10.0.0.1", "org_id": ORG_ID,
+        }
+        for i in range(machines)
+    }
+    # reports arrive already encoded, as after /api/fleet/report or a reload from the DB
+    main._fleet_reset(entries, {key: main._json_bytes(e["report"]).decode("utf-8") for key, e in entries.items()})
+
+
+def _time(fn, repeat: int) -> tuple[float, int]:
+    size = 0
+    start = time.perf_counter()
+    for _ in range(repeat):
+        size = fn()
+    return (time.perf_counter() - start) / repeat * 1000, size
+
+
+def main_bench() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--machines", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--no-orjson", action="store_true", help="mesurer l'encodeur json standard")
+    args = parser.parse_args()
+    if args.no_orjson:
+        main.orjson = None
+
+    with tempfile.TemporaryDirectory() as tmp:
+        _prepare(Path(tmp), args.machines)
+        client = main.app.test_client()
+        auth = {"Authorization": f"Bearer {API_KEY}"}
+
+        def legacy() -> int:
+            with main.app.test_request_context():
+                return len(jsonify(main._fleet_snapshot(ORG_ID)).get_data())
+
+        def current(query: str, encoding: str) -> int:
+            headers = dict(auth, **({"Accept-Encoding": encoding} if encoding else {}))
+            return len(client.get(f"/api/fleet{query}", headers=headers).get_data())
+
+        print(f"{args.machines} machines, orjson={'oui' if main.orjson else 'non'}, "
+              f"brotli={'oui' if main.brotli else 'non'}")
+        base_ms, base_bytes = _time(legacy, args.repeat)
+        print(f"  {'jsonify (ancien)':<28} {base_ms:8.1f} ms {base_bytes:>10} octets")
+        cases = [
+            ("complet", "", ""),
+            ("complet + gzip", "", "gzip"),
+            ("fields", f"?fields={DASHBOARD_FIELDS}", ""),
+            ("fields + gzip", f"?fields={DASHBOARD_FIELDS}", "gzip"),
+        ]
+        if main.brotli:
+            cases.append(("fields + br", f"?fields={DASHBOARD_FIELDS}", "br"))
+        for label, query, encoding in cases:
+            ms, size = _time(lambda: current(query, encoding), args.repeat)
+            print(f"  {label:<28} {ms:8.1f} ms {size:>10} octets  (x{base_bytes / max(size, 1):.1f} octets)")
+
+
+if __name__ == "__main__":
+    main_bench()
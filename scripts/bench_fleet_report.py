@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""Benchmark de `/api/fleet/report` : rapports/seconde selon la taille de la flotte.
+
+Usage:
+  python scripts/bench_fleet_report.py [--sizes 100 1000 10000] [--reports 500]
+
+Le benchmark travaille dans un dossier temporaire (la base `data/fleet.db` du dépôt
+n'est pas touchée). Pour chaque taille de flotte, la base est pré-remplie puis on
+mesure le débit du chemin actuel (file d'écriture différée, vidée avant la fin de
+la mesure) et celui de l'ancien chemin (réécriture complète via `_save_fleet_state`).
+"""
+import argparse
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+import main  # noqa: E402
+
+API_KEY = "bench-key"
+ORG_ID = "org_bench"
+
+
+def _prepare(workdir: Path, size: int) -> None:
+    main.FLEET_DB_PATH = workdir / f"fleet_{size}.db"
+    main.FLEET_STATE_PATH = workdir / f"fleet_state_{size}.json"
+    main._ensure_db_schema()
+    conn = sqlite3.connect(str(main.FLEET_DB_PATH))
+    conn.execute('INSERT OR IGNORE INTO organizations (id, name) VALUES (?, ?)', (ORG_ID, 'bench'))
+    conn.execute('INSERT OR IGNORE INTO api_keys (key, org_id, created_at, revoked) VALUES (?, ?, ?, 0)',
+                 (API_KEY, ORG_ID, time.time()))
+    conn.commit()
+    conn.close()
+
+    now_ts = time.time()
+    entries = {}
+    for i in range(size):
+        mid = f"bench-{i}"
+        entries[f"{ORG_ID}:{mid}"] = {
+            "id": mid,
+            "report": {"cpu_percent": 1.0, "ram_percent": 2.0, "disk_percent": 3.0},
+            "ts": now_ts,
+            "client": "127.0.0.1",
+            "org_id": ORG_ID,
+        }
+    main._fleet_reset(entries)
+    main._save_fleet_state()
+
+
+def _run(client, size: int, reports: int) -> float:
+    headers = {"Authorization": f"Bearer {API_KEY}"}
+    start = time.perf_counter()
+    for i in range(reports):
+        payload = {
+            "machine_id": f"bench-{i % size}",
+            "report": {"cpu_percent": float(i % 100), "ram_percent": 2.0, "disk_percent": 3.0},
+        }
+        resp = client.post("/api/fleet/report", json=payload, headers=headers)
+        assert resp.status_code == 200, resp.status_code
+    # include the write-behind drain so the figure reflects durable writes
+    main._FLEET_WRITER.flush()
+    return reports / (time.perf_counter() - start)
+
+
+def _run_legacy(size: int, reports: int) -> float:
+    start = time.perf_counter()
+    for i in range(reports):
+        entry = main.FLEET_STATE[f"{ORG_ID}:bench-{i % size}"]
+        entry["ts"] = time.time()
+        main._save_fleet_state()
+    return reports / (time.perf_counter() - start)
+
+
+def main_bench() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark /api/fleet/report")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--reports", type=int, default=500, help="Rapports envoyés par taille de flotte")
+    parser.add_argument("--no-legacy", action="store_true", help="Ne pas mesurer la réécriture complète")
+    args = parser.parse_args()
+
+    # services démarrés à la main : on évite que le hook Flask recharge la base du dépôt
+    main._FLEET_SERVICES_STARTED = True
+    main._FLEET_WRITER.start()
+    client = main.app.test_client()
+
+    print(f"{'machines':>10} {'reports/s':>12} {'legacy/s':>12}")
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = Path(tmp)
+        for size in args.sizes:
+            _prepare(workdir, size)
+            rate = _run(client, size, args.reports)
+            legacy = "-" if args.no_legacy else f"{_run_legacy(size, max(1, args.reports // 10)):.1f}"
+            print(f"{size:>10} {rate:>12.1f} {legacy:>12}")
+
+
+if __name__ == "__main__":
+    main_bench()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""Benchmark du score de santé : boucle `_health_score` par machine contre la passe colonne.
+
+Usage:
+  python scripts/bench_health_scores.py [--machines 100000] [--repeat 3]
+
+`--machines` rapports aléatoires (valeurs entières, au dixième, aux seuils, hors bornes) ;
+on mesure la boucle scalaire sur des dicts puis `_health_scores` sur les colonnes CPU/RAM/disque
+(numpy s'il est installé), plus les percentiles p50/p90/p99, et on vérifie que les deux
+calculs donnent exactement les mêmes scores, statuts et composants.
+"""
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+import main  # noqa: E402
+
+
+def _value(rng: random.Random) -> float:
+    kind = rng.random()
+    if kind < 0.5:
+        return rng.uniform(0, 100)
+    if kind < 0.8:
+        return round(rng.uniform(0, 100), 1)
+    if kind < 0.95:
+        return float(rng.choice([0, 50, 60, 70, 100]))
+    return rng.uniform(-5, 105)
+
+
+def _best(func, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main_bench() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--machines", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    reports = [
+        {"cpu_percent": _value(rng), "ram_percent": _value(rng), "disk_percent": _value(rng)}
+        for _ in range(args.machines)
+    ]
+    cpu = [report["cpu_percent"] for report in reports]
+    ram = [report["ram_percent"] for report in reports]
+    disk = [report["disk_percent"] for report in reports]
+
+    scalar = [main._health_score(report) for report in reports]
+    columns = main._health_scores(cpu, ram, disk)
+    mismatches = sum(
+        1 for i, expected in enumerate(scalar)
+        if expected != {
+            "score": int(columns["score"][i]),
+            "status": str(columns["status"][i]),
+            "components": {name: int(values[i]) for name, values in columns["components"].items()},
+        }
+    )
+
+    loop_ms = _best(lambda: [main._health_score(report) for report in reports], args.repeat)
+    column_ms = _best(lambda: main._health_scores(cpu, ram, disk), args.repeat)
+    percentile_ms = _best(lambda: main._percentiles(main._health_scores(cpu, ram, disk)["score"]), args.repeat)
+
+    engine = f"numpy {main.np.__version__}" if main.np is not None else "sans numpy (boucle Python)"
+    print(f"{args.machines} machines, {engine}")
+    print(f"  boucle _health_score   {loop_ms:9.1f} ms")
+    print(f"  _health_scores         {column_ms:9.1f} ms  (x{loop_ms / column_ms:.1f})")
+    print(f"  + percentiles du score {percentile_ms:9.1f} ms  {main._percentiles(columns['score'])}")
+    print(f"  écarts avec le calcul scalaire : {mismatches}")
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main_bench()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""Benchmark de la lecture de l'historique CSV (`load_history` / `load_history_range`).
+
+Usage:
+  python scripts/bench_history.py [--rows 10000000] [--csv /tmp/metrics_bench.csv] [--legacy]
+
+Génère (si absent) un CSV au format de `export_to_csv` avec `--rows` lignes, puis mesure :
+- la lecture des N dernières lignes (lecture depuis la fin du fichier),
+- une requête par plage de temps au milieu du fichier (index d'offsets `<csv>.idx`),
+- avec `--legacy`, la lecture complète par `csv.DictReader` (ancienne implémentation).
+"""
+import argparse
+import csv
+import datetime as dt
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+import main  # noqa: E402
+
+HEADER = (
+    "timestamp,cpu_percent,ram_percent,ram_used_gib,ram_total_gib,disk_percent,"
+    "disk_used_gib,disk_total_gib,uptime_seconds,uptime_hms,cpu_alert,ram_alert\n"
+)
+
+
+def _generate(path: Path, rows: int) -> None:
+    start = dt.datetime(2024, 1, 1)
+    print(f"Génération de {rows} lignes dans {path} ...")
+    with path.open("w", encoding="utf-8", newline="") as fh:
+        fh.write(HEADER)
+        chunk = []
+        for i in range(rows):
+            ts = (start + dt.timedelta(seconds=2 * i)).isoformat(timespec="microseconds")
+            chunk.append(f"{ts},{i % 100}.0,50.5,7.76,15.37,89.8,415.81,463.25,{2.0 * i},00:00:00,False,False\n")
+            if len(chunk) >= 100_000:
+                fh.writelines(chunk)
+                chunk = []
+        fh.writelines(chunk)
+
+
+def _legacy(path: Path, limit: int) -> list:
+    records = []
+    with path.open("r", encoding="utf-8") as fh:
+        for row in csv.DictReader(fh):
+            try:
+                records.append({
+                    "timestamp": row["timestamp"],
+                    "cpu_percent": float(row["cpu_percent"]),
+                    "ram_percent": float(row["ram_percent"]),
+                    "disk_percent": float(row["disk_percent"]),
+                    "uptime_hms": row.get("uptime_hms", ""),
+                })
+            except (KeyError, ValueError):
+                continue
+    return records[-limit:]
+
+
+def _timed(label: str, func, repeat: int = 5) -> list:
+    best = float("inf")
+    result = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    print(f"{label:<40} {best * 1000:>10.2f} ms  ({len(result)} lignes)")
+    return result
+
+
+def main_bench() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark load_history")
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--csv", type=Path, default=Path(tempfile.gettempdir()) / "metrics_bench.csv")
+    parser.add_argument("--legacy", action="store_true", help="Mesurer aussi la lecture complète (lent)")
+    args = parser.parse_args()
+
+    if not args.csv.exists():
+        _generate(args.csv, args.rows)
+    size_mib = args.csv.stat().st_size / (1024 ** 2)
+    print(f"CSV : {args.csv} ({size_mib:.0f} Mio)")
+
+    for limit in (200, 500):
+        _timed(f"load_history(limit={limit})", lambda: main.load_history(args.csv, limit))
+
+    start = time.perf_counter()
+    with args.csv.open("rb") as fh:
+        index = main._update_history_index(args.csv, fh)
+    print(f"{'construction/mise à jour index':<40} {(time.perf_counter() - start) * 1000:>10.2f} ms  ({len(index)} entrées)")
+    middle = index[len(index) // 2][0] if index else None
+    _timed("load_history_range(milieu, 500)", lambda: main.load_history_range(args.csv, middle, None, 500))
+
+    if args.legacy:
+        _timed("legacy DictReader(limit=200)", lambda: _legacy(args.csv, 200), repeat=1)
+
+
+if __name__ == "__main__":
+    main_bench()
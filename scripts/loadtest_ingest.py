@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""Test de charge de l'ingestion fleet : rapports/seconde et latence p50/p99.
+
+Usage:
+  python scripts/loadtest_ingest.py --url http://127.0.0.1:8001 --token <api_key> [--connections 500] [--duration 10]
+  python scripts/loadtest_ingest.py --compare [--connections 500] [--duration 10]
+
+Chaque connexion simule un agent : elle POSTe des rapports sur `/api/fleet/report` en
+boucle, en keep-alive si le serveur l'accepte (sinon elle se reconnecte à chaque fois).
+`--compare` lance dans un dossier temporaire le serveur Flask (`app.run`, threads) puis
+`async_ingest.py`, et mesure les deux avec la même charge. Le client est un seul process
+asyncio : au-delà de quelques dizaines de milliers de rapports/s, c'est lui qui sature.
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.parse
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+TOKEN = "loadtest-token"
+
+
+def _report(i: int) -> dict:
+    return {
+        "cpu_percent": float(i % 100), "ram_percent": 42.5, "disk_percent": 61.2,
+        "uptime_hms": "24:00:00", "health": {"score": 80, "status": "ok"},
+    }
+
+
+async def _read_response(reader: asyncio.StreamReader) -> tuple[int, bool]:
+    head = await reader.readuntil(b"\r\n\r\n")
+    lines = head.decode("latin-1").split("\r\n")
+    status = int(lines[0].split(" ", 2)[1])
+    headers = {}
+    for line in lines[1:]:
+        name, _, value = line.partition(":")
+        headers[name.strip().lower()] = value.strip().lower()
+    length = int(headers.get("content-length", "0"))
+    if length:
+        await reader.readexactly(length)
+    keep_alive = headers.get("connection") != "close" and lines[0].startswith("HTTP/1.1")
+    return status, keep_alive
+
+
+async def _agent(host: str, port: int, token: str, index: int, deadline: float,
+                 latencies: list[float], errors: list[int]) -> None:
+    reader = writer = None
+    seq = 0
+    while time.perf_counter() < deadline:
+        body = json.dumps({"machine_id": f"load-{index}", "report": _report(seq)}).encode()
+        request = (
+            f"POST /api/fleet/report HTTP/1.1\r\nHost: {host}\r\n"
+            f"Authorization: Bearer {token}\r\nContent-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\nConnection: keep-alive\r\n\r\n"
+        ).encode() + body
+        start = time.perf_counter()
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection(host, port)
+            writer.write(request)
+            await writer.drain()
+            status, keep_alive = await _read_response(reader)
+        except (OSError, asyncio.IncompleteReadError, ValueError):
+            errors.append(0)
+            if writer is not None:
+                writer.close()
+            reader = writer = None
+            await asyncio.sleep(0.05)
+            continue
+        latencies.append(time.perf_counter() - start)
+        if status != 200:
+            errors.append(status)
+        if not keep_alive:
+            writer.close()
+            reader = writer = None
+        seq += 1
+    if writer is not None:
+        writer.close()
+
+
+async def _load(url: str, token: str, connections: int, duration: float) -> dict:
+    parsed = urllib.parse.urlparse(url)
+    host, port = parsed.hostname or "127.0.0.1", parsed.port or 80
+    latencies: list[float] = []
+    errors: list[int] = []
+    start = time.perf_counter()
+    deadline = start + duration
+    await asyncio.gather(*(
+        _agent(host, port, token, i, deadline, latencies, errors) for i in range(connections)
+    ))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+
+    def pct(p: float) -> float:
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000 if latencies else 0.0
+
+    return {
+        "reports": len(latencies),
+        "reports_per_s": len(latencies) / elapsed,
+        "p50_ms": pct(0.50),
+        "p99_ms": pct(0.99),
+        "errors": len(errors),
+    }
+
+
+def _print(label: str, result: dict) -> None:
+    print(f"  {label:<10} {result['reports_per_s']:9.0f} rapports/s  p50 {result['p50_ms']:7.1f} ms"
+          f"  p99 {result['p99_ms']:7.1f} ms  erreurs {result['errors']}")
+
+
+def _spawn(kind: str, port: int, workdir: Path) -> subprocess.Popen:
+    env = dict(os.environ, FLEET_TOKEN=TOKEN, PYTHONPATH=str(ROOT))
+    if kind == "flask":
+        code = ("import main; main._start_fleet_services(); "
+                f"main.app.run(host='127.0.0.1', port={port}, threaded=True)")
+        cmd = [sys.executable, "-c", code]
+    else:
+        cmd = [sys.executable, str(ROOT / "async_ingest.py"), "--port", str(port)]
+    return subprocess.Popen(cmd, cwd=workdir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def _wait_port(port: int, timeout: float = 10.0) -> None:
+    import socket
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise SystemExit(f"le serveur n'écoute pas sur le port {port}")
+
+
+def main_loadtest() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="serveur déjà lancé (ex. http://127.0.0.1:8001)")
+    parser.add_argument("--token", default=os.environ.get("FLEET_TOKEN", TOKEN), help="clé API d'org")
+    parser.add_argument("--compare", action="store_true", help="lancer et comparer Flask et async_ingest.py")
+    parser.add_argument("--connections", type=int, default=500)
+    parser.add_argument("--duration", type=float, default=10.0)
+    args = parser.parse_args()
+
+    print(f"{args.connections} connexions, {args.duration:.0f}s")
+    if args.url:
+        _print("cible", asyncio.run(_load(args.url, args.token, args.connections, args.duration)))
+        return
+    if not args.compare:
+        parser.error("--url ou --compare requis")
+    for kind, port in (("flask", 5091), ("async", 5092)):
+        with tempfile.TemporaryDirectory() as tmp:
+            proc = _spawn(kind, port, Path(tmp))
+            try:
+                _wait_port(port)
+                result = asyncio.run(_load(f"http://127.0.0.1:{port}", TOKEN, args.connections, args.duration))
+            finally:
+                proc.terminate()
+                proc.wait(timeout=10)
+            _print(kind, result)
+
+
+if __name__ == "__main__":
+    main_loadtest()
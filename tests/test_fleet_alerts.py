@@ -0,0 +1,45 @@
+import os
+import json
+import urllib.request
+import pytest
+
+SERVER = os.environ.get("TEST_SERVER", "http://localhost:5000")
+ACTION_TOKEN = os.environ.get("ACTION_TOKEN")
+
+
+def _req(url: str, data: bytes | None, headers: dict, method: str = "POST"):
+    req = urllib.request.Request(url, data=data, headers=headers, method=method)
+    with urllib.request.urlopen(req, timeout=5) as resp:
+        return resp.getcode(), json.loads(resp.read().decode('utf-8'))
+
+
+@pytest.mark.skipif(not ACTION_TOKEN, reason="ACTION_TOKEN not set")
+def test_fleet_alert_rule_fires_and_resolves():
+    # Create an organization to get an api_key
+    create_url = SERVER.rstrip('/') + '/api/orgs'
+    headers = {'Content-Type': 'application/json', 'Authorization': f'Bearer {ACTION_TOKEN}'}
+    code, body = _req(create_url, json.dumps({'name': 'test-alerts'}).encode('utf-8'), headers)
+    assert code == 200
+    api_key = body.get('api_key')
+    assert api_key
+
+    hdr = {'Content-Type': 'application/json', 'Authorization': f'Bearer {api_key}'}
+    rule = {'name': 'cpu haut', 'metric': 'cpu_percent', 'op': '>', 'value': 80}
+    code, body = _req(SERVER.rstrip('/') + '/api/fleet/alerts/rules', json.dumps(rule).encode('utf-8'), hdr)
+    assert code == 200
+    rule_id = body['id']
+
+    report_url = SERVER.rstrip('/') + '/api/fleet/report'
+    alerts_url = SERVER.rstrip('/') + '/api/fleet/alerts'
+    _req(report_url, json.dumps({'machine_id': 'alert-1', 'report': {'cpu_percent': 95.0}}).encode('utf-8'), hdr)
+    _req(report_url, json.dumps({'machine_id': 'alert-2', 'report': {'cpu_percent': 10.0}}).encode('utf-8'), hdr)
+    code, body = _req(alerts_url, None, hdr, method='GET')
+    assert code == 200
+    assert [(a['id'], a['rule_id']) for a in body['data']] == [('alert-1', rule_id)]
+
+    _req(report_url, json.dumps({'machine_id': 'alert-1', 'report': {'cpu_percent': 20.0}}).encode('utf-8'), hdr)
+    code, body = _req(alerts_url, None, hdr, method='GET')
+    assert body['count'] == 0
+
+    code, body = _req(SERVER.rstrip('/') + f'/api/fleet/alerts/rules/{rule_id}', None, hdr, method='DELETE')
+    assert code == 200 and body['ok']
@@ -0,0 +1,49 @@
+import os
+import json
+import urllib.request
+import pytest
+
+SERVER = os.environ.get("TEST_SERVER", "http://localhost:5000")
+ACTION_TOKEN = os.environ.get("ACTION_TOKEN")
+
+
+def _req(url: str, data: bytes | None, headers: dict, method: str = "POST"):
+    req = urllib.request.Request(url, data=data, headers=headers, method=method)
+    with urllib.request.urlopen(req, timeout=5) as resp:
+        return resp.getcode(), resp.read()
+
+
+@pytest.mark.skipif(not ACTION_TOKEN, reason="ACTION_TOKEN not set")
+def test_fleet_report_batch_ndjson():
+    # Create an organization to get an api_key
+    create_url = SERVER.rstrip('/') + '/api/orgs'
+    headers = {'Content-Type': 'application/json', 'Authorization': f'Bearer {ACTION_TOKEN}'}
+    code, raw = _req(create_url, json.dumps({'name': 'test-batch'}).encode('utf-8'), headers)
+    assert code == 200
+    api_key = json.loads(raw.decode('utf-8')).get('api_key')
+    assert api_key
+
+    # cursor before the batch: the delta must contain exactly the accepted machines
+    hdr = {'Authorization': f'Bearer {api_key}'}
+    code, raw = _req(SERVER.rstrip('/') + '/api/fleet', None, hdr, method='GET')
+    since = json.loads(raw.decode('utf-8'))['seq']
+
+    lines = [
+        json.dumps({'machine_id': 'batch-0', 'report': {'cpu_percent': 1.0}}),
+        'not json',
+        json.dumps({'machine_id': 'batch-1', 'report': {'cpu_percent': 2.0}}),
+        json.dumps({'report': {'cpu_percent': 3.0}}),
+    ]
+    url = SERVER.rstrip('/') + '/api/fleet/report/batch'
+    hdr_batch = {'Content-Type': 'application/x-ndjson', 'Authorization': f'Bearer {api_key}'}
+    code, raw = _req(url, '\n'.join(lines).encode('utf-8'), hdr_batch)
+    assert code == 200
+    body = json.loads(raw.decode('utf-8'))
+    assert body['accepted'] == 2
+    assert [r['status'] for r in body['results']] == [200, 400, 200, 400]
+
+    # the batch is committed before the response: visible at once through the DB delta
+    code, raw = _req(SERVER.rstrip('/') + f'/api/fleet?since={since}', None, hdr, method='GET')
+    assert code == 200
+    ids = sorted(d.get('id') for d in json.loads(raw.decode('utf-8')).get('data', []))
+    assert ids == ['batch-0', 'batch-1']
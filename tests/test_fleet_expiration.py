@@ -16,6 +16,7 @@ import pytest
 SERVER = os.environ.get("TEST_SERVER", "http://localhost:5000")
 TOKEN = os.environ.get("FLEET_TOKEN")
 MACHINE_ID = "test-expire-001"
+BACKUP_WAIT = float(os.environ.get("FLEET_JSON_BACKUP_SECONDS", "5")) + 2
 
 
 def _req(url: str, data: bytes | None, headers: dict, method: str = "POST"):
@@ -49,14 +50,20 @@ def test_fleet_expiration_flow():
     code, _ = _req(post_url, json.dumps(payload).encode('utf-8'), headers, method='POST')
     assert code == 200
 
-    # Wait briefly for server to persist
-    time.sleep(0.5)
-
+    # Wait for the periodic JSON backup to include the machine
     state_path = os.path.join('logs', 'fleet_state.json')
-    assert os.path.exists(state_path), "fleet_state.json not found"
+    data = {}
+    deadline = time.time() + BACKUP_WAIT
+    while time.time() < deadline:
+        time.sleep(0.5)
+        if not os.path.exists(state_path):
+            continue
+        with open(state_path, 'r', encoding='utf-8') as fh:
+            data = json.load(fh)
+        if MACHINE_ID in data:
+            break
 
-    with open(state_path, 'r', encoding='utf-8') as fh:
-        data = json.load(fh)
+    assert os.path.exists(state_path), "fleet_state.json not found"
 
     assert MACHINE_ID in data, "machine not present in state after POST"
 
@@ -69,10 +76,10 @@ def test_fleet_expiration_flow():
         import sqlite3
         conn = sqlite3.connect(db_path)
         cur = conn.cursor()
-        # ensure row exists; update ts
-        cur.execute('UPDATE fleet SET ts = ? WHERE id = ?', (old_ts, MACHINE_ID))
+        # ensure row exists; update ts (rows are keyed "<org_id>:<machine_id>")
+        cur.execute('UPDATE fleet SET ts = ? WHERE id = ? OR id LIKE ?', (old_ts, MACHINE_ID, f'%:{MACHINE_ID}'))
         conn.commit()
-        cur.execute('SELECT ts FROM fleet WHERE id = ?', (MACHINE_ID,))
+        cur.execute('SELECT ts FROM fleet WHERE id = ? OR id LIKE ?', (MACHINE_ID, f'%:{MACHINE_ID}'))
         row = cur.fetchone()
         conn.close()
         # if update didn't stick (locked or missing row), fallback to JSON write below
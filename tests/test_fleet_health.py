@@ -0,0 +1,46 @@
+import os
+import json
+import urllib.request
+import pytest
+
+SERVER = os.environ.get("TEST_SERVER", "http://localhost:5000")
+ACTION_TOKEN = os.environ.get("ACTION_TOKEN")
+
+
+def _req(url: str, data: bytes | None, headers: dict, method: str = "POST"):
+    req = urllib.request.Request(url, data=data, headers=headers, method=method)
+    with urllib.request.urlopen(req, timeout=5) as resp:
+        return resp.getcode(), json.loads(resp.read().decode('utf-8'))
+
+
+@pytest.mark.skipif(not ACTION_TOKEN, reason="ACTION_TOKEN not set")
+def test_fleet_health_percentiles():
+    # Create an organization to get an api_key
+    create_url = SERVER.rstrip('/') + '/api/orgs'
+    headers = {'Content-Type': 'application/json', 'Authorization': f'Bearer {ACTION_TOKEN}'}
+    code, body = _req(create_url, json.dumps({'name': 'test-health'}).encode('utf-8'), headers)
+    assert code == 200
+    api_key = body.get('api_key')
+    assert api_key
+
+    hdr = {'Content-Type': 'application/json', 'Authorization': f'Bearer {api_key}'}
+    report_url = SERVER.rstrip('/') + '/api/fleet/report'
+    reports = {
+        # default scoring: 100 (ok) and 72 (warn)
+        'health-1': {'cpu_percent': 10.0, 'ram_percent': 40.0, 'disk_percent': 50.0},
+        'health-2': {'cpu_percent': 90.0, 'ram_percent': 60.0, 'disk_percent': 70.0},
+        # no metrics: left out of the distribution
+        'health-3': {'hostname': 'sans-metriques'},
+    }
+    for mid, report in reports.items():
+        _req(report_url, json.dumps({'machine_id': mid, 'report': report}).encode('utf-8'), hdr)
+
+    code, body = _req(SERVER.rstrip('/') + '/api/fleet/health', None, hdr, method='GET')
+    assert code == 200
+    assert body['machines'] == 2
+    assert body['status'] == {'ok': 1, 'warn': 1, 'critical': 0}
+    assert body['score'] == {'p50': 86.0, 'p90': 97.2, 'p99': 99.7}
+    assert body['cpu_percent'] == {'p50': 50.0, 'p90': 82.0, 'p99': 89.2}
+
+    code, body = _req(SERVER.rstrip('/') + '/api/fleet/health?q=0,100', None, hdr, method='GET')
+    assert body['score'] == {'p0': 72.0, 'p100': 100.0}
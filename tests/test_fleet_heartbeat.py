@@ -0,0 +1,92 @@
+import os
+import json
+import time
+import urllib.error
+import urllib.request
+import pytest
+
+SERVER = os.environ.get("TEST_SERVER", "http://localhost:5000")
+SERVER_2 = os.environ.get("TEST_SERVER_2")
+ACTION_TOKEN = os.environ.get("ACTION_TOKEN")
+
+
+def _req(url: str, data: bytes | None, headers: dict, method: str = "POST"):
+    req = urllib.request.Request(url, data=data, headers=headers, method=method)
+    try:
+        with urllib.request.urlopen(req, timeout=5) as resp:
+            return resp.getcode(), resp.read()
+    except urllib.error.HTTPError as exc:
+        return exc.code, exc.read()
+
+
+@pytest.mark.skipif(not ACTION_TOKEN, reason="ACTION_TOKEN not set")
+def test_fleet_heartbeat_bumps_ts_only():
+    # Create an organization to get an api_key
+    create_url = SERVER.rstrip('/') + '/api/orgs'
+    headers = {'Content-Type': 'application/json', 'Authorization': f'Bearer {ACTION_TOKEN}'}
+    code, raw = _req(create_url, json.dumps({'name': 'test-heartbeat'}).encode('utf-8'), headers)
+    assert code == 200
+    api_key = json.loads(raw.decode('utf-8')).get('api_key')
+    assert api_key
+
+    url = SERVER.rstrip('/') + '/api/fleet/report'
+    hdr = {'Content-Type': 'application/json', 'Authorization': f'Bearer {api_key}'}
+    heartbeat = json.dumps({'machine_id': 'hb-1', 'heartbeat': True}).encode('utf-8')
+
+    # unknown machine: the agent must send a full report
+    code, _ = _req(url, heartbeat, hdr)
+    assert code == 409
+
+    report = {'cpu_percent': 12.5, 'ram_percent': 40.0}
+    code, _ = _req(url, json.dumps({'machine_id': 'hb-1', 'report': report}).encode('utf-8'), hdr)
+    assert code == 200
+
+    def current():
+        code, raw = _req(SERVER.rstrip('/') + '/api/fleet', None, hdr, method='GET')
+        assert code == 200
+        return next(d for d in json.loads(raw.decode('utf-8'))['data'] if d['id'] == 'hb-1')
+
+    before = current()
+    time.sleep(0.05)
+    code, _ = _req(url, heartbeat, hdr)
+    assert code == 200
+    after = current()
+    assert after['ts'] > before['ts']
+    assert after['report'] == report
+
+
+@pytest.mark.skipif(not ACTION_TOKEN or not SERVER_2, reason="ACTION_TOKEN or TEST_SERVER_2 not set")
+def test_fleet_heartbeat_keeps_report_from_other_worker():
+    # TEST_SERVER_2: a second worker sharing the same data/fleet.db
+    create_url = SERVER.rstrip('/') + '/api/orgs'
+    headers = {'Content-Type': 'application/json', 'Authorization': f'Bearer {ACTION_TOKEN}'}
+    code, raw = _req(create_url, json.dumps({'name': 'test-heartbeat-workers'}).encode('utf-8'), headers)
+    assert code == 200
+    api_key = json.loads(raw.decode('utf-8')).get('api_key')
+    assert api_key
+
+    hdr = {'Content-Type': 'application/json', 'Authorization': f'Bearer {api_key}'}
+
+    def report(server: str, payload: dict):
+        code, _ = _req(server.rstrip('/') + '/api/fleet/report', json.dumps(payload).encode('utf-8'), hdr)
+        assert code == 200
+
+    def current(server: str):
+        code, raw = _req(server.rstrip('/') + '/api/fleet', None, hdr, method='GET')
+        assert code == 200
+        return next(d for d in json.loads(raw.decode('utf-8'))['data'] if d['id'] == 'hb-2')
+
+    old = {'cpu_percent': 10.0, 'ram_percent': 20.0}
+    new = {'cpu_percent': 90.0, 'ram_percent': 80.0}
+    report(SERVER, {'machine_id': 'hb-2', 'report': old})
+    assert current(SERVER)['report'] == old
+    # the new report lands on the second worker; once written (FLEET_WRITE_FLUSH_MS, 200 ms by
+    # default) but before the first worker's next sync, the heartbeat reaches the first one
+    report(SERVER_2, {'machine_id': 'hb-2', 'report': new})
+    time.sleep(0.5)
+    report(SERVER, {'machine_id': 'hb-2', 'heartbeat': True})
+
+    # both workers past their sync interval (FLEET_SYNC_SECONDS, 1 s by default)
+    time.sleep(1.5)
+    assert current(SERVER)['report'] == new
+    assert current(SERVER_2)['report'] == new
@@ -2,6 +2,7 @@
 Procédure :
 - Le serveur Flask doit être lancé localement (http://localhost:5000) et écrire `logs/fleet_state.json`.
 - Exécuter ce script : il POSTe un rapport, attend, puis vérifie que `logs/fleet_state.json` contient `machine_id`.
+  Le backup JSON est écrit par le serveur toutes les `FLEET_JSON_BACKUP_SECONDS` (défaut 5s).
 """
 import json
 import os
@@ -12,6 +13,7 @@ import pytest
 SERVER = os.environ.get("TEST_SERVER", "http://localhost:5000")
 TOKEN = os.environ.get("FLEET_TOKEN")
 MACHINE_ID = "test-persistence-001"
+BACKUP_WAIT = float(os.environ.get("FLEET_JSON_BACKUP_SECONDS", "5")) + 2
 
 
 def test_fleet_persistence():
@@ -38,13 +40,19 @@ def test_fleet_persistence():
     with urllib.request.urlopen(req, timeout=5) as resp:
         assert resp.getcode() == 200
 
-    # give server small time to write file
-    time.sleep(0.5)
-
+    # the JSON backup is written periodically by the server
     state_path = os.path.join('logs', 'fleet_state.json')
-    assert os.path.exists(state_path), 'fleet_state.json not found'
+    data = {}
+    deadline = time.time() + BACKUP_WAIT
+    while time.time() < deadline:
+        time.sleep(0.5)
+        if not os.path.exists(state_path):
+            continue
+        with open(state_path, 'r', encoding='utf-8') as fh:
+            data = json.load(fh)
+        if MACHINE_ID in data:
+            break
 
-    with open(state_path, 'r', encoding='utf-8') as fh:
-        data = json.load(fh)
+    assert os.path.exists(state_path), 'fleet_state.json not found'
 
     assert MACHINE_ID in data, 'Machine id not present in persistent state after POST'
@@ -0,0 +1,48 @@
+import os
+import json
+import urllib.request
+import pytest
+
+SERVER = os.environ.get("TEST_SERVER", "http://localhost:5000")
+ACTION_TOKEN = os.environ.get("ACTION_TOKEN")
+
+
+def _req(url: str, data: bytes | None, headers: dict, method: str = "POST"):
+    req = urllib.request.Request(url, data=data, headers=headers, method=method)
+    with urllib.request.urlopen(req, timeout=5) as resp:
+        return resp.getcode(), json.loads(resp.read().decode('utf-8'))
+
+
+@pytest.mark.skipif(not ACTION_TOKEN, reason="ACTION_TOKEN not set")
+def test_fleet_summary_tracks_reports():
+    # Create an organization to get an api_key
+    create_url = SERVER.rstrip('/') + '/api/orgs'
+    headers = {'Content-Type': 'application/json', 'Authorization': f'Bearer {ACTION_TOKEN}'}
+    code, body = _req(create_url, json.dumps({'name': 'test-summary'}).encode('utf-8'), headers)
+    assert code == 200
+    api_key = body.get('api_key')
+    assert api_key
+
+    hdr = {'Content-Type': 'application/json', 'Authorization': f'Bearer {api_key}'}
+    report_url = SERVER.rstrip('/') + '/api/fleet/report'
+    reports = {
+        'sum-1': {'cpu_percent': 10.0, 'ram_percent': 40.0, 'disk_percent': 50.0, 'health': {'status': 'ok'}},
+        'sum-2': {'cpu_percent': 90.0, 'ram_percent': 60.0, 'disk_percent': 70.0, 'health': {'status': 'critical'}},
+    }
+    for mid, report in reports.items():
+        _req(report_url, json.dumps({'machine_id': mid, 'report': report}).encode('utf-8'), hdr)
+
+    code, body = _req(SERVER.rstrip('/') + '/api/fleet/summary', None, hdr, method='GET')
+    assert code == 200
+    assert body['machines'] == 2
+    assert body['online'] == 2
+    assert body['status'] == {'ok': 1, 'critical': 1}
+    assert body['cpu_percent'] == {'min': 10.0, 'avg': 50.0, 'max': 90.0}
+
+    # a new report replaces the machine's previous contribution
+    report = dict(reports['sum-2'], cpu_percent=30.0, health={'status': 'ok'})
+    _req(report_url, json.dumps({'machine_id': 'sum-2', 'report': report}).encode('utf-8'), hdr)
+    code, body = _req(SERVER.rstrip('/') + '/api/fleet/summary', None, hdr, method='GET')
+    assert body['machines'] == 2
+    assert body['status'] == {'ok': 2}
+    assert body['cpu_percent'] == {'min': 10.0, 'avg': 20.0, 'max': 30.0}